@@ -13,7 +13,8 @@ let playerContainer; // To be initialized when the DOM is ready for player page
  * Dynamically creates the HTML structure for an audio player card.
  * Each card includes album art (placeholder), track name, time display,
  * a progress bar, playback controls (previous, play/pause, next), and an HTML audio element.
- * @param {File} file - The audio file object for which to create the card.
+ * @param {File|Object} file - The audio file object for which to create the card, or a track from a
+ *     streaming server ({name, url, artUrl}) as built by handleServerTracks.
  * @returns {HTMLElement} The fully constructed audio card element.
  */
 function createAudioCard(file) {
@@ -24,11 +25,17 @@ function createAudioCard(file) {
     // Create placeholder for album art
     const albumArt = document.createElement('div');
     albumArt.className = 'album-art';
+    if (file.artUrl) {
+        // Cover art from the streaming server; a missing cover just leaves the placeholder colour
+        albumArt.style.backgroundImage = `url("${file.artUrl}")`;
+        albumArt.style.backgroundSize = 'cover';
+        albumArt.style.backgroundPosition = 'center';
+    }
 
     // Create div for audio track name
     const audioName = document.createElement('div');
     audioName.className = 'audio-name';
-    audioName.textContent = file.name.replace(/\.[^/.]+$/, '');
+    audioName.textContent = file.url ? file.name : file.name.replace(/\.[^/.]+$/, ''); // Server names have no extension
 
     // Create div for time display (current time / total duration)
     const timeDisplay = document.createElement('div');
@@ -86,7 +93,8 @@ function createAudioCard(file) {
 
     // Create the HTML audio element
     const audio = document.createElement('audio');
-    audio.src = URL.createObjectURL(file);
+    audio.src = file.url || URL.createObjectURL(file); // Remote tracks stream straight from the server
+    audio.preload = 'metadata'; // Only fetch the header until the user presses play
 
     audio.addEventListener('loadedmetadata', () => {
         timeDisplay.children[1].textContent = formatTime(audio.duration); // Uses formatTime from utils.js
@@ -286,6 +294,41 @@ function handleAudioFiles(files) {
     });
 }
 
+/**
+ * Loads the track list from a Musicova streaming server (see Python/stream_server.py)
+ * and creates a card for each track. Audio is streamed with HTTP range requests, so seeking works.
+ * @param {string} serverUrl - Base URL of the server, e.g. "http://192.168.1.20:8766".
+ */
+function handleServerTracks(serverUrl) {
+    if (!playerContainer) {
+        console.error("Player container not initialized.");
+        return;
+    }
+    const baseUrl = serverUrl.replace(/\/+$/, '');
+    fetch(`${baseUrl}/tracks`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Server answered ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            playerContainer.innerHTML = ''; // Clear existing cards
+            data.tracks.forEach(track => {
+                const card = createAudioCard({
+                    name: track.name,
+                    url: baseUrl + track.audio_url,
+                    artUrl: baseUrl + track.art_url,
+                });
+                playerContainer.appendChild(card);
+            });
+        })
+        .catch(error => {
+            console.error('Could not load tracks from server:', error);
+            alert(`Could not load tracks from ${baseUrl}`);
+        });
+}
+
 /**
  * Initializes the player functionality, setting up import buttons and containers.
  * This should be called when the player page DOM is ready.
@@ -321,6 +364,15 @@ function initPlayerPage() {
                 return;
             }
 
+            if (selectedOption === 'server') {
+                const serverUrl = prompt('Streaming server address', localStorage.getItem('streamServer') || 'http://localhost:8766');
+                if (serverUrl) {
+                    localStorage.setItem('streamServer', serverUrl); // Remember for next time
+                    handleServerTracks(serverUrl);
+                }
+                return;
+            }
+
             const input = document.createElement('input');
             input.type = 'file';
 
@@ -374,154 +426,4 @@ function initPlayerPage() {
 // initPlayerPage will be called by player.html.
 // The initDarkMode call within initPlayerPage is redundant if player.html calls it directly.
 // Let's remove it from here to avoid double initialization and rely on player.html to call it.
-// initDarkMode('darkModeToggle'); // Removed from here.tool_code
-replace_with_git_merge_diff
-HTML/player.js
-<<<<<<< SEARCH
-            card.classList.add('active-card');
-        } else {
-            audio.pause();
-            playButton.innerHTML = `<img src="Icons/r5qa5pfzfndm7bro859.svg" alt="Play" style="width: 24px; height: 24px;">`;
-            card.classList.remove('active-card');
-        }
-    });
-
-    let isDragging = false;
-    let wasPlaying = false;
-
-    progressBar.addEventListener('mousedown', (e) => {
-        isDragging = true;
-        wasPlaying = !audio.paused;
-        if (wasPlaying) {
-            audio.pause();
-            playButton.innerHTML = `<img src="Icons/r5qa5pfzfndm7bro859.svg" alt="Play" style="width: 24px; height: 24px;">`;
-        }
-        updateProgress(e, progressBar, audio);
-    });
-
-    document.addEventListener('mousemove', (e) => {
-        if (isDragging) {
-            updateProgress(e, progressBar, audio);
-        }
-    });
-
-    document.addEventListener('mouseup', () => {
-        if (isDragging) {
-            if (wasPlaying) {
-                 // Before playing this audio, pause all other audio elements
-                document.querySelectorAll('audio').forEach(otherAudio => {
-                    if (otherAudio !== audio && !otherAudio.paused) {
-                        otherAudio.pause();
-                        const otherPlayButton = otherAudio.closest('.audio-card').querySelector('.play-button');
-                        if (otherPlayButton) {
-                            otherPlayButton.innerHTML = `<img src="Icons/r5qa5pfzfndm7bro859.svg" alt="Play" style="width: 24px; height: 24px;">`;
-                        }
-                        otherAudio.closest('.audio-card').classList.remove('active-card');
-                    }
-                });
-                audio.play();
-                playButton.innerHTML = `<img src="Icons/5dd3gw6mlhjm7brpg84.svg" alt="Pause" style="width: 24px; height: 24px;">`;
-                card.classList.add('active-card');
-            }
-            isDragging = false;
-        }
-    });
-
-    function updateProgress(e, progressBarElement, audioElement) {
-        const rect = progressBarElement.getBoundingClientRect();
-        let clickPosition = (e.clientX - rect.left) / rect.width;
-        clickPosition = Math.max(0, Math.min(1, clickPosition));
-        audioElement.currentTime = clickPosition * audioElement.duration;
-    }
-
-    prevButton.addEventListener('click', () => {
-        const cards = Array.from(playerContainer.children);
-=======
-            card.classList.add('active-card');
-        } else {
-            audio.pause();
-            playButton.innerHTML = `<img src="Icons/r5qa5pfzfndm7bro859.svg" alt="Play" style="width: 24px; height: 24px;">`;
-            card.classList.remove('active-card');
-        }
-    });
-
-    // --- Progress Bar Interaction ---
-    let isDraggingProgressBar = false;
-    let wasPlayingBeforeDrag = false;
-
-    progressBar.addEventListener('mousedown', (e) => {
-        isDraggingProgressBar = true;
-        wasPlayingBeforeDrag = !audio.paused;
-        if (wasPlayingBeforeDrag) {
-            audio.pause();
-            // Visually update play button to "Play" as audio is paused
-            playButton.innerHTML = `<img src="Icons/r5qa5pfzfndm7bro859.svg" alt="Play" style="width: 24px; height: 24px;">`;
-        }
-        // Immediately update progress to the click position
-        handleProgressUpdate(e, progressBar, audio, progressFill, timeDisplay.children[0]);
-    });
-
-    document.addEventListener('mousemove', (e) => {
-        if (isDraggingProgressBar) {
-            // Update progress as the mouse moves
-            handleProgressUpdate(e, progressBar, audio, progressFill, timeDisplay.children[0]);
-        }
-    });
-
-    document.addEventListener('mouseup', (e) => { // Changed 'e' to be available if needed, though not used in this specific logic
-        if (isDraggingProgressBar) {
-            // Final progress update on mouse up
-            handleProgressUpdate(e, progressBar, audio, progressFill, timeDisplay.children[0], true); // Pass true for final update
-
-            if (wasPlayingBeforeDrag) {
-                // Pause other audios before resuming this one
-                document.querySelectorAll('audio').forEach(otherAudio => {
-                    if (otherAudio !== audio && !otherAudio.paused) {
-                        otherAudio.pause();
-                        const otherPlayButton = otherAudio.closest('.audio-card').querySelector('.play-button');
-                        if (otherPlayButton) {
-                            otherPlayButton.innerHTML = `<img src="Icons/r5qa5pfzfndm7bro859.svg" alt="Play" style="width: 24px; height: 24px;">`;
-                        }
-                        otherAudio.closest('.audio-card').classList.remove('active-card');
-                    }
-                });
-                audio.play();
-                playButton.innerHTML = `<img src="Icons/5dd3gw6mlhjm7brpg84.svg" alt="Pause" style="width: 24px; height: 24px;">`;
-                card.classList.add('active-card');
-            }
-            isDraggingProgressBar = false;
-            wasPlayingBeforeDrag = false;
-        }
-    });
-
-    /**
-     * Handles the update of audio progress based on mouse interaction with the progress bar.
-     * @param {MouseEvent} e - The mouse event.
-     * @param {HTMLElement} progressBarElement - The progress bar element.
-     * @param {HTMLAudioElement} audioElement - The audio element.
-     * @param {HTMLElement} progressFillElement - The progress fill element.
-     * @param {HTMLElement} currentTimeDisplay - The element displaying current time.
-     * @param {boolean} isFinalUpdate - Indicates if this is the final update (e.g., on mouseup).
-     */
-    function handleProgressUpdate(e, progressBarElement, audioElement, progressFillElement, currentTimeDisplay, isFinalUpdate = false) {
-        const rect = progressBarElement.getBoundingClientRect();
-        let clickPositionRatio = (e.clientX - rect.left) / rect.width;
-        clickPositionRatio = Math.max(0, Math.min(1, clickPositionRatio)); // Clamp between 0 and 1
-
-        const newTime = clickPositionRatio * audioElement.duration;
-
-        // Update audio time only if it's the final update or if dragging (provides smoother visual feedback)
-        if (isFinalUpdate || isDraggingProgressBar) {
-             audioElement.currentTime = newTime;
-        }
-
-        // Update visual representation (fill and time text) immediately
-        progressFillElement.style.width = `${clickPositionRatio * 100}%`;
-        currentTimeDisplay.textContent = formatTime(newTime);
-    }
-
-
-    prevButton.addEventListener('click', () => {
-        if (!playerContainer) return; // Ensure playerContainer is defined
-        const cards = Array.from(playerContainer.children);
->>>>>>> REPLACE
+// initDarkMode('darkModeToggle'); // Removed from here.
@@ -0,0 +1,76 @@
+// HTML/sw.js
+// Service worker for the Musicova web application.
+// Precaches the app shell (pages, scripts, styles, icons and the self-hosted font)
+// so repeat visits are served from cache and the player works fully offline.
+
+// Bump this version whenever any file in APP_SHELL changes so clients pick up the new copy.
+const CACHE_VERSION = 'musicova-shell-v3';
+
+// Every file needed to render home.html and player.html without the network.
+const APP_SHELL = [
+    './',
+    'index.html',
+    'home.html',
+    'player.html',
+    'styles.css',
+    'utils.js',
+    'ui.js',
+    'player.js',
+    'fonts/DynaPuff-Regular.ttf',
+    'Musicova logo v2.png',
+    'Icons/10b81wv7wlmm7brpwyt.svg',
+    'Icons/5dd3gw6mlhjm7brpg84.svg',
+    'Icons/r5qa5pfzfndm7bro859.svg',
+];
+
+// Install: download the whole app shell up front and activate right away.
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(CACHE_VERSION)
+            .then(cache => cache.addAll(APP_SHELL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+// Activate: drop caches left behind by older versions and take control of open pages.
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => key !== CACHE_VERSION).map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+// Fetch: answer same-origin GET requests from the cache first, then refresh the
+// cached copy in the background so the next visit gets any deployed changes.
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET' || new URL(request.url).origin !== self.location.origin) {
+        return; // Let the browser handle anything that isn't part of the app shell
+    }
+
+    event.respondWith(
+        caches.open(CACHE_VERSION).then(cache =>
+            cache.match(request, { ignoreSearch: true }).then(cached => {
+                const network = fetch(request)
+                    .then(response => {
+                        // Only full responses: cache.put() rejects 206 partial content (range requests)
+                        if (response.status === 200) {
+                            cache.put(request, response.clone())
+                                .catch(err => console.warn('Could not cache', request.url, err));
+                        }
+                        return response;
+                    })
+                    .catch(() => cached || Response.error()); // Offline: fall back to whatever we have
+
+                if (cached) {
+                    event.waitUntil(network); // Revalidate without delaying the response
+                    return cached;
+                }
+                return network;
+            })
+        )
+    );
+});
@@ -40,3 +40,26 @@ function initDarkMode(toggleButtonId) {
 
 // Export functions if using modules in the future, or make them globally available.
 // For now, they will be global as script tags will be added to HTML.
+
+/**
+ * Registers the service worker (sw.js) that caches the app shell for offline use.
+ * Once registered, repeat loads are served from cache. The navigation timing
+ * (time until the page became interactive) is logged so cold and cached loads can be compared.
+ */
+function registerServiceWorker() {
+    if (!('serviceWorker' in navigator)) {
+        return; // Older browsers or file:// pages simply load from the network every time
+    }
+
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+
+        const navigation = performance.getEntriesByType('navigation')[0];
+        if (navigation) {
+            const source = navigator.serviceWorker.controller ? 'cache' : 'network';
+            console.info(`Musicova interactive after ${Math.round(navigation.domInteractive)} ms (${source})`);
+        }
+    });
+}
@@ -0,0 +1,415 @@
+# Python/audio_engine.py
+# Out-of-process audio engine: decoding and the pygame mixer run in a dedicated process so that
+# work on the GUI thread (stylesheet polish, big imports, layout) can never starve playback.
+#
+# The GUI talks to the engine through AudioEngine:
+#   - commands (play, pause, seek, volume, ...) go over a multiprocessing Pipe;
+#   - the engine publishes its state, position, levels and counters in a shared-memory header
+#     guarded by a sequence counter, and copies every block it plays into a shared-memory PCM ring
+#     that the visualizer reads from, so polling never needs a round trip to the engine.
+# Audio is streamed block by block through decoders.py (one block playing plus one queued on a
+# pygame Channel); a block that is not ready when the mixer needs it counts as an underrun. Files
+# at other sample rates are converted to MIXER_RATE by a streaming decoders.Resampler.
+#
+# Self-test under synthetic GUI load (compare with --in-process, the engine on a thread):
+#   python audio_engine.py song.flac --seconds 10 --gui-load-ms 150
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from collections import deque, namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+import decoders
+
+MIXER_RATE = 44100
+MIXER_CHANNELS = 2
+MIXER_BUFFER = 1024 # SDL buffer in frames
+BLOCK_FRAMES = 4096 # ~93 ms per block; one plays while the next is queued
+RING_FRAMES = 32768 # Recent PCM kept for the visualizer; must exceed two blocks plus an FFT window
+POLL_INTERVAL = 0.005
+STATUS_TIMEOUT_SEC = 0.05 # status() gives up on a header that stays mid-update (engine died while writing)
+ENGINE_LOST = -1 # Generation reported by poll_errors() when the engine itself stopped
+
+# Header slots (float64) in the shared memory, rewritten by the engine after every change
+(SEQ, STATE, GENERATION, POSITION, DURATION, LEVEL_LEFT, LEVEL_RIGHT, UNDERRUNS, BLOCKS,
+ RING_PLAYED, FIRST_SAMPLE_MS) = range(11)
+HEADER_SLOTS = 16
+HEADER_BYTES = HEADER_SLOTS * 8
+SHARED_BYTES = HEADER_BYTES + RING_FRAMES * MIXER_CHANNELS * 4
+
+STOPPED, PLAYING, PAUSED, ENDED, FAILED = range(5)
+STATE_NAMES = ("stopped", "playing", "paused", "ended", "failed")
+
+EngineStatus = namedtuple("EngineStatus", "state generation position duration level_left level_right "
+                                          "underruns blocks first_sample_ms")
+
+
+def _shared_views(shm):
+    header = np.ndarray((HEADER_SLOTS,), dtype=np.float64, buffer=shm.buf)
+    ring = np.ndarray((RING_FRAMES, MIXER_CHANNELS), dtype=np.float32, buffer=shm.buf, offset=HEADER_BYTES)
+    return header, ring
+
+
+def _attach(name):
+    # The spawned engine shares the GUI process's resource tracker, so attaching registers nothing
+    # new; the GUI process owns the segment and unlinks it in close()
+    return shared_memory.SharedMemory(name=name)
+
+
+class _Engine:
+    """The engine loop. Runs in the audio process (or on a thread with in_process=True)."""
+
+    def __init__(self, conn, shm):
+        import pygame # Only the engine touches the audio device
+        self.pygame = pygame
+        pygame.mixer.init(frequency=MIXER_RATE, size=-16, channels=MIXER_CHANNELS, buffer=MIXER_BUFFER)
+        self.channel = pygame.mixer.Channel(0)
+        self.conn = conn
+        self.shm = shm
+        self.header, self.ring = _shared_views(shm)
+        self.state = STOPPED
+        self.generation = 0
+        self.decoder = None
+        self.resampler = None # decoders.Resampler to MIXER_RATE, or None if the file is already at it
+        self.exhausted = False # Decoder has no more blocks for this track
+        self.pending = deque() # [frames, ring_start, level_left, level_right] handed to the channel, playing first
+        self.base_sec = 0.0 # Track position at which `pending`/played_frames counting started
+        self.played_frames = 0
+        self.block_started = 0.0 # monotonic() when the head of `pending` started playing
+        self.paused_at = 0.0
+        self.ring_written = 0 # Frames ever written to the ring
+        self.underruns = 0
+        self.blocks = 0
+        self.command_time = 0.0
+        self.first_sample_ms = 0.0
+        self.volume = 1.0
+
+    def run(self):
+        while True:
+            if self.conn.poll(POLL_INTERVAL if self.state == PLAYING else 0.05):
+                try:
+                    command = self.conn.recv()
+                except EOFError: # GUI process went away
+                    break
+                if command[0] == "quit":
+                    break
+                self._handle(command)
+            if self.state == PLAYING:
+                self._feed()
+            self._publish()
+        self._close_track()
+        self.pygame.mixer.quit()
+
+    def _handle(self, command):
+        name, args = command[0], command[1:]
+        if name == "play":
+            self.generation, file_path, start_sec, self.volume = args
+            self._close_track()
+            self.command_time = time.monotonic()
+            self.first_sample_ms = 0.0
+            try:
+                self.decoder = decoders.open_decoder(file_path)
+                if start_sec:
+                    self.decoder.seek(start_sec)
+                self._reset_resampler()
+            except Exception as e:
+                self.state = FAILED
+                self.conn.send(("error", self.generation, str(e)))
+                return
+            self.base_sec = start_sec
+            self.state = PLAYING
+            self._feed() # Start right away rather than after the next poll
+        elif name == "pause" and self.state == PLAYING:
+            self.channel.pause()
+            self.paused_at = time.monotonic()
+            self.state = PAUSED
+        elif name == "resume" and self.state == PAUSED:
+            self.channel.unpause()
+            self.block_started += time.monotonic() - self.paused_at
+            self.state = PLAYING
+        elif name == "stop":
+            self._close_track()
+            self.state = STOPPED
+        elif name == "seek" and self.decoder is not None and self.state in (PLAYING, PAUSED, ENDED):
+            self.channel.stop()
+            self.pending.clear()
+            self.decoder.seek(args[0])
+            self._reset_resampler()
+            self.base_sec, self.played_frames, self.exhausted = args[0], 0, False
+            if self.state == ENDED:
+                self.state = PLAYING
+            if self.state == PLAYING:
+                self._feed()
+        elif name == "volume":
+            self.volume = args[0]
+            self.channel.set_volume(self.volume)
+
+    def _close_track(self):
+        self.channel.stop()
+        self.pending.clear()
+        self.played_frames = 0
+        self.exhausted = False
+        if self.decoder is not None:
+            self.decoder.close()
+            self.decoder = None
+        self.resampler = None
+
+    def _reset_resampler(self):
+        # A fresh stream after opening or seeking; the filter must not blend in audio from elsewhere
+        rate = self.decoder.sample_rate
+        self.resampler = decoders.Resampler(rate, MIXER_RATE, self.decoder.channels) if rate != MIXER_RATE else None
+
+    def _read_block(self):
+        # About BLOCK_FRAMES frames at MIXER_RATE; empty at the end of the track
+        while True:
+            block = self.decoder.read(max(1, BLOCK_FRAMES * self.decoder.sample_rate // MIXER_RATE))
+            if self.resampler is None:
+                return block
+            if not len(block): # The decoder is done; the filter still holds the last few frames
+                self.exhausted = True
+                return self.resampler.flush()
+            block = self.resampler.process(block)
+            if len(block): # A tiny read may not complete an output frame yet
+                return block
+
+    def _next_sound(self):
+        block = self._read_block()
+        if not len(block):
+            self.exhausted = True
+            return None
+        if block.shape[1] != MIXER_CHANNELS: # Mono (or surround) to the mixer's stereo
+            block = np.repeat(block.mean(axis=1, keepdims=True), MIXER_CHANNELS, axis=1)
+        np.clip(block, -1.0, 1.0, out=block)
+        frames = len(block)
+        start = self.ring_written % RING_FRAMES
+        first = min(frames, RING_FRAMES - start)
+        self.ring[start:start + first] = block[:first]
+        self.ring[:frames - first] = block[first:]
+        levels = np.sqrt(np.mean(block * block, axis=0))
+        self.pending.append([frames, self.ring_written, float(levels[0]), float(levels[-1])])
+        self.ring_written += frames
+        self.blocks += 1
+        return self.pygame.sndarray.make_sound((block * 32767).astype(np.int16))
+
+    def _feed(self):
+        now = time.monotonic()
+        if not self.channel.get_busy():
+            if self.pending and not self.exhausted: # Mixer ran dry before the next block was queued
+                self.underruns += 1
+            for frames, *_ in self.pending:
+                self.played_frames += frames
+            self.pending.clear()
+            sound = self._next_sound()
+            if sound is None:
+                self.state = ENDED
+                return
+            self.channel.play(sound)
+            self.channel.set_volume(self.volume)
+            self.block_started = now
+            if not self.first_sample_ms:
+                self.first_sample_ms = max(0.001, (now - self.command_time) * 1000)
+        elif self.channel.get_queue() is None and len(self.pending) == 2: # Queued block is now playing
+            self.played_frames += self.pending.popleft()[0]
+            self.block_started = now
+        if self.channel.get_queue() is None and len(self.pending) < 2 and not self.exhausted:
+            sound = self._next_sound()
+            if sound is not None:
+                self.channel.queue(sound)
+
+    def _publish(self):
+        header = self.header
+        position, ring_played, left, right = self.base_sec, self.ring_written, 0.0, 0.0
+        if self.pending:
+            frames, ring_start, left, right = self.pending[0]
+            now = self.paused_at if self.state == PAUSED else time.monotonic()
+            elapsed = min(frames, int((now - self.block_started) * MIXER_RATE))
+            position = self.base_sec + (self.played_frames + elapsed) / MIXER_RATE
+            ring_played = ring_start + elapsed
+        elif self.state in (PLAYING, PAUSED, ENDED):
+            position = self.base_sec + self.played_frames / MIXER_RATE
+        header[SEQ] += 1 # Odd: write in progress
+        header[STATE] = self.state
+        header[GENERATION] = self.generation
+        header[POSITION] = position
+        header[DURATION] = (self.decoder.duration or 0.0) if self.decoder else 0.0
+        header[LEVEL_LEFT], header[LEVEL_RIGHT] = left, right
+        header[UNDERRUNS] = self.underruns
+        header[BLOCKS] = self.blocks
+        header[RING_PLAYED] = ring_played
+        header[FIRST_SAMPLE_MS] = self.first_sample_ms
+        header[SEQ] += 1
+
+
+def run_engine(conn, shm_or_name):
+    shm = _attach(shm_or_name) if isinstance(shm_or_name, str) else shm_or_name
+    try:
+        _Engine(conn, shm).run()
+    except Exception as e:
+        try:
+            conn.send(("error", ENGINE_LOST, f"Audio engine stopped: {e}"))
+        except OSError:
+            pass
+        raise
+    finally:
+        if isinstance(shm_or_name, str):
+            shm.close()
+
+
+class AudioEngine:
+    """GUI-side handle. Commands are asynchronous; status() and read_pcm() only read shared memory."""
+
+    def __init__(self, in_process=False):
+        self.in_process = in_process
+        self.shm = shared_memory.SharedMemory(create=True, size=SHARED_BYTES)
+        self.header, self.ring = _shared_views(self.shm)
+        self.header[:] = 0
+        self.conn, engine_conn = multiprocessing.Pipe()
+        self.generation = 0
+        self.lost = False # Set once poll_errors() has reported ENGINE_LOST
+        if in_process: # For comparison only: shares the GIL with the GUI
+            self.worker = threading.Thread(target=run_engine, args=(engine_conn, self.shm),
+                                           name="musicova-audio", daemon=True)
+        else: # spawn, not fork: a forked copy of a Qt process is not safe
+            context = multiprocessing.get_context("spawn")
+            self.worker = context.Process(target=run_engine, args=(engine_conn, self.shm.name),
+                                          name="musicova-audio", daemon=True)
+        self.worker.start()
+
+    def _send(self, *command):
+        try:
+            self.conn.send(command)
+        except OSError as e:
+            print(f"Audio engine is not running: {e}")
+
+    def play(self, file_path, start_sec=0.0, volume=1.0):
+        """Starts a track; returns its generation number, which status() reports while it is current."""
+        self.generation += 1
+        self._send("play", self.generation, file_path, float(start_sec), float(volume))
+        return self.generation
+
+    def pause(self):
+        self._send("pause")
+
+    def resume(self):
+        self._send("resume")
+
+    def stop(self):
+        self._send("stop")
+
+    def seek(self, seconds):
+        self._send("seek", max(0.0, float(seconds)))
+
+    def set_volume(self, volume):
+        self._send("volume", float(volume))
+
+    def is_alive(self):
+        return self.worker.is_alive()
+
+    def status(self):
+        deadline = None
+        while True: # Sequence lock: retry if the engine was mid-update
+            seq = self.header[SEQ]
+            values = self.header.copy()
+            if seq % 2 == 0 and self.header[SEQ] == seq:
+                break
+            # An engine that died mid-update leaves the sequence odd for good: don't spin on it
+            deadline = deadline or time.monotonic() + STATUS_TIMEOUT_SEC
+            if time.monotonic() > deadline or not self.worker.is_alive():
+                values[STATE] = FAILED
+                break
+        return EngineStatus(int(values[STATE]), int(values[GENERATION]), float(values[POSITION]), float(values[DURATION]),
+                            float(values[LEVEL_LEFT]), float(values[LEVEL_RIGHT]), int(values[UNDERRUNS]),
+                            int(values[BLOCKS]), float(values[FIRST_SAMPLE_MS])) # Plain floats: these end up in JSON
+
+    def read_pcm(self, out):
+        """Copies the most recently played len(out) frames (float32, stereo) into `out` without allocating."""
+        played = int(self.header[RING_PLAYED])
+        count = min(len(out), played, RING_FRAMES)
+        out[:len(out) - count] = 0.0
+        start = (played - count) % RING_FRAMES
+        first = min(count, RING_FRAMES - start)
+        out[len(out) - count:len(out) - count + first] = self.ring[start:start + first]
+        out[len(out) - count + first:] = self.ring[:count - first]
+
+    def poll_errors(self):
+        """Returns [(generation, message)] reported by the engine since the last call.
+
+        A generation of ENGINE_LOST means the engine itself stopped (a crash, or no audio device);
+        it is reported once, and the engine has to be replaced by a new AudioEngine.
+        """
+        errors = []
+        try:
+            while self.conn.poll():
+                kind, generation, message = self.conn.recv()
+                if kind == "error":
+                    errors.append((generation, message))
+        except (EOFError, OSError):
+            pass
+        if not self.lost:
+            if any(generation == ENGINE_LOST for generation, _ in errors):
+                self.lost = True
+            elif not self.worker.is_alive(): # Killed without a word, e.g. by a crash in the audio driver
+                self.lost = True
+                errors.append((ENGINE_LOST, "Audio engine stopped unexpectedly"))
+        return errors
+
+    def close(self):
+        if self.worker.is_alive():
+            self._send("quit")
+        self.worker.join(timeout=2)
+        if not self.in_process and self.worker.is_alive():
+            self.worker.terminate()
+        self.conn.close()
+        del self.header, self.ring # Views must go before the buffer can be released
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _busy_gui(milliseconds):
+    # Pure-Python work holds the GIL, like stylesheet polish or layout on the GUI thread
+    end = time.perf_counter() + milliseconds / 1000
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a file through the audio engine under synthetic GUI load "
+                                                 "and report underruns.")
+    parser.add_argument("file")
+    parser.add_argument("--seconds", type=float, default=10.0, help="How long to play (default: 10)")
+    parser.add_argument("--gui-load-ms", type=float, default=150.0,
+                        help="Busy-loop length on the 'GUI' thread per 16 ms frame (default: 150)")
+    parser.add_argument("--in-process", action="store_true", help="Run the engine on a thread instead of a process")
+    args = parser.parse_args(argv)
+
+    engine = AudioEngine(in_process=args.in_process)
+    try:
+        generation = engine.play(os.path.abspath(args.file))
+        started = time.monotonic()
+        while time.monotonic() - started < args.seconds:
+            _busy_gui(args.gui_load_ms)
+            time.sleep(0.016)
+            for _, message in engine.poll_errors():
+                print(message, file=sys.stderr)
+                return 1
+            if engine.status().state == ENDED:
+                break
+        status = engine.status()
+        json.dump({"engine": "thread" if args.in_process else "process", "gui_load_ms": args.gui_load_ms,
+                   "state": STATE_NAMES[status.state], "generation": generation,
+                   "position": round(status.position, 3), "blocks": status.blocks,
+                   "underruns": status.underruns, "first_sample_ms": round(status.first_sample_ms, 1)},
+                  sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
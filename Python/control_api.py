@@ -0,0 +1,250 @@
+# Python/control_api.py
+# Opt-in local control API for Musicova (HTTP + Server-Sent Events).
+# Lets other local tools (hotkey daemons, wall displays, scripts) drive the player and
+# subscribe to state changes instead of polling.
+#
+# The server runs its own asyncio event loop on a background thread, so no socket I/O ever
+# happens on the Qt GUI thread. Commands are handed to the GUI through a thread-safe
+# `dispatch(command, params)` callable that returns a concurrent.futures.Future; the GUI fills
+# it in on its own thread (see ControlBridge in musicova.py). State changes flow the other
+# way through `publish()`, which fans each event out to every subscriber's queue.
+#
+# Endpoints (JSON in, JSON out):
+#   GET  /state                  current playback state
+#   GET  /queue                  tracks in the playlist
+#   GET  /library?q=TEXT         tracks whose name or path contains TEXT
+#   GET  /library?query=QUERY    tracks matching a smart-playlist query (see track_table.py)
+#   GET  /stats                  read-ahead statistics (see prefetch.py)
+#   GET  /events                 Server-Sent Events stream of state changes
+#   POST /play {"index": N}      play track N (or resume / start the first track without index)
+#   POST /pause, /toggle, /stop, /next, /previous
+#   POST /seek {"position": SECONDS}
+#   POST /queue/add {"paths": [...]}, /queue/remove {"index": N},
+#        /queue/move {"from": N, "to": M}, /queue/clear
+#
+# There is no authentication, so the API only answers local tools, not web pages: requests
+# carrying an Origin header (sent by browsers) or a Host other than the loopback address and
+# port are refused, which also defeats DNS rebinding, and request bodies must be
+# Content-Type: application/json so a page cannot slip one in as a CORS "simple" request.
+import json
+import asyncio
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+DEFAULT_PORT = 8765
+SUBSCRIBER_QUEUE_SIZE = 256 # Events buffered per client before it is considered too slow and dropped
+KEEPALIVE_SEC = 15 # Comment line sent on idle event streams so proxies/clients don't time out
+COMMAND_TIMEOUT_SEC = 5 # How long a request waits for the GUI thread to answer
+MAX_BODY_BYTES = 1024 * 1024
+
+# Map of (method, path) -> command name passed to dispatch
+ROUTES = {
+    ("GET", "/state"): "state",
+    ("GET", "/queue"): "queue",
+    ("GET", "/library"): "library",
+    ("GET", "/stats"): "stats",
+    ("POST", "/play"): "play",
+    ("POST", "/pause"): "pause",
+    ("POST", "/toggle"): "toggle",
+    ("POST", "/stop"): "stop",
+    ("POST", "/next"): "next",
+    ("POST", "/previous"): "previous",
+    ("POST", "/seek"): "seek",
+    ("POST", "/queue/add"): "queue_add",
+    ("POST", "/queue/remove"): "queue_remove",
+    ("POST", "/queue/move"): "queue_move",
+    ("POST", "/queue/clear"): "queue_clear",
+}
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error",
+                504: "Gateway Timeout"}
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+class ControlServer:
+    def __init__(self, dispatch, host="127.0.0.1", port=DEFAULT_PORT):
+        self.dispatch = dispatch
+        self.host = host # Loopback only by default: the API has no authentication
+        self.port = port
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._subscribers = {} # asyncio.Queue -> StreamWriter per connected /events client, touched only on the loop thread
+        self._started = threading.Event()
+        self._start_error = None
+
+    @property
+    def has_subscribers(self):
+        # Read from the GUI thread to skip building events nobody listens to; a stale answer is harmless
+        return bool(self._subscribers)
+
+    def start(self):
+        """Starts the server thread and waits until the socket is bound (raises OSError on failure)."""
+        self._thread = threading.Thread(target=self._run, name="musicova-control-api", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._start_error:
+            raise self._start_error
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def publish(self, event, data):
+        """Queues an event for every subscriber. Safe to call from any thread, never blocks."""
+        if self._loop and self._subscribers:
+            message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+            self._loop.call_soon_threadsafe(self._fan_out, message)
+
+    # --- Event loop thread ---
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port))
+        except OSError as e:
+            self._start_error = e
+            self._started.set()
+            self._loop.close()
+            return
+        self.port = self._server.sockets[0].getsockname()[1] # The one picked by the OS when port 0 was asked for
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop) # Open connections; cancel them so their sockets get closed
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    def _fan_out(self, message):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull: # Client stopped reading; drop it rather than buffer forever
+                self._close_subscriber(queue)
+
+    def _close_subscriber(self, queue):
+        writer = self._subscribers.pop(queue, None)
+        while not queue.empty(): # Make room for the sentinel; pending events are discarded
+            queue.get_nowait()
+        queue.put_nowait(None)
+        if writer is not None: # Its stream is probably stuck in drain(); aborting wakes it with an error
+            writer.transport.abort()
+
+    def _allowed_hosts(self):
+        hosts = set(LOOPBACK_HOSTS)
+        hosts.add(self.host)
+        return {f"{host}:{self.port}" for host in hosts}
+
+    async def _handle_client(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                return
+            method, target = parts[0].upper(), parts[1]
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if "origin" in headers or headers.get("host", "").lower() not in self._allowed_hosts():
+                await self._respond(writer, 403, {"error": "Only local tools may use this API, not web pages"})
+                return
+            length = int(headers.get("content-length", 0) or 0)
+            if length > MAX_BODY_BYTES:
+                await self._respond(writer, 413, {"error": "Request body too large"})
+                return
+            body = await reader.readexactly(length) if length else b""
+
+            url = urlsplit(target)
+            path = url.path.rstrip("/") or "/"
+            if method == "GET" and path == "/events":
+                await self._stream_events(writer)
+                return
+
+            command = ROUTES.get((method, path))
+            if command is None:
+                known_path = any(p == path for _, p in ROUTES)
+                await self._respond(writer, 405 if known_path else 404, {"error": f"No route for {method} {path}"})
+                return
+
+            if body and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+                await self._respond(writer, 415, {"error": "Send the request body as application/json"})
+                return
+            try:
+                params = json.loads(body) if body else {}
+                if not isinstance(params, dict):
+                    raise ValueError("Body must be a JSON object")
+            except ValueError as e:
+                await self._respond(writer, 400, {"error": str(e)})
+                return
+            for key, values in parse_qs(url.query).items(): # Query string parameters, e.g. /library?q=...
+                params.setdefault(key, values[-1])
+
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(self.dispatch(command, params)),
+                                                COMMAND_TIMEOUT_SEC)
+            except asyncio.TimeoutError:
+                await self._respond(writer, 504, {"error": "Player did not respond in time"})
+            except (ValueError, IndexError, KeyError, TypeError) as e:
+                await self._respond(writer, 400, {"error": str(e)})
+            except Exception as e:
+                await self._respond(writer, 500, {"error": str(e)})
+            else:
+                await self._respond(writer, 200, result if result is not None else {"ok": True})
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass # Client went away or sent garbage; nothing to answer
+        except asyncio.CancelledError:
+            pass # Server shutting down; finish quietly so the socket is closed below
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream_events(self, writer):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+        await writer.drain()
+
+        # Send the current state first so a new subscriber never has to poll for it
+        try:
+            state = await asyncio.wait_for(asyncio.wrap_future(self.dispatch("state", {})), COMMAND_TIMEOUT_SEC)
+            writer.write(f"event: state\ndata: {json.dumps(state, ensure_ascii=False)}\n\n".encode("utf-8"))
+        except Exception:
+            pass
+
+        self._subscribers[queue] = writer
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    message = b": keepalive\n\n"
+                if message is None: # Dropped as too slow, or server shutting down
+                    break
+                writer.write(message)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.pop(queue, None)
@@ -0,0 +1,453 @@
+# Python/decoders.py
+# Pluggable audio decoders behind one streaming interface.
+#
+# Every backend opens a file and offers read(frames) -> float32 array shaped (frames, channels)
+# and seek(seconds). Several backends usually handle the same format at very different speeds
+# (pygame/SDL_mixer, libsndfile via soundfile, a local ffmpeg, the stdlib wave module), so
+# calibrate() decodes one file of each extension with every available backend and remembers the
+# timings in ~/.musicova/decoders.json. It runs when tracks are added or analysed, never when one
+# starts playing. open_decoder() tries the fastest backend first and falls back to the others
+# (untimed ones, then ones that failed the measurement) if a particular file fails to open.
+#
+# Headless like library.py: pygame is only used if the host process has already imported it
+# (the desktop app); the CLI and worker processes never load it.
+import os
+import sys
+import json
+import time
+import math
+import wave
+import shutil
+import subprocess
+import numpy as np
+
+import library
+
+try:
+    import soundfile # libsndfile: WAV, FLAC, OGG and (libsndfile >= 1.1) MP3
+except ImportError:
+    soundfile = None
+
+CACHE_PATH = os.path.join(library.DATA_DIR, "decoders.json")
+CACHE_VERSION = 1
+BENCHMARK_SECONDS = 10 # Audio decoded per backend when measuring; plus one seek
+READ_BLOCK_FRAMES = 65536
+MAX_RESAMPLER_PHASES = 1024 # Resampler weights are precomputed for rate ratios up to this many steps
+CALIBRATION_ATTEMPTS = 3 # Files of one extension tried before giving up when none can be decoded
+
+
+class Decoder:
+    """Base class. Subclasses set sample_rate, channels and frames (None if unknown) when opened."""
+    name = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def read(self, frames):
+        """Returns up to `frames` float32 frames shaped (n, channels); n == 0 at the end."""
+        raise NotImplementedError
+
+    def seek(self, seconds):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.frames else None
+
+    def read_all(self):
+        blocks = []
+        while True:
+            block = self.read(READ_BLOCK_FRAMES * 4)
+            if not len(block):
+                break
+            blocks.append(block)
+        return np.concatenate(blocks) if blocks else np.zeros((0, self.channels), dtype=np.float32)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SoundfileDecoder(Decoder):
+    name = "soundfile"
+
+    @classmethod
+    def available(cls):
+        return soundfile is not None
+
+    def __init__(self, file_path):
+        self._file = soundfile.SoundFile(file_path)
+        self.sample_rate = self._file.samplerate
+        self.channels = self._file.channels
+        self.frames = self._file.frames or None
+
+    def read(self, frames):
+        return self._file.read(frames=frames, dtype="float32", always_2d=True)
+
+    def seek(self, seconds):
+        self._file.seek(min(int(seconds * self.sample_rate), self.frames or 0))
+
+    def close(self):
+        self._file.close()
+
+
+class WaveDecoder(Decoder):
+    name = "wave" # Standard library; PCM WAV only, but always there
+
+    def __init__(self, file_path):
+        if not file_path.lower().endswith(".wav"):
+            raise ValueError("The wave backend only reads .wav files")
+        self._file = wave.open(file_path, "rb")
+        self.sample_rate = self._file.getframerate()
+        self.channels = self._file.getnchannels()
+        self.frames = self._file.getnframes()
+        self._width = self._file.getsampwidth()
+        if self._width not in (1, 2, 3, 4):
+            self._file.close()
+            raise ValueError(f"Unsupported WAV sample width: {self._width * 8} bit")
+
+    def read(self, frames):
+        raw = self._file.readframes(frames)
+        if self._width == 1:
+            samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+        elif self._width == 3: # 24-bit: widen to int32 by placing the bytes in the high end
+            packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+            widened = np.zeros((len(packed), 4), dtype=np.uint8)
+            widened[:, 1:] = packed
+            samples = widened.view("<i4").ravel().astype(np.float32) / 2 ** 31
+        else:
+            dtype = np.int16 if self._width == 2 else np.int32
+            samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / -np.iinfo(dtype).min
+        return samples.reshape(-1, self.channels)
+
+    def seek(self, seconds):
+        self._file.setpos(max(0, min(int(seconds * self.sample_rate), self.frames)))
+
+    def close(self):
+        self._file.close()
+
+
+class FFmpegDecoder(Decoder):
+    """Decodes through a local ffmpeg process writing raw float32 PCM to a pipe. Seeking restarts it."""
+    name = "ffmpeg"
+
+    @classmethod
+    def available(cls):
+        return shutil.which("ffmpeg") is not None
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.sample_rate, self.channels, self.frames = 44100, 2, None # ffmpeg converts if ffprobe is missing
+        if shutil.which("ffprobe"):
+            probe = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries",
+                 "stream=sample_rate,channels:format=duration", "-of", "json", file_path],
+                capture_output=True, timeout=30, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+            info = json.loads(probe.stdout or b"{}")
+            if not info.get("streams"):
+                raise ValueError(f"ffprobe found no audio stream in {file_path}")
+            stream = info["streams"][0]
+            self.sample_rate = int(stream.get("sample_rate") or self.sample_rate)
+            self.channels = int(stream.get("channels") or self.channels)
+            duration = float(info.get("format", {}).get("duration") or 0)
+            self.frames = int(duration * self.sample_rate) or None
+        self._process = None
+        self._start(0.0)
+
+    def _start(self, seconds):
+        self.close()
+        command = ["ffmpeg", "-v", "error", "-nostdin"]
+        if seconds > 0:
+            command += ["-ss", f"{seconds:.3f}"]
+        command += ["-i", self.file_path, "-map", "a:0", "-f", "f32le", "-ac", str(self.channels),
+                    "-ar", str(self.sample_rate), "pipe:1"]
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                         creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+
+    def read(self, frames):
+        raw = self._process.stdout.read(frames * self.channels * 4)
+        usable = len(raw) - len(raw) % (self.channels * 4)
+        return np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, self.channels)
+
+    def seek(self, seconds):
+        self._start(max(0.0, seconds))
+
+    def close(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+
+
+class PygameDecoder(Decoder):
+    """SDL_mixer via pygame.mixer.Sound. Decodes the whole file up front, at the mixer's format."""
+    name = "pygame"
+
+    @classmethod
+    def available(cls):
+        pygame = sys.modules.get("pygame") # Only when the host already uses pygame (the desktop app)
+        return pygame is not None and bool(pygame.mixer.get_init())
+
+    def __init__(self, file_path):
+        pygame = sys.modules["pygame"]
+        self.sample_rate, size, self.channels = pygame.mixer.get_init()
+        if size not in (-16, 32):
+            raise ValueError(f"Unsupported mixer sample format: {size}")
+        self.sound = pygame.mixer.Sound(file_path) # Kept so the desktop app can play it directly
+        raw = np.frombuffer(self.sound.get_raw(), dtype=np.int16 if size == -16 else np.float32)
+        self._samples = raw.reshape(-1, self.channels)
+        self._scale = 1 / 32768 if size == -16 else 1.0
+        self.frames = len(self._samples)
+        self._position = 0
+
+    def read(self, frames):
+        block = self._samples[self._position:self._position + frames]
+        self._position += len(block)
+        return block.astype(np.float32) * self._scale
+
+    def seek(self, seconds):
+        self._position = max(0, min(int(seconds * self.sample_rate), self.frames))
+
+
+BACKENDS = {cls.name: cls for cls in (PygameDecoder, SoundfileDecoder, FFmpegDecoder, WaveDecoder)}
+
+
+def resample(samples, from_rate, to_rate):
+    """Linear-interpolation resampling of (frames, channels) or mono float32 samples.
+
+    Cheap and good enough for analysis; audio that is listened to goes through Resampler.
+    """
+    if from_rate == to_rate or not len(samples):
+        return samples
+    source_times = np.arange(len(samples)) / from_rate
+    target_times = np.arange(int(len(samples) * to_rate / from_rate)) / to_rate
+    if samples.ndim == 1:
+        return np.interp(target_times, source_times, samples).astype(np.float32)
+    return np.stack([np.interp(target_times, source_times, samples[:, c]) for c in range(samples.shape[1])],
+                    axis=1).astype(np.float32)
+
+
+class Resampler:
+    """Streaming windowed-sinc resampler for (frames, channels) float32 blocks.
+
+    Consecutive blocks are resampled as one continuous signal: the filter history and the
+    fractional read position carry over from block to block, so block edges add no clicks and no
+    frames are lost. When downsampling the cutoff drops to the new Nyquist frequency, so content
+    above it is filtered out instead of folding back as aliasing. Call flush() at the end of the
+    stream for the last few frames.
+    """
+
+    def __init__(self, from_rate, to_rate, channels, zero_crossings=16):
+        common = math.gcd(int(from_rate), int(to_rate))
+        self.up, self.down = int(to_rate) // common, int(from_rate) // common # Output n is at input n * down / up
+        self.cutoff = min(1.0, to_rate / from_rate)
+        self.half_width = int(np.ceil(zero_crossings / self.cutoff)) # Filter reach, in input frames
+        self._offsets = np.arange(1 - self.half_width, self.half_width + 1)
+        # One row of weights per fractional position; 44.1 <-> 48 kHz needs 147 (or 160) rows
+        self._table = self._weights(np.arange(self.up)) if self.up <= MAX_RESAMPLER_PHASES else None
+        self._buffer = np.zeros((self.half_width, channels), dtype=np.float32) # Silence before the start
+        self._time = self.half_width * self.up # Next output position in 1/up input frames, from _buffer[0]
+
+    def _weights(self, phases):
+        distance = phases[:, None] / self.up - self._offsets # From each tap to the output position
+        window = 0.42 + 0.5 * np.cos(np.pi * distance / self.half_width) \
+            + 0.08 * np.cos(2 * np.pi * distance / self.half_width) # Blackman
+        weights = np.sinc(self.cutoff * distance) * window
+        return (weights / weights.sum(axis=1, keepdims=True)).astype(np.float32) # Unity gain at DC
+
+    def process(self, block):
+        buffer = self._buffer = np.concatenate([self._buffer, block.astype(np.float32, copy=False)])
+        # Each output needs half_width input frames after it
+        count = -(-((len(buffer) - self.half_width) * self.up - self._time) // self.down)
+        if count <= 0:
+            return np.zeros((0, buffer.shape[1]), dtype=np.float32)
+        bases, phases = np.divmod(self._time + np.arange(count, dtype=np.int64) * self.down, self.up)
+        weights = self._table[phases] if self._table is not None else self._weights(phases)
+        output = np.zeros((count, buffer.shape[1]), dtype=np.float32)
+        for tap, offset in enumerate(self._offsets):
+            output += weights[:, tap:tap + 1] * buffer[bases + offset]
+        # Keep only what the next outputs still reach back to
+        self._time += count * self.down
+        drop = max(0, self._time // self.up - self.half_width + 1)
+        self._buffer = buffer[drop:]
+        self._time -= drop * self.up
+        return output
+
+    def flush(self):
+        """Output for the end of the stream (silence is assumed after it); empty when called again."""
+        channels = self._buffer.shape[1]
+        wanted = -(-(len(self._buffer) * self.up - self._time) // self.down) # Up to the last real input frame
+        if wanted <= 0:
+            return np.zeros((0, channels), dtype=np.float32)
+        output = self.process(np.zeros((self.half_width, channels), dtype=np.float32))[:wanted]
+        self._buffer = self._buffer[:0]
+        self._time = 0
+        return output
+
+
+# --- Backend selection ---
+
+_timings = None # {extension: {backend name: seconds, or None if it failed}}
+_timings_mtime = None # Of CACHE_PATH when read, so calibrations by other processes are picked up
+
+
+def _read_cache():
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache["timings"] if cache.get("version") == CACHE_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def load_timings():
+    global _timings, _timings_mtime
+    try:
+        mtime = os.stat(CACHE_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    if _timings is None or mtime != _timings_mtime:
+        _timings, _timings_mtime = _read_cache(), mtime
+    return _timings
+
+
+def _update_timings(change):
+    # Applied to what is on disk, not to _timings: worker processes calibrate other extensions at the same time
+    global _timings, _timings_mtime
+    timings = _read_cache()
+    change(timings)
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "timings": timings}, f, indent=1)
+        os.replace(tmp_path, CACHE_PATH)
+        _timings, _timings_mtime = timings, os.stat(CACHE_PATH).st_mtime_ns
+    except OSError as e:
+        print(f"Could not save decoder choices: {e}")
+        change(load_timings()) # Still used for this session
+
+
+def _save_timings(extension, results):
+    _update_timings(lambda timings: timings.setdefault(extension, {}).update(results))
+
+
+def forget_timings(extensions):
+    """Drops the saved measurements for these extensions, so the next calibrate() times them again."""
+    def change(timings):
+        for extension in extensions:
+            timings.pop(extension.lower(), None)
+    _update_timings(change)
+
+
+def benchmark(backend, file_path):
+    """Seconds a backend takes to open a file, decode BENCHMARK_SECONDS and seek; None if it fails."""
+    started = time.perf_counter()
+    try:
+        with backend(file_path) as decoder:
+            wanted = BENCHMARK_SECONDS * decoder.sample_rate
+            decoded = 0
+            while decoded < wanted:
+                block = decoder.read(min(READ_BLOCK_FRAMES, wanted - decoded))
+                if not len(block):
+                    break
+                decoded += len(block)
+            if not decoded:
+                return None
+            decoder.seek((decoder.duration or BENCHMARK_SECONDS) / 2)
+            decoder.read(decoder.sample_rate)
+    except Exception:
+        return None
+    return time.perf_counter() - started
+
+
+def _extension(file_path):
+    return os.path.splitext(file_path)[1].lower()
+
+
+def _available():
+    return [name for name, cls in BACKENDS.items() if cls.available()]
+
+
+def backends_for(file_path):
+    """Available backends for a file's format, best first. Never measures anything (see calibrate()).
+
+    Backends timed on this format come fastest first, then untimed ones in default order, then
+    those whose measurement failed: one bad file proves little, so they stay usable as a last resort.
+    """
+    timings = load_timings().get(_extension(file_path), {})
+    available = _available()
+    timed = sorted((name for name in available if timings.get(name) is not None), key=timings.get)
+    untimed = [name for name in available if name not in timings]
+    failed = [name for name in available if name in timings and timings[name] is None]
+    return [BACKENDS[name] for name in timed + untimed + failed]
+
+
+def measure(file_path):
+    """Times the backends not yet measured for a file's format on this file.
+
+    Returns True once the format is calibrated. If no backend can decode the file nothing is
+    recorded, so the next file of the same format is measured instead.
+    """
+    extension = _extension(file_path)
+    timings = load_timings().get(extension, {})
+    untimed = [name for name in _available() if name not in timings]
+    if not untimed:
+        return True
+    if not os.path.isfile(file_path):
+        return False
+    results = {name: benchmark(BACKENDS[name], file_path) for name in untimed}
+    if all(seconds is None for seconds in results.values()):
+        return False
+    _save_timings(extension, results)
+    return True
+
+
+def calibration_candidates(file_paths):
+    """Up to CALIBRATION_ATTEMPTS files of each extension whose backends have not all been timed."""
+    timings = load_timings()
+    available = _available()
+    candidates = {}
+    for file_path in file_paths:
+        extension = _extension(file_path)
+        if all(name in timings.get(extension, {}) for name in available):
+            continue
+        paths = candidates.setdefault(extension, [])
+        if len(paths) < CALIBRATION_ATTEMPTS:
+            paths.append(file_path)
+    return [file_path for paths in candidates.values() for file_path in paths]
+
+
+def calibrate(file_paths):
+    """Times the backends once per extension, on the first file of each that can be decoded.
+
+    Slow (BENCHMARK_SECONDS of audio per backend), so call it from a worker or batch job. Returns
+    {extension: [backend names, best first]}.
+    """
+    calibrated = {}
+    for file_path in calibration_candidates(file_paths):
+        extension = _extension(file_path)
+        if not calibrated.get(extension):
+            calibrated[extension] = measure(file_path)
+    examples = {_extension(file_path): file_path for file_path in file_paths}
+    return {extension: [cls.name for cls in backends_for(file_path)] for extension, file_path in examples.items()}
+
+
+def open_decoder(file_path):
+    """Opens a file with the fastest working backend for its format."""
+    errors = []
+    for backend in backends_for(file_path):
+        try:
+            return backend(file_path)
+        except Exception as e:
+            errors.append(f"{backend.name}: {e}")
+    if not errors:
+        raise RuntimeError(f"No audio decoder is available to open {file_path} (install the 'soundfile' package or ffmpeg)")
+    raise RuntimeError(f"No decoder could open {file_path} ({'; '.join(errors)})")
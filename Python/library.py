@@ -0,0 +1,264 @@
+# Python/library.py
+# Headless library functions shared by the desktop app (musicova.py) and the
+# command-line tool (musicova_cli.py): finding audio files, reading their tags and
+# stream properties, and keeping a JSON library index on disk.
+# Nothing in here may import PyQt5 or pygame so it can run on servers and in cron jobs.
+import os
+import re
+import json
+import base64
+import shutil
+from mutagen import File as MutagenFile # Same metadata reader the GUI uses
+from mutagen.flac import Picture
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac') # Formats accepted by the import dialog
+COVER_FILE_NAMES = ('cover.jpg', 'cover.png', 'folder.jpg', 'folder.png', 'front.jpg') # Sidecar art, checked in order
+INDEX_VERSION = 1 # Bump when the layout of index entries changes
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".musicova") # Shared by the GUI and the CLI
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, "library.json")
+DEFAULT_FEATURES_PATH = os.path.join(DATA_DIR, "features.npz") # Acoustic descriptors, see similarity.py
+UNSUPPORTED_TAGS_ERROR = "Tag editing is not supported for this format"
+EDITABLE_TAGS = ("title", "artist", "album", "albumartist", "genre", "date", "tracknumber") # Keys of mutagen's easy interface
+
+
+def is_audio_file(file_path):
+    return file_path.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def scan_folder(folder_path, recursive=True):
+    """Returns a sorted list of audio file paths found in folder_path."""
+    found = []
+    if recursive:
+        for root, dirs, files in os.walk(folder_path):
+            dirs.sort() # Deterministic walk order
+            for name in files:
+                if is_audio_file(name):
+                    found.append(os.path.join(root, name))
+    else:
+        for name in os.listdir(folder_path):
+            full_path = os.path.join(folder_path, name)
+            if os.path.isfile(full_path) and is_audio_file(name):
+                found.append(full_path)
+    return sorted(found)
+
+
+def make_display_name(file_path, title=None, artist=None):
+    """Builds the "Artist - Title" name shown on track cards, falling back to the file name."""
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    if title and artist:
+        display_name = f"{artist} - {title}"
+    elif title:
+        display_name = title
+    elif artist: # Less common to have artist but not title, but possible
+        display_name = f"{artist} - {base_name}"
+    else:
+        display_name = base_name
+    return display_name if display_name.strip() else base_name
+
+
+def read_track_info(file_path):
+    """Reads tags and stream properties for one file into a plain (JSON-serialisable) dict.
+
+    Runs in worker processes, so it never raises: problems are reported in the "error" key.
+    """
+    info = {
+        "file_path": file_path,
+        "size": None, "mtime": None,
+        "title": None, "artist": None, "album": None,
+        "duration_sec": 0.0,
+        "error": None,
+    }
+    try:
+        stat = os.stat(file_path) # May fail if the file vanished or its mount went away mid-scan
+        info["size"], info["mtime"] = stat.st_size, stat.st_mtime
+        audio_file = MutagenFile(file_path, easy=True)
+        if audio_file is not None:
+            for key in ("title", "artist", "album"):
+                info[key] = audio_file.get(key, [None])[0]
+            if audio_file.info is not None:
+                info["duration_sec"] = float(getattr(audio_file.info, "length", 0.0) or 0.0)
+        else:
+            info["error"] = "Unrecognised audio format"
+    except Exception as e:
+        info["error"] = str(e)
+    info["display_name"] = make_display_name(file_path, info["title"], info["artist"])
+    return info
+
+
+def analyze_track(file_path):
+    """Reads stream properties (bitrate, sample rate, channels, codec) for one file.
+
+    Like read_track_info, this is safe to run in a worker process and never raises.
+    """
+    analysis = {"bitrate": 0, "sample_rate": 0, "channels": 0, "codec": None, "error": None}
+    try:
+        audio_file = MutagenFile(file_path)
+        if audio_file is not None and audio_file.info is not None:
+            stream = audio_file.info
+            analysis["bitrate"] = int(getattr(stream, "bitrate", 0) or 0)
+            analysis["sample_rate"] = int(getattr(stream, "sample_rate", 0) or 0)
+            analysis["channels"] = int(getattr(stream, "channels", 0) or 0)
+            analysis["codec"] = type(stream).__module__.rsplit('.', 1)[-1].lstrip('_')
+        else:
+            analysis["error"] = "Unrecognised audio format"
+    except Exception as e:
+        analysis["error"] = str(e)
+    return analysis
+
+
+def read_cover_art(file_path):
+    """Returns (image_bytes, mime_type) for a track's cover art, or None if it has none.
+
+    Embedded art is preferred (ID3 APIC frames, FLAC pictures, Ogg METADATA_BLOCK_PICTURE);
+    otherwise a cover/folder image next to the file is used.
+    """
+    try:
+        audio_file = MutagenFile(file_path)
+    except Exception:
+        audio_file = None
+    if audio_file is not None:
+        pictures = getattr(audio_file, "pictures", None) # FLAC
+        if pictures:
+            return pictures[0].data, pictures[0].mime or "image/jpeg"
+        tags = audio_file.tags
+        if tags is not None and hasattr(tags, "getall"): # ID3 (MP3, WAV)
+            frames = tags.getall("APIC")
+            if frames:
+                return frames[0].data, frames[0].mime or "image/jpeg"
+        elif tags is not None: # Vorbis comments (OGG)
+            for encoded in tags.get("metadata_block_picture", []):
+                try:
+                    picture = Picture(base64.b64decode(encoded))
+                    return picture.data, picture.mime or "image/jpeg"
+                except Exception:
+                    continue
+
+    folder = os.path.dirname(file_path)
+    for name in COVER_FILE_NAMES:
+        cover_path = os.path.join(folder, name)
+        if os.path.isfile(cover_path):
+            with open(cover_path, "rb") as f:
+                return f.read(), "image/png" if name.endswith(".png") else "image/jpeg"
+    return None
+
+
+def filename_pattern_regex(pattern):
+    """Compiles a pattern like "%tracknumber% - %artist% - %title%" into a regex over file names.
+
+    Raises ValueError for placeholders that are not in EDITABLE_TAGS.
+    """
+    parts = re.split(r"%(\w+)%", pattern)
+    regex = ""
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            regex += re.escape(part)
+        elif part not in EDITABLE_TAGS:
+            raise ValueError(f"Unknown placeholder %{part}% (use one of: {', '.join(EDITABLE_TAGS)})")
+        else:
+            regex += f"(?P<{part}>.+?)"
+    return re.compile(regex + "$")
+
+
+def plan_tag_changes(file_path, current, edit):
+    """Works out which tags an edit changes for one file.
+
+    `current` maps tag keys to their present values; `edit` is a dict with any of
+    "set" ({key: value}), "replace" ({"field", "find", "replace", "regex"}) and "pattern"
+    (a fill-from-filename pattern). Returns {key: new_value}, where "" removes the tag.
+    """
+    new = dict(current)
+    pattern = edit.get("pattern")
+    if pattern:
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        match = filename_pattern_regex(pattern).match(base_name)
+        if match:
+            new.update({k: v.strip() for k, v in match.groupdict().items()})
+    replace = edit.get("replace")
+    if replace and replace.get("find"):
+        field = replace["field"]
+        value = new.get(field) or ""
+        if replace.get("regex"):
+            new[field] = re.sub(replace["find"], replace.get("replace", ""), value)
+        else:
+            new[field] = value.replace(replace["find"], replace.get("replace", ""))
+    new.update(edit.get("set") or {})
+    return {k: v for k, v in new.items() if (v or "") != (current.get(k) or "")}
+
+
+def write_tags(job):
+    """Applies a tag edit (see plan_tag_changes) to one file. Job is (file_path, edit).
+
+    The file is copied, the copy is edited and synced, and then renamed over the original, so a
+    crash or full disk never leaves a half-written audio file. Safe to run in worker processes:
+    returns (file_path, info, changed, error) where info is a fresh read_track_info() dict.
+    """
+    file_path, edit = job
+    tmp_path = os.path.join(os.path.dirname(file_path), f".{os.path.basename(file_path)}.musicova-tmp")
+    try:
+        audio_file = MutagenFile(file_path, easy=True)
+        if audio_file is None:
+            return file_path, None, False, "Unrecognised audio format"
+        if hasattr(audio_file.tags, "getall"): # Raw ID3 (e.g. in WAV) has no easy key interface
+            return file_path, None, False, UNSUPPORTED_TAGS_ERROR
+        current = {key: (audio_file.get(key) or [None])[0] for key in EDITABLE_TAGS}
+        changes = plan_tag_changes(file_path, current, edit)
+        if not changes:
+            return file_path, read_track_info(file_path), False, None
+
+        shutil.copy2(file_path, tmp_path) # Keeps permissions
+        audio_file = MutagenFile(tmp_path, easy=True)
+        if audio_file.tags is None:
+            audio_file.add_tags()
+            if hasattr(audio_file.tags, "getall"):
+                raise ValueError(UNSUPPORTED_TAGS_ERROR)
+        for key, value in changes.items():
+            if value:
+                audio_file[key] = [value]
+            elif key in audio_file:
+                del audio_file[key]
+        audio_file.save()
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+        return file_path, read_track_info(file_path), True, None
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return file_path, None, False, str(e)
+
+
+def is_entry_current(entry, file_path):
+    """True if an index entry still matches the file on disk (same size and mtime)."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return False
+    return entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+
+
+def new_index():
+    return {"version": INDEX_VERSION, "tracks": {}}
+
+
+def load_index(index_path):
+    """Loads a library index, or returns an empty one if the file is missing, unreadable or outdated."""
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return new_index()
+    except (json.JSONDecodeError, UnicodeDecodeError) as e: # Truncated or overwritten by something else
+        print(f"Index {index_path} is damaged ({e}), rebuilding it.")
+        return new_index()
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION or not isinstance(index.get("tracks"), dict):
+        print(f"Index {index_path} has an old or unknown layout, rebuilding it.")
+        return new_index()
+    return index
+
+
+def save_index(index, index_path):
+    """Writes the index atomically (temp file + rename) so an interrupted run never corrupts it."""
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, index_path)
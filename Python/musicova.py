@@ -1,13 +1,37 @@
 import sys
 import os
-import pygame # Keep pygame for audio playback
+import multiprocessing
+import single_instance # Loads only QtCore/QtNetwork
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support() # Audio engine and pool processes of frozen builds run from here, not hand off
+    # A second launch hands its command line to the running window and exits here, before the heavy imports below
+    instance_lock = single_instance.claim_or_hand_off(sys.argv[1:])
+
+import re
+import argparse
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QLabel, QSlider, QComboBox, QFileDialog,
-                             QScrollArea, QStackedWidget, QFrame, QSpacerItem, QSizePolicy)
-from PyQt5.QtGui import QFont, QPixmap, QImage, QIcon, QPalette, QColor, QPainter, QBrush
-from PyQt5.QtCore import Qt, QSize, QTimer, QUrl, QRect
+                             QPushButton, QLabel, QSlider, QComboBox, QFileDialog, QLineEdit,
+                             QScrollArea, QStackedWidget, QFrame, QSpacerItem, QSizePolicy,
+                             QCheckBox, QDialog, QDialogButtonBox, QFormLayout, QGroupBox, QMessageBox,
+                             QProgressDialog)
+from PyQt5.QtGui import QFont, QFontDatabase, QPixmap, QImage, QIcon, QPalette, QColor, QPainter, QBrush
+from PyQt5.QtCore import Qt, QSize, QTimer, QUrl, QRect, QRectF, QObject, QEvent, pyqtSignal
 from PIL import Image # Keep PIL for image manipulation if needed before converting to QPixmap
 from mutagen import File as MutagenFile # Keep mutagen for metadata
+import library # Headless scanning/metadata helpers shared with musicova_cli.py
+import transcode # Playlist export to OGG/MP3, shared with musicova_cli.py
+import decoders # Backend timings are measured here, in the background, when new formats are added
+from spectrum import SpectrumAnalyzer # Visualizer frame math, allocation-free per frame
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from similarity import SimilarityIndex, extract_features # Acoustic descriptors for "play similar" and radio
+from track_table import TrackTable, SmartPlaylist, QueryError # Columnar playlist metadata and smart filters
+from control_api import ControlServer, DEFAULT_PORT as DEFAULT_CONTROL_PORT # Opt-in local control API
+from stream_server import StreamServer, DEFAULT_HOST as DEFAULT_STREAM_HOST, DEFAULT_PORT as DEFAULT_STREAM_PORT # Opt-in HTTP streaming for the web player
+from audio_engine import AudioEngine, MIXER_RATE, ENGINE_LOST, PLAYING as ENGINE_PLAYING, ENDED as ENGINE_ENDED # Playback runs in its own process
+from single_instance import InstanceServer
+from prefetch import Prefetcher, DEFAULT_DEPTH as DEFAULT_PREFETCH_DEPTH, DEFAULT_BYTES_PER_SEC as DEFAULT_PREFETCH_BYTES_PER_SEC
 
 # FontAwesome Unicode characters (replace tkfontawesome)
 FA_ICONS = {
@@ -22,6 +46,8 @@ FA_ICONS = {
     "arrow-left": "\uf060",
     "folder-open": "\uf07c", # Example for import
     "file-audio": "\uf1c7", # Example for import
+    "shuffle": "\uf074", # Play similar
+    "radio": "\uf519", # Smart radio toggle
 }
 
 # --- THEME_COLORS Definition (remains, will be used to generate QSS) ---
@@ -47,6 +73,9 @@ THEME_COLORS = {
 # Placeholder for where the logo is expected
 LOGO_PATH = "Python/Musicova logo v2.png"
 FONT_PATH = "Python/fonts/DynaPuff-Regular.ttf" # Assuming this is the path
+# Worker pools start fresh interpreters: forking this threaded Qt process can copy a held lock
+# (Qt's, the audio engine's, the logging module's) into the child and deadlock it
+WORKER_CONTEXT = multiprocessing.get_context("spawn")
 
 # --- AudioTrackWidget Class (QWidget) ---
 class AudioTrackWidget(QWidget):
@@ -58,44 +87,46 @@ class AudioTrackWidget(QWidget):
         self.on_play_callback = on_play_callback
         self.on_remove_callback = on_remove_callback
 
-        self.sound = None
         self.duration_sec = 0
         self.is_playing = False
         self.is_paused = False
         self.display_name = os.path.basename(self.file_path) # Default
+        self.title = self.artist = self.album = None
 
         self._load_audio_meta()
         self._init_ui()
         self.update_theme() # Apply initial theme via QSS or direct styling
+        # Audio is decoded by the audio engine process when the track plays (see audio_engine.py);
+        # until then the duration comes from the tags
+        self.total_time_label.setText(self._format_time(self.duration_sec))
 
-        try:
-            self.sound = pygame.mixer.Sound(file_path)
-            self.duration_sec = self.sound.get_length()
-            self.total_time_label.setText(self._format_time(self.duration_sec))
-        except pygame.error as e:
-            print(f"Error loading sound {file_path}: {e}")
-            self.track_name_label.setText(f"{self.display_name} (Error)")
-            self.play_pause_button.setEnabled(False)
-        except Exception as e: # Catch other potential errors during init
-            print(f"General error initializing track {file_path}: {e}")
-            if hasattr(self, 'track_name_label'):
-                self.track_name_label.setText(f"{self.display_name} (Load Error)")
-            if hasattr(self, 'play_pause_button'):
-                self.play_pause_button.setEnabled(False)
+    def set_duration(self, duration_sec): # Exact length reported by the audio engine; True if it changed
+        if duration_sec > 0 and abs(duration_sec - self.duration_sec) > 0.05:
+            self.duration_sec = duration_sec
+            self.total_time_label.setText(self._format_time(duration_sec))
+            return True
+        return False
+
+    def mark_unplayable(self, message):
+        print(f"Error loading sound {self.file_path}: {message}")
+        self.track_name_label.setText(f"{self.display_name} (Error)")
+        self.play_pause_button.setEnabled(False)
 
 
     def _load_audio_meta(self):
         try:
             audio_file = MutagenFile(self.file_path, easy=True)
+            # Shown until the sound is decoded on first play. Not under "if audio_file": a file
+            # without tags is falsy but still has stream info
+            if audio_file is not None and audio_file.info is not None:
+                self.duration_sec = float(getattr(audio_file.info, 'length', 0) or 0)
             if audio_file:
                 title = audio_file.get('title', [None])[0]
                 artist = audio_file.get('artist', [None])[0]
-                if title and artist:
-                    self.display_name = f"{artist} - {title}"
-                elif title:
-                    self.display_name = title
-                elif artist: # Less common to have artist but not title, but possible
-                    self.display_name = f"{artist} - {os.path.splitext(os.path.basename(self.file_path))[0]}"
+                self.title, self.artist = title, artist
+                self.album = audio_file.get('album', [None])[0]
+                if title or artist:
+                    self.display_name = library.make_display_name(self.file_path, title, artist)
             # Album art extraction would go here if implemented
         except Exception as e:
             print(f"Error reading metadata for {self.file_path}: {e}")
@@ -114,6 +145,10 @@ class AudioTrackWidget(QWidget):
         # Top part: Album art, Track name, Time
         top_layout = QHBoxLayout()
 
+        self.select_checkbox = QCheckBox() # Multi-select for batch actions such as tag editing
+        self.select_checkbox.setToolTip("Select for batch tag editing")
+        top_layout.addWidget(self.select_checkbox)
+
         self.album_art_label = QLabel("Art") # Placeholder
         self.album_art_label.setFixedSize(60, 60)
         self.album_art_label.setStyleSheet("background-color: grey; border: 1px solid black;") # Basic placeholder
@@ -147,8 +182,9 @@ class AudioTrackWidget(QWidget):
         self.progress_slider.setObjectName("ProgressSlider")
         self.progress_slider.setRange(0, 1000) # Represents permillage for smoother seeking
         self.progress_slider.setValue(0)
-        self.progress_slider.sliderMoved.connect(self.seek_audio_from_slider) # User drag
-        self.progress_slider.valueChanged.connect(self.seek_audio_from_slider_click) # Click on bar
+        self.progress_slider.sliderMoved.connect(self.preview_seek_from_slider) # User drag: show the time
+        self.progress_slider.sliderReleased.connect(lambda: self.seek_audio_from_slider(self.progress_slider.value()))
+        self.progress_slider.valueChanged.connect(self.seek_audio_from_slider_click) # Click on bar, arrow keys
         main_layout.addWidget(self.progress_slider)
 
         # Controls Frame
@@ -167,12 +203,18 @@ class AudioTrackWidget(QWidget):
         self.volume_slider.valueChanged.connect(self.set_volume_from_slider)
         self.volume_slider.setFixedWidth(80)
 
+        self.similar_button = QPushButton(FA_ICONS["shuffle"])
+        self.similar_button.setObjectName("IconPlainButton")
+        self.similar_button.setToolTip("Play a similar track")
+        self.similar_button.clicked.connect(lambda: self.parent_app.play_similar(self))
+
         remove_button = QPushButton(FA_ICONS["trash-can"])
         remove_button.setObjectName("IconPlainButton")
         remove_button.clicked.connect(self._remove_self)
 
         controls_layout.addStretch()
         controls_layout.addWidget(self.play_pause_button)
+        controls_layout.addWidget(self.similar_button)
         controls_layout.addStretch()
         controls_layout.addWidget(QLabel("Vol:")) # Simple label
         controls_layout.addWidget(self.volume_slider)
@@ -192,60 +234,74 @@ class AudioTrackWidget(QWidget):
     def set_progress_display(self, current_time_sec, percentage_permille): # percentage is 0-1000
         self.current_time_label.setText(self._format_time(current_time_sec))
         if not self.progress_slider.isSliderDown(): # Don't update if user is dragging
-            self.progress_slider.setValue(int(percentage_permille))
+            self._set_slider_position(int(percentage_permille))
+
+    def _set_slider_position(self, value_permille):
+        # Progress updates must not come back through valueChanged as a seek
+        self.progress_slider.blockSignals(True)
+        self.progress_slider.setValue(value_permille)
+        self.progress_slider.blockSignals(False)
+
+    def update_tags(self, info): # info is a library.read_track_info() dict
+        self.title, self.artist, self.album = info["title"], info["artist"], info["album"]
+        self.display_name = info["display_name"]
+        self.track_name_label.setText(self.display_name)
 
     def toggle_play_pause(self):
         self.on_play_callback(self)
 
-    def play(self, channel): # Expects a pygame channel
-        if self.sound:
-            channel.play(self.sound)
-            self.is_playing = True
-            self.is_paused = False
-            self.play_pause_button.setText(FA_ICONS["pause"])
-            self.parent_app.set_active_card_style(self, True)
+    def play(self, engine): # Expects the AudioEngine; returns the playback generation
+        generation = engine.play(self.file_path, volume=self.volume_slider.value() / 100.0)
+        self.is_playing = True
+        self.is_paused = False
+        self.play_pause_button.setText(FA_ICONS["pause"])
+        self.parent_app.set_active_card_style(self, True)
+        return generation
 
-    def pause(self, channel):
-        if self.sound and self.is_playing:
-            channel.pause()
+    def pause(self, engine):
+        if self.is_playing:
+            engine.pause()
             self.is_paused = True # is_playing remains true, but it's paused
             self.play_pause_button.setText(FA_ICONS["play"])
             # Active style might remain or change based on preference
             # self.parent_app.set_active_card_style(self, False) # Optional: remove active style on pause
 
-    def resume(self, channel):
-        if self.sound and self.is_paused:
-            channel.unpause()
+    def resume(self, engine):
+        if self.is_paused:
+            engine.resume()
             self.is_paused = False
             self.play_pause_button.setText(FA_ICONS["pause"])
             self.parent_app.set_active_card_style(self, True)
 
-    def stop(self, channel):
-        if self.sound:
-            channel.stop()
-            self.is_playing = False
-            self.is_paused = False
-            self.play_pause_button.setText(FA_ICONS["play"])
-            self.progress_slider.setValue(0)
-            self.current_time_label.setText("0:00")
-            self.parent_app.set_active_card_style(self, False)
+    def stop(self, engine):
+        if self.is_playing:
+            engine.stop()
+        self.is_playing = False
+        self.is_paused = False
+        self.play_pause_button.setText(FA_ICONS["play"])
+        self._set_slider_position(0)
+        self.current_time_label.setText("0:00")
+        self.parent_app.set_active_card_style(self, False)
 
     def set_volume_from_slider(self, value):
-        if self.sound:
-            self.sound.set_volume(float(value) / 100.0)
+        if self.parent_app.currently_playing_widget == self:
+            self.parent_app.audio_engine.set_volume(float(value) / 100.0)
 
     def set_volume_direct(self, volume_float): # 0.0 to 1.0
-        if self.sound:
-            self.sound.set_volume(volume_float)
-            self.volume_slider.setValue(int(volume_float * 100))
+        self.volume_slider.setValue(int(volume_float * 100)) # valueChanged forwards it to the engine
+
+    def preview_seek_from_slider(self, value_permille): # value is 0-1000
+        if self.duration_sec > 0:
+            if self.parent_app.currently_playing_widget == self:
+                self.parent_app.pause_prefetch() # Leave the disk to the seek that follows on release
+            self.current_time_label.setText(self._format_time(float(value_permille) / 1000.0 * self.duration_sec))
 
     def seek_audio_from_slider(self, value_permille): # value is 0-1000
-        if self.sound and self.duration_sec > 0:
+        if self.duration_sec > 0:
             seek_time_sec = (float(value_permille) / 1000.0) * self.duration_sec
             self.current_time_label.setText(self._format_time(seek_time_sec)) # Update display immediately
-            # Actual seeking is handled by parent app on slider release or value changed if not dragging
-            if self.parent_app.currently_playing_widget == self and not self.progress_slider.isSliderDown():
-                 self.parent_app.seek_playback(seek_time_sec)
+            if self.parent_app.currently_playing_widget == self:
+                self.parent_app.seek_playback(seek_time_sec) # Also pauses prefetching for a moment
 
 
     def seek_audio_from_slider_click(self, value_permille):
@@ -279,6 +335,7 @@ class AudioTrackWidget(QWidget):
         icon_font = self.parent_app.font_families["icon"]
         button_font = QFont(icon_font, theme_settings["font_size_icon_button"])
         self.play_pause_button.setFont(button_font)
+        self.similar_button.setFont(button_font)
         # self.remove_button.setFont(button_font) # remove_button is local, find it or make it instance var
 
         # Find remove_button in layout to set font (example, better to make it self.remove_button)
@@ -287,40 +344,348 @@ class AudioTrackWidget(QWidget):
             if isinstance(widget, QPushButton) and widget.text() == FA_ICONS["trash-can"]:
                 widget.setFont(button_font)
                 break
-        self.parent_app.apply_stylesheet() # Trigger global stylesheet refresh if needed
+        # No apply_stylesheet() here: it calls update_theme() on every card, which would recurse
+
+
+# --- ControlBridge Class (QObject) ---
+# Carries commands from the control API thread to the GUI thread. Emitting the signal from the
+# server thread queues the call on the Qt event loop, so player methods only ever run on the GUI thread.
+class ControlBridge(QObject):
+    command_requested = pyqtSignal(str, object, object) # command, params, Future
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.command_requested.connect(self._run_command)
+
+    def dispatch(self, command, params): # Called on the control API thread
+        future = Future()
+        self.command_requested.emit(command, params, future)
+        return future
+
+    def _run_command(self, command, params, future): # Runs on the GUI thread
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self.handler(command, params))
+        except Exception as e:
+            future.set_exception(e)
+
+
+# --- SpectrumVisualizerWidget Class (QWidget) ---
+class SpectrumVisualizerWidget(QWidget):
+    """Spectrum analyser bars plus a stereo VU meter for the PCM that is currently playing.
+
+    The frame math lives in spectrum.py and works in preallocated buffers; a frame here is one
+    analyze() call and one QPainter pass. The frame timer only runs while the panel is visible,
+    the window is not minimised and there is something to show, so a hidden panel costs nothing.
+    """
+    FRAME_INTERVAL_MS = 16 # ~60 fps
+    METER_WIDTH = 14
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.source = source # Callable filling a float32 (spectrum.FFT_SIZE, 2) frame; returns the sample rate, or None
+        self.setMinimumHeight(90)
+        self.bar_color = QColor("blueviolet")
+        self.suspended = False
+        self.analyzer = SpectrumAnalyzer()
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.setInterval(self.FRAME_INTERVAL_MS)
+        self.frame_timer.timeout.connect(self._next_frame)
+
+    def wake(self):
+        """Called when playback starts; begins drawing if the panel can be seen."""
+        if self.isVisible() and not self.suspended and not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def set_suspended(self, suspended): # Window minimised
+        self.suspended = suspended
+        if suspended:
+            self.frame_timer.stop()
+        else:
+            self.wake()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.wake()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.frame_timer.stop()
+
+    def _next_frame(self):
+        sample_rate = self.source(self.analyzer.frame)
+        if sample_rate is None: # Nothing playing: let the bars fall, then stop the timer
+            if not self.analyzer.decay():
+                self.frame_timer.stop()
+        else:
+            self.analyzer.analyze(sample_rate)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        levels = self.analyzer.levels
+        spectrum_width = width - 2 * (self.METER_WIDTH + 4)
+        bar_width = spectrum_width / len(levels)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.bar_color)
+        for band, level in enumerate(levels.tolist()):
+            bar_height = level * height
+            painter.drawRect(QRectF(band * bar_width + 1, height - bar_height, bar_width - 2, bar_height))
+        for channel, level in enumerate(self.analyzer.vu.tolist()): # Left and right meters at the right edge
+            x = spectrum_width + 4 + channel * (self.METER_WIDTH + 4)
+            painter.drawRect(QRectF(x, height - level * height, self.METER_WIDTH, level * height))
+        painter.end()
+
+
+# --- TagEditorDialog Class (QDialog) ---
+class TagEditorDialog(QDialog):
+    """Collects one batch tag edit (see library.plan_tag_changes) for a set of tracks."""
+
+    def __init__(self, track_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Edit Tags ({track_count} track{'s' if track_count != 1 else ''})")
+        layout = QVBoxLayout(self)
+
+        set_group = QGroupBox("Set (leave empty to keep)")
+        set_form = QFormLayout(set_group)
+        self.set_edits = {}
+        for key in library.EDITABLE_TAGS:
+            edit = QLineEdit()
+            set_form.addRow(key.capitalize(), edit)
+            self.set_edits[key] = edit
+        layout.addWidget(set_group)
+
+        replace_group = QGroupBox("Find and replace")
+        replace_form = QFormLayout(replace_group)
+        self.replace_field_combo = QComboBox()
+        self.replace_field_combo.addItems(library.EDITABLE_TAGS)
+        self.find_edit = QLineEdit()
+        self.replace_edit = QLineEdit()
+        self.regex_checkbox = QCheckBox("Regular expression")
+        replace_form.addRow("In", self.replace_field_combo)
+        replace_form.addRow("Find", self.find_edit)
+        replace_form.addRow("Replace with", self.replace_edit)
+        replace_form.addRow("", self.regex_checkbox)
+        layout.addWidget(replace_group)
+
+        pattern_group = QGroupBox("Fill from file name")
+        pattern_form = QFormLayout(pattern_group)
+        self.pattern_edit = QLineEdit()
+        self.pattern_edit.setPlaceholderText("%tracknumber% - %artist% - %title%")
+        pattern_form.addRow("Pattern", self.pattern_edit)
+        layout.addWidget(pattern_group)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self._validate_and_accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def edit(self):
+        edit = {"set": {k: e.text().strip() for k, e in self.set_edits.items() if e.text().strip()}}
+        if self.find_edit.text():
+            edit["replace"] = {"field": self.replace_field_combo.currentText(), "find": self.find_edit.text(),
+                               "replace": self.replace_edit.text(), "regex": self.regex_checkbox.isChecked()}
+        if self.pattern_edit.text().strip():
+            edit["pattern"] = self.pattern_edit.text().strip()
+        return edit
+
+    def _validate_and_accept(self):
+        edit = self.edit() # Check patterns here so mistakes are reported before any file is touched
+        try:
+            if "pattern" in edit:
+                library.filename_pattern_regex(edit["pattern"])
+            if edit.get("replace", {}).get("regex"):
+                re.compile(edit["replace"]["find"])
+        except (ValueError, re.error) as e:
+            QMessageBox.warning(self, "Edit Tags", str(e))
+            return
+        self.accept()
+
+
+# --- ExportPlaylistDialog Class (QDialog) ---
+class ExportPlaylistDialog(QDialog):
+    """Asks for the destination folder, format and bitrate of a playlist export (see transcode.py)."""
+
+    def __init__(self, track_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Export Playlist ({track_count} track{'s' if track_count != 1 else ''})")
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+
+        folder_layout = QHBoxLayout()
+        self.folder_edit = QLineEdit()
+        self.folder_edit.setPlaceholderText("Folder or USB stick")
+        browse_button = QPushButton("Browse...")
+        browse_button.clicked.connect(self._browse)
+        folder_layout.addWidget(self.folder_edit)
+        folder_layout.addWidget(browse_button)
+        form.addRow("To", folder_layout)
+
+        self.format_combo = QComboBox()
+        self.format_combo.addItems([name.upper() for name in transcode.FORMATS])
+        self.format_combo.setCurrentText(transcode.DEFAULT_FORMAT.upper())
+        form.addRow("Format", self.format_combo)
+        self.bitrate_combo = QComboBox()
+        self.bitrate_combo.addItems([f"{kbps} kbit/s" for kbps in transcode.BITRATES_KBPS])
+        self.bitrate_combo.setCurrentIndex(transcode.BITRATES_KBPS.index(transcode.DEFAULT_BITRATE_KBPS))
+        form.addRow("Bitrate", self.bitrate_combo)
+        self.numbered_checkbox = QCheckBox("Number files in playlist order")
+        form.addRow("", self.numbered_checkbox)
+        layout.addLayout(form)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self._validate_and_accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def _browse(self):
+        folder = QFileDialog.getExistingDirectory(self, "Export to Folder", self.folder_edit.text())
+        if folder:
+            self.folder_edit.setText(folder)
+
+    def settings(self):
+        """(output_dir, format, bitrate_kbps, numbered)"""
+        return (self.folder_edit.text().strip(), self.format_combo.currentText().lower(),
+                transcode.BITRATES_KBPS[self.bitrate_combo.currentIndex()], self.numbered_checkbox.isChecked())
+
+    def _validate_and_accept(self):
+        folder = self.folder_edit.text().strip()
+        try:
+            if not folder:
+                raise OSError("Choose a destination folder")
+            os.makedirs(folder, exist_ok=True)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Playlist", str(e))
+            return
+        self.accept()
 
 
 # --- MusicovaApp Class (QMainWindow) ---
 class MusicovaApp(QMainWindow):
-    def __init__(self):
+    features_computed = pyqtSignal(object) # Result tuple from similarity.extract_features, emitted from pool threads
+    tags_written = pyqtSignal(object) # Result tuple from library.write_tags, emitted from pool threads
+    track_exported = pyqtSignal(object) # Result tuple from transcode.transcode_track, emitted from pool threads
+
+    def __init__(self, control_port=None, stream_port=None, stream_host=DEFAULT_STREAM_HOST,
+                 prefetch_depth=DEFAULT_PREFETCH_DEPTH, prefetch_bytes_per_sec=DEFAULT_PREFETCH_BYTES_PER_SEC, audio_engine_mode="process", single_instance=False):
         super().__init__()
         self.current_theme = "light" # Default theme
-        self._init_pygame()
+        self.playlist = [] # Stores AudioTrackWidget instances; apply_stylesheet() below walks it
+        self.currently_playing_widget = None
+        # Decoding and output run in a separate process (see audio_engine.py), so nothing the GUI
+        # thread does can interrupt playback; "thread" keeps the engine in-process for comparison
+        self.audio_engine = AudioEngine(in_process=audio_engine_mode == "thread")
         self._init_fonts() # Initialize QFont objects
         self._init_ui()
         self.apply_stylesheet() # Apply initial theme
 
-        self.playlist = [] # Stores AudioTrackWidget instances
-        self.currently_playing_widget = None
-        self.playback_start_time_abs = 0 # time.monotonic() when playback started/resumed
-        self.paused_at_sec = 0 # Position where playback was paused
-
-        # Pygame setup for audio playback
-        self.audio_channel = pygame.mixer.Channel(0) # Use a specific channel
+        self.playback_generation = 0 # AudioEngine generation of the current track
+        self.track_start_recorded = True # Time-to-first-sample of the current track logged yet?
 
+        # Polls the engine's shared-memory status; cheap, so often enough to move on promptly at track end
         self.progress_update_timer = QTimer(self)
         self.progress_update_timer.timeout.connect(self._update_current_track_progress)
-        self.progress_update_timer.setInterval(250) # ms
+        self.progress_update_timer.setInterval(100) # ms
+
+        # Acoustic similarity ("play similar" and radio). Descriptors are computed once per file in a
+        # process pool and kept in the same feature store musicova_cli.py analyze writes to.
+        self.similarity_index = SimilarityIndex.load(library.DEFAULT_FEATURES_PATH)
+        self.feature_pool = None # Created on first import
+        self.features_in_progress = set()
+        self.decoder_calibrations = set() # Extensions whose decoder backends are being timed on feature_pool
+        self.features_computed.connect(self._on_features_computed)
+        self.features_save_timer = QTimer(self)
+        self.features_save_timer.setSingleShot(True) # Batch saves while an import is being analysed
+        self.features_save_timer.setInterval(2000)
+        self.features_save_timer.timeout.connect(self._save_similarity_index)
+        self.radio_enabled = False
+        self.play_history = deque(maxlen=20) # Recently started tracks, oldest first; seeds the radio
+
+        # Batch tag editing; files are rewritten in worker processes
+        self.tag_pool = None # Created on first edit
+        self.tag_jobs_pending = 0
+        self.tag_batch_results = [] # (file_path, info) of files changed by the running batch
+        self.tags_written.connect(self._on_tags_written)
+
+        # Playlist export (transcoding); one export at a time, using every core at low priority
+        self.export_pool = None # Created on first export
+        self.export_futures = []
+        self.export_pending = 0
+        self.export_plan = []
+        self.export_dir = None
+        self.export_durations = {}
+        self.export_results = {} # file_path -> status of the running export
+        self.export_manifest = {} # transcode.load_manifest() of export_dir, updated as tracks finish
+        self.export_errors = []
+        self.export_cancelled = False
+        self.export_progress = None # Non-modal QProgressDialog while an export runs
+        self.track_exported.connect(self._on_track_exported)
+
+        # Columnar copy of the playlist's metadata; smart filters query it instead of walking the cards
+        self.track_table = TrackTable()
+        self.smart_playlist = None # Active SmartPlaylist, or None when the filter box is empty
+        self.unfiltered_order = [] # The playlist order from before the smart filter, restored when it is cleared
+
+        # Read-ahead of the next queued files, for libraries on NAS mounts (0 disables it)
+        self.prefetcher = None
+        if prefetch_depth > 0:
+            self.prefetcher = Prefetcher(depth=prefetch_depth, bytes_per_sec=prefetch_bytes_per_sec)
+            self.prefetcher.start()
+
+        self.control_server = None
+        if control_port is not None:
+            self._start_control_server(control_port)
+        self.stream_server = None
+        if stream_port is not None:
+            self._start_stream_server(stream_port, stream_host)
+        self.instance_server = None
+        if single_instance:
+            self._start_instance_server()
 
         self.show_frame("home")
 
-    def _init_pygame(self):
+    def _start_control_server(self, port):
+        self.control_bridge = ControlBridge(self._handle_control_command, self)
+        self.control_server = ControlServer(self.control_bridge.dispatch, port=port)
+        try:
+            self.control_server.start()
+            print(f"Control API listening on http://127.0.0.1:{port}")
+        except OSError as e:
+            print(f"Could not start control API on port {port}: {e}")
+            self.control_server = None
+
+    def _start_stream_server(self, port, host):
+        try:
+            self.stream_server = StreamServer(host=host, port=port)
+        except OSError as e:
+            print(f"Could not start streaming server on {host}:{port}: {e}")
+            return
+        self.stream_server.start()
+        print(f"Streaming server listening on http://{host}:{port}")
+
+    def _start_instance_server(self):
+        self.instance_server = InstanceServer(self)
+        self.instance_server.command_line_received.connect(self.handle_command_line)
+        if not self.instance_server.listen():
+            self.instance_server = None
+
+    def handle_command_line(self, argv, cwd):
+        """Command line of a later launch, handed over by single_instance.py."""
         try:
-            pygame.mixer.init(frequency=44100, size=-16, channels=1, buffer=2048) # Using 1 channel for simplicity
-            pygame.init() # Init other modules if needed
-        except pygame.error as e:
-            print(f"Error initializing pygame.mixer: {e}")
-            # Show error dialog to user?
+            args, _ = build_arg_parser().parse_known_args(argv)
+        except SystemExit: # argparse has printed the problem
+            return
+        if args.files:
+            self.open_files([os.path.join(cwd, f) for f in args.files], play=not args.enqueue)
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
 
     def _init_fonts(self):
         # Load custom font if specified and available
@@ -330,9 +695,7 @@ class MusicovaApp(QMainWindow):
         # Fallback to generic families if custom font fails.
 
         # It's good practice to load custom fonts using QFontDatabase
-        font_db = self.fontDatabase() if hasattr(self, 'fontDatabase') else QApplication.fontDatabase()
-
-        dyna_puff_id = font_db.addApplicationFont(FONT_PATH)
+        dyna_puff_id = QFontDatabase.addApplicationFont(FONT_PATH)
         dyna_puff_family_name = "DynaPuff"
         if dyna_puff_id != -1:
             dyna_puff_family_name = QFontDatabase.applicationFontFamilies(dyna_puff_id)[0]
@@ -551,6 +914,7 @@ class MusicovaApp(QMainWindow):
         self.setStyleSheet(qss)
         # Re-apply fonts directly as QSS font-family can be unreliable for app-loaded fonts
         self._update_all_widget_fonts()
+        self.visualizer.bar_color = QColor(THEME_COLORS[self.current_theme]["progress_fill"])
         # Update themes for child widgets if they have specific logic
         for track_widget in self.playlist:
             track_widget.update_theme()
@@ -570,6 +934,10 @@ class MusicovaApp(QMainWindow):
             self.player_screen_content["import_type_combo"].setFont(self.fonts["button"])
             self.player_screen_content["import_button"].setFont(self.fonts["button"])
             self.player_screen_content["clear_playlist_button"].setFont(self.fonts["button"])
+            self.player_screen_content["radio_button"].setFont(self.fonts["button"])
+            self.player_screen_content["edit_tags_button"].setFont(self.fonts["button"])
+            self.player_screen_content["export_button"].setFont(self.fonts["button"])
+            self.player_screen_content["visualizer_button"].setFont(self.fonts["button"])
 
         if hasattr(self, 'dark_mode_toggle_button'):
             self.dark_mode_toggle_button.setFont(self.fonts["icon"]) # Specific icon font
@@ -713,11 +1081,55 @@ class MusicovaApp(QMainWindow):
         clear_playlist_button.clicked.connect(self.handle_clear_playlist)
         self.player_screen_content["clear_playlist_button"] = clear_playlist_button
 
+        edit_tags_button = QPushButton("Edit Tags")
+        edit_tags_button.setObjectName("TButton")
+        edit_tags_button.setToolTip("Edit tags of the selected tracks (or of all shown tracks if none are selected)")
+        edit_tags_button.clicked.connect(self.open_tag_editor)
+        self.player_screen_content["edit_tags_button"] = edit_tags_button
+
+        export_button = QPushButton("Export Playlist")
+        export_button.setObjectName("TButton")
+        export_button.setToolTip("Convert the shown tracks to OGG or MP3 in a folder, e.g. for a USB stick")
+        export_button.clicked.connect(self.open_export_dialog)
+        self.player_screen_content["export_button"] = export_button
+
+        visualizer_button = QPushButton("Visualizer")
+        visualizer_button.setObjectName("TButton")
+        visualizer_button.setCheckable(True)
+        visualizer_button.setChecked(True)
+        visualizer_button.toggled.connect(lambda shown: self.visualizer.setVisible(shown))
+        self.player_screen_content["visualizer_button"] = visualizer_button
+
+        radio_button = QPushButton("Radio: Off")
+        radio_button.setObjectName("TButton")
+        radio_button.setCheckable(True)
+        radio_button.setToolTip("When the playlist ends, keep playing tracks that sound similar")
+        radio_button.toggled.connect(self.set_radio_enabled)
+        self.player_screen_content["radio_button"] = radio_button
+
         import_controls_layout.addWidget(self.import_type_combo)
         import_controls_layout.addWidget(import_button)
         import_controls_layout.addWidget(clear_playlist_button)
+        import_controls_layout.addWidget(edit_tags_button)
+        import_controls_layout.addWidget(export_button)
+        import_controls_layout.addWidget(radio_button)
+        import_controls_layout.addWidget(visualizer_button)
         main_layout.addLayout(import_controls_layout)
 
+        # Smart filter, e.g. "artist = Queen and duration > 5m order by album" (syntax in track_table.py)
+        smart_filter_edit = QLineEdit()
+        smart_filter_edit.setPlaceholderText("Smart filter, e.g. artist = Queen and duration > 5m order by album")
+        smart_filter_edit.setClearButtonEnabled(True)
+        smart_filter_edit.returnPressed.connect(lambda: self.apply_smart_filter(smart_filter_edit.text()))
+        smart_filter_edit.textChanged.connect(lambda text: self.apply_smart_filter("") if not text.strip() else None)
+        main_layout.addWidget(smart_filter_edit)
+        self.player_screen_content["smart_filter_edit"] = smart_filter_edit
+
+        # Spectrum and VU meter of the playing track; stops drawing entirely while hidden
+        self.visualizer = SpectrumVisualizerWidget(self._visualizer_source)
+        main_layout.addWidget(self.visualizer)
+        self.player_screen_content["visualizer"] = self.visualizer
+
         # Tracks Area (Scrollable)
         self.tracks_scroll_area = QScrollArea()
         self.tracks_scroll_area.setWidgetResizable(True)
@@ -747,29 +1159,59 @@ class MusicovaApp(QMainWindow):
         if import_type == "Import File(s)":
             selected_files, _ = QFileDialog.getOpenFileNames(
                 self, "Select Audio Files", "",
-                "Audio Files (*.mp3 *.wav *.ogg *.flac);;All files (*.*)"
+                "Audio Files ({});;All files (*.*)".format(" ".join("*" + ext for ext in library.AUDIO_EXTENSIONS))
             )
             if selected_files: files_to_add.extend(selected_files)
         elif import_type == "Import Folder":
             folder_path = QFileDialog.getExistingDirectory(self, "Select Folder")
             if folder_path:
-                for item in os.listdir(folder_path):
-                    full_path = os.path.join(folder_path, item)
-                    if os.path.isfile(full_path) and item.lower().endswith(('.mp3', '.wav', '.ogg', '.flac')):
-                        files_to_add.append(full_path)
+                files_to_add.extend(library.scan_folder(folder_path, recursive=False))
 
         if files_to_add:
-            for file_path in files_to_add:
-                if any(track.file_path == file_path for track in self.playlist):
-                    print(f"Track {file_path} already in playlist. Skipping.")
-                    continue
-
-                track_widget = AudioTrackWidget(self, file_path, len(self.playlist),
-                                                self.handle_track_play_request,
-                                                self.remove_track_from_playlist)
-                self.tracks_list_layout.addWidget(track_widget)
-                self.playlist.append(track_widget)
+            self.add_tracks(files_to_add)
+
+    def open_files(self, paths, play=True):
+        """Adds files and folders from the command line to the playlist; play=True starts the first one."""
+        file_paths = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path):
+                file_paths.extend(library.scan_folder(path, recursive=False)) # Same as "Import Folder"
+            elif os.path.isfile(path) and library.is_audio_file(path):
+                file_paths.append(path)
+            else:
+                print(f"Cannot open {path}: not an audio file or folder")
+        if not file_paths:
+            return
+        self.add_tracks(file_paths)
+        self.show_frame("player")
+        if play:
+            first = next((t for t in self.playlist if t.file_path == file_paths[0]), None)
+            if first and (first != self.currently_playing_widget or first.is_paused):
+                self.handle_track_play_request(first)
+
+    def add_tracks(self, file_paths):
+        added = []
+        for file_path in file_paths:
+            if any(track.file_path == file_path for track in self.playlist):
+                print(f"Track {file_path} already in playlist. Skipping.")
+                continue
+
+            track_widget = AudioTrackWidget(self, file_path, len(self.playlist),
+                                            self.handle_track_play_request,
+                                            self.remove_track_from_playlist)
+            self.tracks_list_layout.addWidget(track_widget)
+            self.playlist.append(track_widget)
+            added.append(track_widget)
+        if added:
+            self.track_table.upsert_many(self._track_entry(t) for t in added)
+            if self.smart_playlist:
+                self._refresh_smart_filter() # Only the new rows are evaluated
             self.apply_stylesheet() # Update styles for new cards
+            self._notify_queue_changed()
+            self._calibrate_decoders([t.file_path for t in added])
+            self._queue_feature_extraction([t.file_path for t in added])
+        return added
 
 
     def handle_clear_playlist(self):
@@ -777,9 +1219,14 @@ class MusicovaApp(QMainWindow):
         for widget in self.playlist:
             widget.deleteLater() # Safe deletion
         self.playlist.clear()
+        self.track_table = TrackTable()
+        if self.smart_playlist:
+            self.smart_playlist = SmartPlaylist(self.track_table, self.smart_playlist.query.text)
+        self.unfiltered_order = []
         self.currently_playing_widget = None
         if self.progress_update_timer.isActive():
             self.progress_update_timer.stop()
+        self._notify_queue_changed()
         # Clear layout (alternative to deleting one by one if container is recreated)
         # while self.tracks_list_layout.count():
         #     child = self.tracks_list_layout.takeAt(0)
@@ -790,105 +1237,149 @@ class MusicovaApp(QMainWindow):
     def handle_track_play_request(self, track_widget_to_play):
         if self.currently_playing_widget == track_widget_to_play: # Clicked on already playing/paused track
             if track_widget_to_play.is_paused:
-                track_widget_to_play.resume(self.audio_channel)
-                self.playback_start_time_abs = pygame.time.get_ticks() - (self.paused_at_sec * 1000)
+                track_widget_to_play.resume(self.audio_engine)
                 if not self.progress_update_timer.isActive(): self.progress_update_timer.start()
             elif track_widget_to_play.is_playing: # Is playing, so pause it
-                track_widget_to_play.pause(self.audio_channel)
-                self.paused_at_sec = (pygame.time.get_ticks() - self.playback_start_time_abs) / 1000.0
+                track_widget_to_play.pause(self.audio_engine)
                 if self.progress_update_timer.isActive(): self.progress_update_timer.stop()
             # else: was stopped (neither playing nor paused), effectively a new play from start
         else: # Clicked on a new track
             if self.currently_playing_widget:
-                self.currently_playing_widget.stop(self.audio_channel) # Stop previous track
+                self.currently_playing_widget.stop(self.audio_engine) # Stop previous track
 
             self.currently_playing_widget = track_widget_to_play
-            self.currently_playing_widget.play(self.audio_channel)
-            self.playback_start_time_abs = pygame.time.get_ticks() # Record when this new track started
-            self.paused_at_sec = 0 # Reset paused position
+            # The engine opens and decodes the file; _update_current_track_progress picks up
+            # the first sample (or the error) from its status
+            self.playback_generation = self.currently_playing_widget.play(self.audio_engine)
+            self.track_start_recorded = False
+            self.play_history.append(track_widget_to_play.file_path)
             if not self.progress_update_timer.isActive(): self.progress_update_timer.start()
 
-        # Synchronize volume for the newly active track
-        if self.currently_playing_widget and self.currently_playing_widget.sound:
-             current_master_volume = self.currently_playing_widget.volume_slider.value() / 100.0
-             self.currently_playing_widget.sound.set_volume(current_master_volume)
+        self.visualizer.wake()
+        self._notify_state_changed()
 
 
-    def stop_current_playback(self):
-        if self.currently_playing_widget:
-            self.currently_playing_widget.stop(self.audio_channel)
-            self.currently_playing_widget = None
-        if self.progress_update_timer.isActive():
-            self.progress_update_timer.stop()
+    def _visualizer_source(self, frame):
+        track = self.currently_playing_widget
+        if not track or not track.is_playing or track.is_paused:
+            return None
+        self.audio_engine.read_pcm(frame)
+        return MIXER_RATE
 
-    def seek_playback(self, seek_time_sec):
-        if self.currently_playing_widget and self.currently_playing_widget.sound:
-            # Pygame Sound objects play from start or a specific time if re-played.
-            # To seek, we stop, then play again with a start offset.
-            # This is not ideal as it might cause a slight audio glitch.
-            # mixer.music.set_pos() is better but we are using Sound objects on a channel.
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange: # Nothing to draw while minimised
+            self.visualizer.set_suspended(self.isMinimized())
+        super().changeEvent(event)
 
-            # For Sound objects on a channel, the channel itself doesn't support seeking.
-            # We have to stop the sound on the channel and replay it.
-            # The `start` argument to `play()` is for milliseconds.
+    # --- Read-ahead (see prefetch.py) ---
 
-            self.audio_channel.stop() # Stop current playback on the channel
+    def _update_prefetch(self):
+        if not self.prefetcher:
+            return
+        if self.currently_playing_widget in self.playlist:
+            start = self.playlist.index(self.currently_playing_widget) + 1
+        else:
+            start = 0
+        upcoming = [t.file_path for t in self.playlist[start:]
+                    if t.play_pause_button.isEnabled() and not t.isHidden()]
+        self.prefetcher.set_upcoming(upcoming)
 
-            # Convert seek_time_sec to milliseconds for the 'maxtime' or 'fade_ms' like parameters
-            # Sound.play(loops, maxtime, fade_ms)
-            # There isn't a direct 'start_at_offset' for channel.play(Sound).
-            # This means true seeking with Sound objects on channels is complex.
-            # A common workaround is to use pygame.mixer.music for single track playback
-            # or to manage segments of audio if precise seeking on Sound objects is needed.
+    def pause_prefetch(self):
+        if self.prefetcher:
+            self.prefetcher.hold()
 
-            # Given the current structure with Sound objects:
-            # The best we can do is restart the sound and it will play from the beginning.
-            # The visual progress bar is updated, but audio restarts.
-            # This is a limitation of pygame.mixer.Sound with channels for seeking.
+    def _record_track_start(self, track_widget, seconds):
+        if self.prefetcher:
+            prefetched = self.prefetcher.record_start(track_widget.file_path, seconds)
+            print(f"Track start took {seconds * 1000:.0f} ms ({'prefetched' if prefetched else 'cold read'})")
+        self._update_prefetch()
 
-            # Let's assume for now the visual seek is what's primarily achieved,
-            # and if it was playing, it restarts from beginning but timer will reflect the new visual start.
+    def stop_current_playback(self):
+        if self.currently_playing_widget:
+            self.currently_playing_widget.stop(self.audio_engine)
+            self.currently_playing_widget = None
+        if self.progress_update_timer.isActive():
+            self.progress_update_timer.stop()
+        self._notify_state_changed()
 
-            self.audio_channel.play(self.currently_playing_widget.sound) # Plays from beginning
-            self.playback_start_time_abs = pygame.time.get_ticks() - (seek_time_sec * 1000) # Adjust timer to reflect seek
+    def play_relative(self, offset): # offset=1 for next track, -1 for previous
+        if not self.playlist:
+            return
+        if self.currently_playing_widget in self.playlist:
+            new_idx = self.playlist.index(self.currently_playing_widget) + offset
+        else:
+            new_idx = 0
+        if 0 <= new_idx < len(self.playlist) and not self.playlist[new_idx].isHidden(): # Hidden = filtered out
+            self.handle_track_play_request(self.playlist[new_idx])
 
-            if self.currently_playing_widget.is_paused: # If it was paused, re-pause it at the new (visual) position
-                self.audio_channel.pause()
-            elif not self.progress_update_timer.isActive(): # If it was stopped or just seeked, ensure timer runs if meant to be playing
-                self.progress_update_timer.start()
+    def seek_playback(self, seek_time_sec):
+        if self.currently_playing_widget and self.currently_playing_widget.is_playing:
+            self.pause_prefetch()
+            self.audio_engine.seek(seek_time_sec) # Engine repositions the decoder; a paused track stays paused
 
             # Update the display to reflect the seeked time immediately
             if self.currently_playing_widget.duration_sec > 0:
                 permille = (seek_time_sec / self.currently_playing_widget.duration_sec) * 1000
                 self.currently_playing_widget.set_progress_display(seek_time_sec, permille)
+            self._notify_state_changed()
 
 
     def _update_current_track_progress(self):
-        if self.currently_playing_widget and self.currently_playing_widget.is_playing and \
-           not self.currently_playing_widget.is_paused and self.audio_channel.get_busy():
-
-            # Calculate elapsed time since playback_start_time_abs
-            current_pos_msec = pygame.time.get_ticks() - self.playback_start_time_abs
-            current_pos_sec = current_pos_msec / 1000.0
-
-            if self.currently_playing_widget.duration_sec > 0:
-                percentage_permille = (current_pos_sec / self.currently_playing_widget.duration_sec) * 1000
-                self.currently_playing_widget.set_progress_display(current_pos_sec, percentage_permille)
-
-                if current_pos_sec >= self.currently_playing_widget.duration_sec:
-                    self.handle_track_ended(self.currently_playing_widget)
-            else: # Duration is 0, perhaps error or not loaded
-                 self.currently_playing_widget.set_progress_display(0,0)
-
-        elif self.currently_playing_widget and self.currently_playing_widget.is_playing and \
-             not self.currently_playing_widget.is_paused and not self.audio_channel.get_busy():
-            # Sound finished playing (channel is not busy anymore but we thought it was playing)
-            self.handle_track_ended(self.currently_playing_widget)
-
+        track = self.currently_playing_widget
+        for generation, message in self.audio_engine.poll_errors():
+            if generation == ENGINE_LOST:
+                self._restart_audio_engine(message)
+                return
+            if track and generation == self.playback_generation: # File could not be decoded; move on
+                track.mark_unplayable(message)
+                self.handle_track_ended(track)
+                return
+        if not track or not track.is_playing or track.is_paused:
+            return
+        status = self.audio_engine.status()
+        if status.generation != self.playback_generation: # Engine has not picked up the play command yet
+            return
+        if status.first_sample_ms and not self.track_start_recorded:
+            self.track_start_recorded = True
+            self._record_track_start(track, status.first_sample_ms / 1000.0)
+        if status.state == ENGINE_ENDED:
+            self.handle_track_ended(track)
+            return
+        if status.state != ENGINE_PLAYING: # FAILED is handled through poll_errors() above
+            return
+
+        if track.set_duration(status.duration): # Smart filters, the control API and exports see it too
+            self.track_table.upsert(self._track_entry(track))
+        current_pos_sec = status.position
+        if track.duration_sec > 0:
+            percentage_permille = (current_pos_sec / track.duration_sec) * 1000
+            track.set_progress_display(current_pos_sec, percentage_permille)
+            if self.control_server and self.control_server.has_subscribers:
+                self.control_server.publish("position", {"position": round(current_pos_sec, 3)})
+        else: # Duration is 0, perhaps error or not loaded
+            track.set_progress_display(0, 0)
+
+
+    def _restart_audio_engine(self, message):
+        # The engine process is gone (crash, lost audio device): stop the track instead of letting
+        # it look as if it plays forever, and start a fresh engine for the next play
+        print(message)
+        track = self.currently_playing_widget
+        in_process = self.audio_engine.in_process
+        self.audio_engine.close()
+        self.audio_engine = AudioEngine(in_process=in_process)
+        if track:
+            track.stop(self.audio_engine)
+            self.currently_playing_widget = None
+        if self.progress_update_timer.isActive():
+            self.progress_update_timer.stop()
+        self._notify_state_changed()
+        QMessageBox.warning(self, "Playback", f"{message}.\n\nPlayback was stopped and the audio engine restarted; "
+                                              "press play to try again.")
 
     def handle_track_ended(self, track_widget):
         if track_widget == self.currently_playing_widget:
-            track_widget.stop(self.audio_channel) # Visually reset it
+            track_widget.stop(self.audio_engine) # Visually reset it
 
             current_idx = -1
             try:
@@ -898,12 +1389,15 @@ class MusicovaApp(QMainWindow):
                 if self.progress_update_timer.isActive(): self.progress_update_timer.stop()
                 return
 
-            if current_idx + 1 < len(self.playlist): # If there's a next track
+            if current_idx + 1 < len(self.playlist) and not self.playlist[current_idx + 1].isHidden(): # Next track, unless filtered out
                 next_track_widget = self.playlist[current_idx + 1]
                 self.handle_track_play_request(next_track_widget) # Play next
+            elif self.radio_enabled and self._continue_radio(): # End of playlist, radio picked a track
+                pass
             else: # End of playlist
                 self.currently_playing_widget = None
                 if self.progress_update_timer.isActive(): self.progress_update_timer.stop()
+                self._notify_state_changed()
 
 
     def remove_track_from_playlist(self, track_widget_to_remove):
@@ -912,12 +1406,430 @@ class MusicovaApp(QMainWindow):
 
         if track_widget_to_remove in self.playlist:
             self.playlist.remove(track_widget_to_remove)
+            self.track_table.remove(track_widget_to_remove.file_path)
             self.tracks_list_layout.removeWidget(track_widget_to_remove)
             track_widget_to_remove.deleteLater() # Important: schedule for deletion
 
         # Re-index not strictly necessary with object list, but if track_index property is used elsewhere:
         for i, track in enumerate(self.playlist):
             track.track_index = i
+        self._notify_queue_changed()
+
+    def move_track(self, from_idx, to_idx):
+        track_widget = self.playlist.pop(from_idx)
+        to_idx = max(0, min(to_idx, len(self.playlist)))
+        self.playlist.insert(to_idx, track_widget)
+        self.tracks_list_layout.removeWidget(track_widget)
+        self.tracks_list_layout.insertWidget(to_idx, track_widget)
+        for i, track in enumerate(self.playlist):
+            track.track_index = i
+        self._notify_queue_changed()
+
+    # --- Smart filter (see track_table.py) ---
+
+    def _track_entry(self, track_widget):
+        try:
+            stat = os.stat(track_widget.file_path)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size, mtime = 0, 0.0
+        return {"file_path": track_widget.file_path, "display_name": track_widget.display_name,
+                "title": track_widget.title, "artist": track_widget.artist, "album": track_widget.album,
+                "duration_sec": track_widget.duration_sec, "size": size, "mtime": mtime}
+
+    def apply_smart_filter(self, query_text):
+        edit = self.player_screen_content["smart_filter_edit"]
+        if not query_text.strip():
+            edit.setToolTip("")
+            if self.smart_playlist is None:
+                return
+            self.smart_playlist = None
+            # Back to the user's order; tracks added while filtering go at the end, removed ones are gone
+            present = set(self.playlist)
+            restored = [t for t in self.unfiltered_order if t in present]
+            kept = set(restored)
+            self.unfiltered_order = []
+            self._reorder_playlist(restored + [t for t in self.playlist if t not in kept], visible=present)
+            return
+        try:
+            smart_playlist = SmartPlaylist(self.track_table, query_text)
+        except QueryError as e:
+            print(f"Invalid smart filter {query_text!r}: {e}")
+            edit.setToolTip(str(e))
+            return
+        if self.smart_playlist is None:
+            self.unfiltered_order = list(self.playlist)
+        self.smart_playlist = smart_playlist
+        edit.setToolTip("")
+        self._refresh_smart_filter()
+
+    def _refresh_smart_filter(self):
+        """Moves matching tracks to the top in query order and hides the rest (apply_smart_filter("") undoes it)."""
+        by_path = {t.file_path: t for t in self.playlist}
+        matches = [by_path[path] for path in self.smart_playlist.paths() if path in by_path]
+        matched = set(matches)
+        self._reorder_playlist(matches + [t for t in self.playlist if t not in matched], visible=matched)
+
+    def _reorder_playlist(self, tracks, visible):
+        self.playlist = tracks
+        for i, track in enumerate(self.playlist):
+            self.tracks_list_layout.removeWidget(track)
+            self.tracks_list_layout.insertWidget(i, track)
+            track.track_index = i
+            track.setHidden(track not in visible)
+        self._notify_queue_changed()
+
+    # --- Batch tag editing (see library.write_tags) ---
+
+    def open_tag_editor(self):
+        if self.tag_jobs_pending:
+            QMessageBox.information(self, "Edit Tags", "A tag edit is still being written, please wait.")
+            return
+        tracks = [t for t in self.playlist if t.select_checkbox.isChecked()]
+        if not tracks:
+            tracks = [t for t in self.playlist if not t.isHidden()]
+        if not tracks:
+            return
+        dialog = TagEditorDialog(len(tracks), self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.edit_tags(tracks, dialog.edit())
+
+    def edit_tags(self, track_widgets, edit):
+        if self.tag_pool is None:
+            self.tag_pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1), mp_context=WORKER_CONTEXT)
+        self.tag_jobs_pending += len(track_widgets)
+        self.tag_batch_results = []
+        for track_widget in track_widgets:
+            future = self.tag_pool.submit(library.write_tags, (track_widget.file_path, edit))
+            future.add_done_callback(lambda f, p=track_widget.file_path: self._emit_tags_written(f, p))
+
+    def _emit_tags_written(self, future, file_path):
+        # Done-callbacks run on a pool thread; the signal hands the result to the GUI thread
+        if future.cancelled():
+            return
+        error = future.exception()
+        self.tags_written.emit(future.result() if error is None else (file_path, None, False, str(error)))
+
+    def _on_tags_written(self, result):
+        file_path, info, changed, error = result
+        self.tag_jobs_pending -= 1
+        if error:
+            print(f"Could not write tags to {file_path}: {error}")
+        elif changed:
+            self.tag_batch_results.append((file_path, info))
+            for track in self.playlist:
+                if track.file_path == file_path:
+                    track.update_tags(info)
+                    self.track_table.upsert(self._track_entry(track))
+            # Only tags changed, so the acoustic descriptor is still valid
+            self.similarity_index.update_signature(file_path, info["size"], info["mtime"])
+        if self.tag_jobs_pending == 0 and self.tag_batch_results:
+            self._finish_tag_batch()
+
+    def _finish_tag_batch(self):
+        # Update the shared library index (musicova_cli.py) in place for the files that changed
+        index = library.load_index(library.DEFAULT_INDEX_PATH)
+        tracks = index["tracks"]
+        updated = 0
+        for file_path, info in self.tag_batch_results:
+            if file_path in tracks:
+                if "analysis" in tracks[file_path]: # Stream properties are unaffected by tags
+                    info["analysis"] = tracks[file_path]["analysis"]
+                tracks[file_path] = info
+                updated += 1
+        if updated:
+            try:
+                library.save_index(index, library.DEFAULT_INDEX_PATH)
+            except OSError as e:
+                print(f"Could not update library index: {e}")
+        print(f"Tags updated for {len(self.tag_batch_results)} file(s)")
+        self.tag_batch_results = []
+        self.features_save_timer.start()
+        if self.smart_playlist:
+            self._refresh_smart_filter() # Edited rows may now match differently
+        else:
+            self._notify_queue_changed()
+
+    # --- Playlist export (see transcode.py) ---
+
+    def open_export_dialog(self):
+        if self.export_pending:
+            QMessageBox.information(self, "Export Playlist", "An export is still running, please wait or cancel it.")
+            return
+        tracks = [t for t in self.playlist if not t.isHidden() and t.play_pause_button.isEnabled()]
+        if not tracks:
+            return
+        dialog = ExportPlaylistDialog(len(tracks), self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.export_playlist(tracks, *dialog.settings())
+
+    def export_playlist(self, track_widgets, output_dir, fmt, bitrate_kbps, numbered=False):
+        if self.export_pool is None:
+            self.export_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=WORKER_CONTEXT,
+                                                   initializer=transcode.worker_init)
+        self.export_plan = transcode.plan_export([t.file_path for t in track_widgets], output_dir, fmt, numbered)
+        self.export_durations = {t.file_path: t.duration_sec for t in track_widgets}
+        self.export_dir = output_dir
+        self.export_results = {}
+        self.export_manifest = transcode.load_manifest(output_dir)
+        self.export_errors = []
+        self.export_cancelled = False
+        self.export_pending = len(self.export_plan)
+
+        # Non-modal, so playback and the rest of the window stay usable while the pool works
+        self.export_progress = QProgressDialog(f"Exporting to {output_dir}...", "Cancel", 0, self.export_pending, self)
+        self.export_progress.setWindowTitle("Export Playlist")
+        self.export_progress.setWindowModality(Qt.NonModal)
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        self.export_progress.canceled.connect(self.cancel_export)
+        self.export_progress.show()
+
+        self.export_futures = []
+        for file_path, destination in self.export_plan:
+            previous = self.export_manifest.get(os.path.basename(destination))
+            future = self.export_pool.submit(transcode.transcode_track, (file_path, destination, fmt, bitrate_kbps, previous))
+            future.add_done_callback(lambda f, p=file_path, d=destination: self._emit_track_exported(f, p, d))
+            self.export_futures.append(future)
+
+    def cancel_export(self):
+        # Queued tracks are dropped; the few being converted finish, each written atomically
+        self.export_cancelled = True
+        if self.export_progress:
+            self.export_progress.setLabelText("Cancelling...")
+        for future in self.export_futures:
+            future.cancel() # Runs the done-callback right away for tracks not started yet
+
+    def _emit_track_exported(self, future, file_path, destination):
+        # Done-callbacks run on a pool thread (on the GUI thread for cancelled tracks); the signal hands the result over
+        if future.cancelled():
+            self.track_exported.emit((file_path, destination, None, None, None))
+            return
+        error = future.exception()
+        self.track_exported.emit(future.result() if error is None else (file_path, destination, None, str(error), None))
+
+    def _on_track_exported(self, result):
+        file_path, destination, status, error, entry = result
+        self.export_pending -= 1
+        if error:
+            print(f"Could not export {file_path}: {error}")
+            self.export_errors.append(file_path)
+        elif status:
+            self.export_results[file_path] = status
+            self.export_manifest[os.path.basename(destination)] = entry
+        if self.export_progress:
+            self.export_progress.setValue(len(self.export_plan) - self.export_pending)
+            if not self.export_cancelled:
+                self.export_progress.setLabelText(f"Exported {os.path.basename(destination)}")
+        if self.export_pending == 0:
+            self._finish_export()
+
+    def _finish_export(self):
+        exported = [(p, d) for p, d in self.export_plan if p in self.export_results] # Playlist order
+        summary = (f"{len(exported)} of {len(self.export_plan)} track(s) exported to {self.export_dir}"
+                   f" ({sum(s == 'converted' for s in self.export_results.values())} converted,"
+                   f" {len(self.export_errors)} failed)")
+        if exported:
+            try:
+                transcode.write_playlist(exported, self.export_dir, self.export_durations)
+                transcode.save_manifest(self.export_dir, self.export_manifest)
+            except OSError as e:
+                print(f"Could not write playlist: {e}")
+        transcode.prune_cache()
+        self.export_futures = []
+        if self.export_progress:
+            self.export_progress.canceled.disconnect(self.cancel_export) # Closing the dialog emits canceled
+            self.export_progress.close()
+            self.export_progress.deleteLater()
+            self.export_progress = None
+        print(summary)
+        if not self.export_cancelled:
+            QMessageBox.information(self, "Export Playlist", summary)
+
+    # --- Acoustic similarity (see similarity.py) ---
+
+    def _queue_feature_extraction(self, file_paths):
+        pending = [p for p in file_paths
+                   if p not in self.features_in_progress and not self.similarity_index.is_file_current(p)]
+        if not pending:
+            return
+        for file_path in pending:
+            self.features_in_progress.add(file_path)
+            future = self._analysis_pool().submit(extract_features, file_path)
+            future.add_done_callback(lambda f, p=file_path: self._emit_features(f, p))
+
+    def _analysis_pool(self):
+        if self.feature_pool is None:
+            # Leave a core free so analysis never competes with playback and the GUI
+            self.feature_pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1), mp_context=WORKER_CONTEXT)
+        return self.feature_pool
+
+    def _calibrate_decoders(self, file_paths):
+        # Times the decoder backends for formats not seen before on a worker, so the first track
+        # of a new format does not wait for the measurement when it starts playing
+        candidates = [p for p in decoders.calibration_candidates(file_paths)
+                      if os.path.splitext(p)[1].lower() not in self.decoder_calibrations]
+        if not candidates:
+            return
+        extensions = {os.path.splitext(p)[1].lower() for p in candidates}
+        self.decoder_calibrations |= extensions
+        future = self._analysis_pool().submit(decoders.calibrate, candidates)
+        # Only touches this set (atomically under the GIL), so no signal is needed to reach the GUI thread
+        future.add_done_callback(lambda f, e=extensions: self.decoder_calibrations.difference_update(e))
+
+    def _emit_features(self, future, file_path):
+        # Done-callbacks run on a pool thread; the signal hands the result to the GUI thread
+        if future.cancelled(): # Pool shut down on close
+            return
+        error = future.exception() # e.g. a worker process crashed
+        self.features_computed.emit(future.result() if error is None else (file_path, 0, 0.0, None, str(error)))
+
+    def _on_features_computed(self, result):
+        file_path, size, mtime, vector, error = result
+        self.features_in_progress.discard(file_path)
+        if vector is None:
+            print(f"Could not analyse {file_path}: {error}")
+            return
+        self.similarity_index.add(file_path, size, mtime, vector)
+        self.features_save_timer.start()
+
+    def _save_similarity_index(self):
+        try:
+            os.makedirs(library.DATA_DIR, exist_ok=True)
+            self.similarity_index.save(library.DEFAULT_FEATURES_PATH)
+        except OSError as e:
+            print(f"Could not save acoustic features: {e}")
+
+    def _insert_and_play(self, file_path, after_widget=None):
+        existing = [t for t in self.playlist if t.file_path == file_path]
+        track_widget = existing[0] if existing else (self.add_tracks([file_path]) or [None])[0]
+        if track_widget is None:
+            return False
+        if after_widget in self.playlist and not existing: # Queue it right after the seed track
+            self.move_track(self.playlist.index(track_widget), self.playlist.index(after_widget) + 1)
+        self.handle_track_play_request(track_widget)
+        return True
+
+    def play_similar(self, track_widget):
+        if track_widget.file_path not in self.similarity_index:
+            print(f"Still analysing {track_widget.display_name}; try again in a moment.")
+            return
+        playlist_paths = [t.file_path for t in self.playlist]
+        for file_path, _score in self.similarity_index.nearest(track_widget.file_path, k=5, exclude=playlist_paths):
+            if os.path.isfile(file_path) and self._insert_and_play(file_path, after_widget=track_widget):
+                return
+        print(f"No similar tracks found for {track_widget.display_name}.")
+
+    def set_radio_enabled(self, enabled):
+        self.radio_enabled = enabled
+        self.player_screen_content["radio_button"].setText("Radio: On" if enabled else "Radio: Off")
+
+    def _continue_radio(self):
+        playlist_paths = [t.file_path for t in self.playlist]
+        for file_path, _score in self.similarity_index.radio_candidates(list(self.play_history), k=5,
+                                                                          exclude=playlist_paths):
+            if os.path.isfile(file_path) and self._insert_and_play(file_path):
+                return True
+        return False
+
+    # --- Control API (see control_api.py); everything below runs on the GUI thread ---
+
+    def _track_summary(self, track_widget):
+        return {"index": self.playlist.index(track_widget), "file_path": track_widget.file_path,
+                "display_name": track_widget.display_name, "duration_sec": track_widget.duration_sec}
+
+    def _current_position_sec(self):
+        track = self.currently_playing_widget
+        if not track or not track.is_playing:
+            return 0.0
+        status = self.audio_engine.status()
+        return status.position if status.generation == self.playback_generation else 0.0
+
+    def get_playback_state(self):
+        track = self.currently_playing_widget
+        if track and track.is_playing:
+            status = "paused" if track.is_paused else "playing"
+        else:
+            status = "stopped"
+        return {
+            "status": status,
+            "track": self._track_summary(track) if track in self.playlist else None,
+            "position": round(self._current_position_sec(), 3),
+            "queue_length": len(self.playlist),
+        }
+
+    def _notify_state_changed(self):
+        if self.control_server and self.control_server.has_subscribers:
+            self.control_server.publish("state", self.get_playback_state())
+
+    def _notify_queue_changed(self):
+        self._update_prefetch()
+        if self.stream_server: # Listeners on other machines see the same tracks as the playlist
+            self.stream_server.set_tracks({"file_path": t.file_path, "display_name": t.display_name,
+                                           "duration_sec": t.duration_sec} for t in self.playlist)
+        if self.control_server and self.control_server.has_subscribers:
+            self.control_server.publish("queue", {"tracks": [self._track_summary(t) for t in self.playlist]})
+
+    def _handle_control_command(self, command, params):
+        current = self.currently_playing_widget
+        if command == "state":
+            return self.get_playback_state()
+        elif command == "queue":
+            return {"tracks": [self._track_summary(t) for t in self.playlist]}
+        elif command == "stats":
+            return {"prefetch": self.prefetcher.stats() if self.prefetcher else None}
+        elif command == "library":
+            if "query" in params: # Smart filter syntax; QueryError (a ValueError) becomes a 400
+                by_path = {t.file_path: t for t in self.playlist}
+                return {"tracks": [self._track_summary(by_path[path])
+                                   for path in self.track_table.query(str(params["query"])) if path in by_path]}
+            query = str(params.get("q", "")).lower()
+            return {"tracks": [self._track_summary(t) for t in self.playlist
+                               if query in t.display_name.lower() or query in t.file_path.lower()]}
+        elif command == "play":
+            if "index" in params:
+                track = self.playlist[int(params["index"])]
+                if track is current and track.is_playing:
+                    if track.is_paused:
+                        self.handle_track_play_request(track) # Resume; already playing is left alone
+                else:
+                    self.handle_track_play_request(track)
+            elif current and current.is_paused:
+                self.handle_track_play_request(current) # Resume
+            elif not current and self.playlist:
+                self.handle_track_play_request(self.playlist[0])
+        elif command == "pause":
+            if current and current.is_playing and not current.is_paused:
+                self.handle_track_play_request(current) # Toggles to paused
+        elif command == "toggle":
+            if current:
+                self.handle_track_play_request(current)
+            elif self.playlist:
+                self.handle_track_play_request(self.playlist[0])
+        elif command == "stop":
+            self.stop_current_playback()
+        elif command == "next":
+            self.play_relative(1)
+        elif command == "previous":
+            self.play_relative(-1)
+        elif command == "seek":
+            self.seek_playback(float(params["position"]))
+        elif command == "queue_add":
+            paths = params["paths"]
+            if isinstance(paths, str):
+                paths = [paths]
+            existing = [p for p in paths if os.path.isfile(p)]
+            added = self.add_tracks(existing)
+            return {"added": [self._track_summary(t) for t in added]}
+        elif command == "queue_remove":
+            self.remove_track_from_playlist(self.playlist[int(params["index"])])
+        elif command == "queue_move":
+            self.move_track(int(params["from"]), int(params["to"]))
+        elif command == "queue_clear":
+            self.handle_clear_playlist()
+        else:
+            raise ValueError(f"Unknown command: {command}")
+        return self.get_playback_state()
 
 
     def set_active_card_style(self, track_widget, is_active):
@@ -929,26 +1841,70 @@ class MusicovaApp(QMainWindow):
         # self.apply_stylesheet() # Could also reapply global, but might be too much. Polishing should be enough.
 
     def closeEvent(self, event): # Override QMainWindow's closeEvent
+        if self.instance_server: # Later launches start their own window from now on
+            self.instance_server.close()
         self.stop_current_playback()
         if self.progress_update_timer.isActive():
             self.progress_update_timer.stop()
-        pygame.mixer.quit()
-        pygame.quit() # Quit pygame itself
+        if self.control_server:
+            self.control_server.stop()
+        if self.stream_server:
+            self.stream_server.stop()
+        if self.prefetcher:
+            print(f"Prefetch statistics: {self.prefetcher.stats()}")
+            self.prefetcher.stop()
+        if self.feature_pool:
+            self.feature_pool.shutdown(wait=False, cancel_futures=True)
+        if self.export_pool: # Conversions are atomic, so unfinished ones simply leave no file
+            self.export_cancelled = True
+            self.export_pool.shutdown(wait=False, cancel_futures=True)
+        if self.tag_pool: # Let writes already running finish; each one is atomic anyway
+            self.tag_pool.shutdown(wait=True, cancel_futures=True)
+        if self.features_save_timer.isActive(): # Pending descriptors not written yet
+            self.features_save_timer.stop()
+            self._save_similarity_index()
+        self.audio_engine.close()
         event.accept()
 
-    main_window = MusicovaApp()
-    main_window.show()
-    sys.exit(app.exec_())
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog="musicova")
+    arg_parser.add_argument("files", nargs="*", metavar="FILE",
+                            help="Audio files or folders to add to the playlist; the first one starts playing")
+    arg_parser.add_argument("--enqueue", action="store_true",
+                            help="Only add the files, without interrupting what is playing")
+    arg_parser.add_argument("--new-instance", action="store_true",
+                            help="Open a separate window instead of handing the files to the running one")
+    arg_parser.add_argument("--control-api", nargs="?", type=int, const=DEFAULT_CONTROL_PORT, metavar="PORT",
+                            help=f"Enable the local control API on 127.0.0.1 (default port {DEFAULT_CONTROL_PORT})")
+    arg_parser.add_argument("--stream-server", nargs="?", type=int, const=DEFAULT_STREAM_PORT, metavar="PORT",
+                            help=f"Serve playlist tracks to the web player over HTTP (default port {DEFAULT_STREAM_PORT})")
+    arg_parser.add_argument("--stream-host", default=DEFAULT_STREAM_HOST, metavar="ADDRESS",
+                            help="Address the streaming server listens on; 0.0.0.0 shares the playlist on the network "
+                                 "(default %(default)s, this machine only)")
+    arg_parser.add_argument("--prefetch-depth", type=int, default=DEFAULT_PREFETCH_DEPTH, metavar="N",
+                            help=f"Upcoming tracks to read ahead from slow storage, 0 to disable (default {DEFAULT_PREFETCH_DEPTH})")
+    arg_parser.add_argument("--prefetch-budget", type=float, default=DEFAULT_PREFETCH_BYTES_PER_SEC / 2**20, metavar="MB",
+                            help="Read-ahead I/O budget in MiB per second (default %(default)g)")
+    arg_parser.add_argument("--audio-engine", choices=("process", "thread"), default="process",
+                            help="Run decoding and output in a separate process (default) or on a thread of this one")
+    return arg_parser
+
 
 if __name__ == "__main__":
+    args, qt_args = build_arg_parser().parse_known_args() # Unknown arguments are left for Qt
+
     # It's good practice to set ApplicationName and OrganizationName for Qt settings, etc.
     QApplication.setApplicationName("Musicova")
     QApplication.setOrganizationName("MusicovaProject") # Example
 
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     # Apply a style that might look better cross-platform if default is too basic
     # app.setStyle("Fusion") # Or "Windows", "GTK+", etc. Fusion is often a good default.
 
-    main_window = MusicovaApp()
+    main_window = MusicovaApp(control_port=args.control_api, stream_port=args.stream_server, stream_host=args.stream_host,
+                              prefetch_depth=args.prefetch_depth, prefetch_bytes_per_sec=int(args.prefetch_budget * 2**20),
+                              audio_engine_mode=args.audio_engine, single_instance=instance_lock is not None)
     main_window.show()
+    if args.files: # First launch: same path as the Import button
+        main_window.open_files(args.files, play=not args.enqueue)
     sys.exit(app.exec_())
@@ -0,0 +1,465 @@
+# Python/musicova_cli.py
+# Headless command-line entry point for Musicova.
+# Builds and queries the library index without starting the GUI (no PyQt5/pygame imports),
+# so a library can be indexed ahead of time on a server or from a cron job and shipped to desktops.
+#
+# Usage:
+#   python musicova_cli.py scan ~/Music --index library.json
+#   python musicova_cli.py analyze --index library.json
+#   python musicova_cli.py similar ~/Music/song.mp3 --index library.json
+#   python musicova_cli.py query "artist = Queen and duration > 5m order by album" --index library.json
+#   python musicova_cli.py export-playlist --index library.json --output all.m3u8
+#   python musicova_cli.py export-playlist -q "album = Abbey Road" --transcode mp3 --bitrate 192 --to /media/usb
+#   python musicova_cli.py tag ~/Music/Inbox --from-filename "%artist% - %title%" --set album="Live"
+#   python musicova_cli.py serve --index library.json --port 8766
+#   python musicova_cli.py decoders ~/Music/song.flac --force
+#
+# Every command prints a JSON summary on stdout; progress messages go to stderr.
+import os
+import sys
+import json
+import re
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import library
+import decoders
+import transcode
+from similarity import SimilarityIndex, extract_features
+from track_table import TrackTable, Query, QueryError
+from stream_server import StreamServer, DEFAULT_HOST as DEFAULT_STREAM_HOST, DEFAULT_PORT as DEFAULT_STREAM_PORT, \
+    DEFAULT_WORKERS, CLIENT_BYTES_PER_SEC
+
+DEFAULT_INDEX_PATH = library.DEFAULT_INDEX_PATH
+CHECKPOINT_EVERY = 200 # Save the index after this many processed files so an interrupted run can resume
+
+
+def _progress(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _default_jobs():
+    return os.cpu_count() or 1
+
+
+def _features_path(index_path):
+    # Descriptors live next to the index they belong to
+    return os.path.join(os.path.dirname(os.path.abspath(index_path)), os.path.basename(library.DEFAULT_FEATURES_PATH))
+
+
+def _run_in_pool(func, paths, jobs, on_result, checkpoint, initializer=None):
+    """Maps func over paths in a process pool, handing each result to on_result in order.
+
+    checkpoint() is called every CHECKPOINT_EVERY results and on Ctrl+C to save progress, so
+    rerunning the same command continues where it stopped instead of starting over.
+    """
+    if not paths:
+        return
+    jobs = max(1, min(jobs, len(paths)))
+    chunksize = max(1, min(32, len(paths) // (jobs * 4))) # Big enough to amortise IPC, small enough to balance
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as executor:
+            for path, result in zip(paths, executor.map(func, paths, chunksize=chunksize)):
+                on_result(path, result)
+                done += 1
+                if done % CHECKPOINT_EVERY == 0:
+                    checkpoint()
+                    _progress(f"{done}/{len(paths)} files processed")
+    except KeyboardInterrupt:
+        checkpoint()
+        _progress(f"Interrupted after {done}/{len(paths)} files; progress saved")
+        sys.exit(130)
+    except Exception: # e.g. a worker process died; keep what was done so far
+        checkpoint()
+        _progress(f"Stopped by an error after {done}/{len(paths)} files; progress saved")
+        raise
+
+
+def _emit(summary):
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+def cmd_scan(args):
+    index = library.load_index(args.index)
+    tracks = index["tracks"]
+
+    found = []
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            _progress(f"Not a folder, skipping: {folder}")
+            continue
+        found.extend(os.path.abspath(p) for p in library.scan_folder(folder, recursive=not args.no_recursive))
+
+    # Forget files that disappeared from the scanned folders
+    scanned_roots = tuple(os.path.join(os.path.abspath(f), "") for f in args.folders)
+    removed = [p for p in tracks if p.startswith(scanned_roots) and not os.path.isfile(p)]
+    for path in removed:
+        del tracks[path]
+
+    pending = [p for p in found if args.force or p not in tracks or not library.is_entry_current(tracks[p], p)]
+    _progress(f"Found {len(found)} audio files, {len(pending)} new or changed")
+
+    errors = []
+    def on_result(path, info):
+        previous = tracks.get(path, {})
+        if "analysis" in previous and previous.get("size") == info["size"] and previous.get("mtime") == info["mtime"]:
+            info["analysis"] = previous["analysis"] # Keep analysis of unchanged files when forcing a rescan
+        tracks[path] = info
+        if info["error"]:
+            errors.append({"file_path": path, "error": info["error"]})
+
+    _run_in_pool(library.read_track_info, pending, args.jobs, on_result,
+                 lambda: library.save_index(index, args.index))
+    library.save_index(index, args.index)
+    _emit({
+        "command": "scan", "index": args.index, "found": len(found), "indexed": len(pending),
+        "skipped": len(found) - len(pending), "removed": len(removed), "errors": errors,
+    })
+    return 0
+
+
+def cmd_analyze(args):
+    index = library.load_index(args.index)
+    tracks = index["tracks"]
+    pending = [p for p, entry in tracks.items()
+               if os.path.isfile(p) and (args.force or "analysis" not in entry or not library.is_entry_current(entry, p))]
+    _progress(f"{len(tracks)} tracks in index, {len(pending)} to analyze")
+
+    errors = []
+    def on_result(path, analysis):
+        tracks[path]["analysis"] = analysis
+        if analysis["error"]:
+            errors.append({"file_path": path, "error": analysis["error"]})
+
+    _run_in_pool(library.analyze_track, pending, args.jobs, on_result,
+                 lambda: library.save_index(index, args.index))
+    library.save_index(index, args.index)
+
+    # Acoustic descriptors for "play similar" / radio, stored separately as a float32 matrix
+    features_path = _features_path(args.index)
+    similarity_index = SimilarityIndex.load(features_path)
+    for path in [p for p in similarity_index.paths if p not in tracks]:
+        similarity_index.remove(path) # Tracks dropped from the library
+    feature_pending = [p for p in tracks if os.path.isfile(p) and not tracks[p].get("error")
+                       and (args.force or not similarity_index.is_file_current(p))]
+    _progress(f"{len(feature_pending)} tracks need acoustic features")
+    decoders.calibrate(feature_pending) # Pick decoder backends once here rather than in every worker
+
+    def on_features(path, result):
+        _, size, mtime, vector, error = result
+        if vector is not None:
+            similarity_index.add(path, size, mtime, vector)
+        else:
+            errors.append({"file_path": path, "error": error})
+
+    _run_in_pool(extract_features, feature_pending, args.jobs, on_features,
+                 lambda: similarity_index.save(features_path))
+    similarity_index.save(features_path)
+    _emit({
+        "command": "analyze", "index": args.index, "analyzed": len(pending),
+        "skipped": len(tracks) - len(pending), "features": features_path,
+        "features_computed": len(feature_pending), "errors": errors,
+    })
+    return 0
+
+
+def cmd_similar(args):
+    index = library.load_index(args.index)
+    similarity_index = SimilarityIndex.load(_features_path(args.index))
+    file_path = os.path.abspath(args.file)
+    if file_path not in similarity_index:
+        _progress(f"{file_path} has no acoustic features yet; run 'analyze' first")
+        return 1
+    results = []
+    for path, score in similarity_index.nearest(file_path, k=args.count):
+        entry = index["tracks"].get(path, {})
+        results.append({"file_path": path, "display_name": entry.get("display_name"), "score": round(score, 4)})
+    _emit({"command": "similar", "file_path": file_path, "tracks": results})
+    return 0
+
+
+def _load_table(index):
+    table = TrackTable(capacity=max(1024, len(index["tracks"])))
+    table.upsert_many(index["tracks"].values())
+    return table
+
+
+def cmd_query(args):
+    try:
+        query = Query(args.query)
+    except QueryError as e:
+        _progress(f"Invalid query: {e}")
+        return 2
+    index = library.load_index(args.index)
+    table = _load_table(index)
+    start = time.perf_counter()
+    rows = query.run(table)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    results = []
+    for row in rows:
+        entry = index["tracks"][table.path_at(row)]
+        results.append({k: entry.get(k) for k in ("file_path", "display_name", "duration_sec")})
+    _emit({"command": "query", "query": args.query, "matched": len(results),
+           "searched": len(table), "elapsed_ms": round(elapsed_ms, 2), "tracks": results})
+    return 0
+
+
+def _tag_edit_from_args(args):
+    edit = {"set": {}}
+    for assignment in args.set or []:
+        key, sep, value = assignment.partition("=")
+        if not sep or key not in library.EDITABLE_TAGS:
+            raise ValueError(f"--set expects KEY=VALUE with KEY one of: {', '.join(library.EDITABLE_TAGS)}")
+        edit["set"][key] = value
+    if args.replace:
+        field, find, replacement = args.replace
+        if field not in library.EDITABLE_TAGS:
+            raise ValueError(f"Cannot replace in unknown tag {field!r}")
+        if args.regex:
+            re.compile(find) # Report bad expressions before starting the workers
+        edit["replace"] = {"field": field, "find": find, "replace": replacement, "regex": args.regex}
+    if args.from_filename:
+        library.filename_pattern_regex(args.from_filename)
+        edit["pattern"] = args.from_filename
+    return edit
+
+
+def cmd_tag(args):
+    try:
+        edit = _tag_edit_from_args(args)
+    except (ValueError, re.error) as e:
+        _progress(f"Invalid tag edit: {e}")
+        return 2
+    paths = []
+    for target in args.paths:
+        if os.path.isdir(target):
+            paths.extend(os.path.abspath(p) for p in library.scan_folder(target, recursive=not args.no_recursive))
+        elif os.path.isfile(target):
+            paths.append(os.path.abspath(target))
+        else:
+            _progress(f"Not found, skipping: {target}")
+
+    index = library.load_index(args.index)
+    tracks = index["tracks"]
+    features_path = _features_path(args.index)
+    similarity_index = SimilarityIndex.load(features_path)
+    changed, errors = [], []
+    def on_result(job, result):
+        path, info, was_changed, error = result
+        if error:
+            errors.append({"file_path": path, "error": error})
+        elif was_changed:
+            changed.append(path)
+            if path in tracks: # Update the entry in place; the audio (and so its analysis) is unchanged
+                previous = tracks[path]
+                similarity_index.update_signature(path, info["size"], info["mtime"])
+                if "analysis" in previous:
+                    info["analysis"] = previous["analysis"]
+                tracks[path] = info
+
+    def checkpoint():
+        library.save_index(index, args.index)
+        if len(similarity_index):
+            similarity_index.save(features_path)
+
+    _run_in_pool(library.write_tags, [(p, edit) for p in paths], args.jobs, on_result, checkpoint)
+    checkpoint()
+    _emit({"command": "tag", "files": len(paths), "changed": len(changed),
+           "unchanged": len(paths) - len(changed) - len(errors), "errors": errors})
+    return 0
+
+
+def cmd_export_playlist(args):
+    index = library.load_index(args.index)
+    if args.query: # Smart playlist: the query decides membership and order
+        try:
+            query = Query(args.query)
+        except QueryError as e:
+            _progress(f"Invalid query: {e}")
+            return 2
+        table = _load_table(index)
+        entries = [index["tracks"][table.path_at(row)] for row in query.run(table)]
+    else:
+        entries = sorted(index["tracks"].values(), key=lambda e: e["file_path"])
+    if args.under:
+        root = os.path.join(os.path.abspath(args.under), "")
+        entries = [e for e in entries if e["file_path"].startswith(root)]
+    if not args.include_errors:
+        entries = [e for e in entries if not e.get("error")]
+    if args.transcode:
+        return _transcode_entries(args, entries)
+
+    if args.format == "json":
+        content = json.dumps([{k: e.get(k) for k in ("file_path", "display_name", "duration_sec")} for e in entries],
+                             ensure_ascii=False, indent=2) + "\n"
+    else: # Extended M3U, readable by most players
+        lines = ["#EXTM3U"]
+        for e in entries:
+            lines.append(f"#EXTINF:{int(round(e.get('duration_sec') or 0))},{e['display_name']}")
+            lines.append(e["file_path"])
+        content = "\n".join(lines) + "\n"
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(content)
+        _emit({"command": "export-playlist", "output": args.output, "format": args.format, "tracks": len(entries)})
+    else:
+        sys.stdout.write(content)
+    return 0
+
+
+def _transcode_entries(args, entries):
+    if not args.to:
+        _progress("--transcode needs a destination folder (--to)")
+        return 2
+    output_dir = os.path.abspath(args.to)
+    plan = transcode.plan_export([e["file_path"] for e in entries], output_dir, args.transcode, numbered=args.numbered)
+    counts = {"converted": 0, "cached": 0, "unchanged": 0}
+    errors = []
+    manifest = transcode.load_manifest(output_dir)
+    def on_result(job, result):
+        file_path, destination, status, error, entry = result
+        if error:
+            errors.append({"file_path": file_path, "error": error})
+        else:
+            counts[status] += 1
+            manifest[os.path.basename(destination)] = entry
+        done = sum(counts.values()) + len(errors)
+        _progress(f"[{done}/{len(plan)}] {os.path.basename(destination)}: {status or error}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(file_path, destination, args.transcode, args.bitrate, manifest.get(os.path.basename(destination)))
+            for file_path, destination in plan]
+    _run_in_pool(transcode.transcode_track, jobs, args.jobs, on_result,
+                 lambda: transcode.save_manifest(output_dir, manifest), initializer=transcode.worker_init)
+    transcode.save_manifest(output_dir, manifest)
+    durations = {e["file_path"]: e.get("duration_sec") for e in entries}
+    playlist_path = transcode.write_playlist(plan, output_dir, durations)
+    transcode.prune_cache()
+    _emit({"command": "export-playlist", "output": output_dir, "playlist": playlist_path, "format": args.transcode,
+           "bitrate_kbps": args.bitrate, "tracks": len(plan), **counts, "errors": errors})
+    return 0
+
+
+def cmd_serve(args):
+    index = library.load_index(args.index)
+    entries = [e for e in index["tracks"].values() if not e.get("error")]
+    server = StreamServer(host=args.host, port=args.port, workers=args.workers,
+                          bytes_per_sec=args.client_bandwidth, allow_origin=args.allow_origin)
+    server.set_tracks(entries)
+    _emit({"command": "serve", "url": f"http://{args.host}:{server.port}/tracks", "tracks": len(entries)})
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+def cmd_decoders(args):
+    paths = [os.path.abspath(p) for p in args.files]
+    if args.force: # Forget earlier measurements for these formats
+        decoders.forget_timings({os.path.splitext(path)[1] for path in paths})
+    decoders.calibrate(paths)
+    _emit({"command": "decoders", "cache": decoders.CACHE_PATH,
+           "available": [name for name, cls in decoders.BACKENDS.items() if cls.available()],
+           "timings": decoders.load_timings()})
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="musicova", description="Headless Musicova library tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub, jobs=True):
+        sub.add_argument("--index", default=DEFAULT_INDEX_PATH,
+                         help=f"Library index file (default: {DEFAULT_INDEX_PATH})")
+        if jobs:
+            sub.add_argument("--jobs", "-j", type=int, default=_default_jobs(),
+                             help="Worker processes (default: number of CPUs)")
+
+    scan = subparsers.add_parser("scan", help="Find audio files and read their metadata into the index")
+    scan.add_argument("folders", nargs="+", help="Folders to scan")
+    scan.add_argument("--no-recursive", action="store_true", help="Do not descend into subfolders")
+    scan.add_argument("--force", action="store_true", help="Re-read files even if they are unchanged")
+    add_common(scan)
+    scan.set_defaults(func=cmd_scan)
+
+    analyze = subparsers.add_parser("analyze", help="Read stream properties and acoustic features for indexed tracks")
+    analyze.add_argument("--force", action="store_true", help="Re-analyze files even if they are unchanged")
+    add_common(analyze)
+    analyze.set_defaults(func=cmd_analyze)
+
+    similar = subparsers.add_parser("similar", help="List the indexed tracks that sound most like a file")
+    similar.add_argument("file", help="An analysed audio file")
+    similar.add_argument("--count", "-n", type=int, default=10, help="Number of tracks to list (default: 10)")
+    add_common(similar, jobs=False)
+    similar.set_defaults(func=cmd_similar)
+
+    query = subparsers.add_parser("query", help="List indexed tracks matching a smart-playlist query")
+    query.add_argument("query", help='e.g. "artist = Queen and duration > 5m order by album" (syntax in track_table.py)')
+    add_common(query, jobs=False)
+    query.set_defaults(func=cmd_query)
+
+    tag = subparsers.add_parser("tag", help="Edit tags of many files at once (written atomically in parallel)")
+    tag.add_argument("paths", nargs="+", help="Audio files or folders")
+    tag.add_argument("--set", action="append", metavar="KEY=VALUE", help="Set a tag, e.g. --set album=\"Live\" (repeatable)")
+    tag.add_argument("--replace", nargs=3, metavar=("TAG", "FIND", "REPLACE"), help="Find and replace text in a tag")
+    tag.add_argument("--regex", action="store_true", help="Treat FIND as a regular expression")
+    tag.add_argument("--from-filename", metavar="PATTERN", help='Fill tags from file names, e.g. "%%artist%% - %%title%%"')
+    tag.add_argument("--no-recursive", action="store_true", help="Do not descend into subfolders")
+    add_common(tag)
+    tag.set_defaults(func=cmd_tag)
+
+    export = subparsers.add_parser("export-playlist", help="Write the indexed tracks as a playlist")
+    export.add_argument("--output", "-o", help="Playlist file to write (default: stdout)")
+    export.add_argument("--format", choices=("m3u", "json"), default="m3u", help="Playlist format (default: m3u)")
+    export.add_argument("--under", help="Only include tracks inside this folder")
+    export.add_argument("--query", "-q", help="Only include tracks matching this smart-playlist query, in its order")
+    export.add_argument("--include-errors", action="store_true", help="Also include files that failed to load")
+    export.add_argument("--transcode", choices=sorted(transcode.FORMATS),
+                        help="Convert the tracks into the --to folder (tags and cover art are kept)")
+    export.add_argument("--bitrate", type=int, choices=transcode.BITRATES_KBPS, default=transcode.DEFAULT_BITRATE_KBPS,
+                        help=f"Target bitrate in kbit/s (default: {transcode.DEFAULT_BITRATE_KBPS})")
+    export.add_argument("--to", metavar="FOLDER", help="Destination folder for --transcode, e.g. a USB stick")
+    export.add_argument("--numbered", action="store_true", help="Prefix file names with the playlist position")
+    add_common(export)
+    export.set_defaults(func=cmd_export_playlist)
+
+    serve = subparsers.add_parser("serve", help="Stream indexed tracks to the web player over HTTP")
+    serve.add_argument("--host", default=DEFAULT_STREAM_HOST,
+                       help="Address to listen on; 0.0.0.0 shares the tracks with every machine on the network (default: %(default)s)")
+    serve.add_argument("--port", type=int, default=DEFAULT_STREAM_PORT, help=f"Port (default: {DEFAULT_STREAM_PORT})")
+    serve.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Worker threads (default: {DEFAULT_WORKERS})")
+    serve.add_argument("--client-bandwidth", type=int, default=CLIENT_BYTES_PER_SEC,
+                       help="Bytes per second allowed per client, 0 for unlimited")
+    serve.add_argument("--allow-origin", default="*", metavar="ORIGIN",
+                       help="Web player origin allowed to read the tracks, e.g. http://player.lan (default: any)")
+    add_common(serve, jobs=False)
+    serve.set_defaults(func=cmd_serve)
+
+    decoder_cmd = subparsers.add_parser("decoders", help="Show (and measure) the decoder backend chosen per format")
+    decoder_cmd.add_argument("files", nargs="*", help="Sample files to benchmark the backends with")
+    decoder_cmd.add_argument("--force", action="store_true", help="Measure again even if a choice is cached")
+    add_common(decoder_cmd, jobs=False)
+    decoder_cmd.set_defaults(func=cmd_decoders)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    index_dir = os.path.dirname(os.path.abspath(args.index))
+    os.makedirs(index_dir, exist_ok=True)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support() # Needed for process pools in PyInstaller builds on Windows
+    sys.exit(main())
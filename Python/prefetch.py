@@ -0,0 +1,203 @@
+# Python/prefetch.py
+# Read-ahead of upcoming tracks for libraries on NAS mounts or other slow storage.
+#
+# Tracks are decoded when they start playing, so the first read of a file over the network is
+# what the listener waits for. The Prefetcher warms the next few queued files into the OS page
+# cache in the background: posix_fadvise(WILLNEED) asks the kernel to start reading where that
+# is available, and bounded, rate-limited reads make sure the data has actually arrived (and do
+# the whole job on platforms without fadvise). The bytes read are discarded; decoding the track
+# later is then served from memory.
+#
+# Headless: no PyQt5/pygame imports. All methods are safe to call from the GUI thread; the lock they
+# take is never held across file system calls, so a stalled mount cannot freeze the window.
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from throttle import TokenBucket
+
+DEFAULT_DEPTH = 2 # Upcoming tracks to keep warm
+DEFAULT_BYTES_PER_SEC = 16 * 1024 * 1024 # I/O budget, so prefetching never saturates the NAS link
+MAX_BYTES_PER_FILE = 64 * 1024 * 1024 # Head of very long files only; the decoder streams the rest
+CHUNK_SIZE = 1024 * 1024
+SEEK_HOLD_SEC = 1.0 # Prefetching yields to seeks (which re-read the current file) for this long
+MAX_REMEMBERED = 64 # Warmed files remembered; older ones may have been evicted from the cache anyway
+RETRY_FAILED_SEC = 60 # An unchanged file that could not be read is not tried again for this long
+
+
+class Prefetcher:
+    def __init__(self, depth=DEFAULT_DEPTH, bytes_per_sec=DEFAULT_BYTES_PER_SEC, max_bytes_per_file=MAX_BYTES_PER_FILE):
+        self.depth = depth
+        self.max_bytes_per_file = max_bytes_per_file
+        self._bucket = TokenBucket(bytes_per_sec, max(CHUNK_SIZE, bytes_per_sec)) if bytes_per_sec else None
+        self._upcoming = []
+        self._warmed = OrderedDict() # path -> (size, mtime) when it was warmed
+        self._failed = OrderedDict() # path -> ((size, mtime), time.monotonic()) of the last failed read
+        self._queue_changed = True # Whether _upcoming may hold files not yet warmed
+        self._held_until = 0.0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread = None
+        # Statistics for track starts
+        self._starts = {True: [], False: []} # prefetched? -> time-to-first-sample in seconds
+        self.bytes_read = 0
+
+    def start(self):
+        if self._thread is None and self.depth > 0:
+            self._thread = threading.Thread(target=self._run, name="musicova-prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def set_upcoming(self, paths):
+        """Replaces the list of files to warm, most urgent first; only the first `depth` are used."""
+        upcoming = list(paths)[:self.depth]
+        with self._cond:
+            if upcoming != self._upcoming:
+                self._upcoming = upcoming
+                self._queue_changed = True
+                self._cond.notify_all()
+
+    def hold(self, seconds=SEEK_HOLD_SEC):
+        """Pauses prefetching for a while, e.g. while the user is seeking in the current track."""
+        with self._cond:
+            self._held_until = max(self._held_until, time.monotonic() + seconds)
+
+    def is_warm(self, path):
+        # Trusts the signature checked by the worker when it warmed the file: no stat() here, this
+        # runs on the GUI thread at every track start
+        with self._cond:
+            return path in self._warmed
+
+    def record_start(self, path, seconds, prefetched=None):
+        """Records the time-to-first-sample of a track start. Returns whether it was prefetched."""
+        if prefetched is None:
+            prefetched = self.is_warm(path)
+        with self._cond:
+            self._starts[prefetched].append(seconds)
+            del self._starts[prefetched][:-1000] # Keep recent starts only
+        return prefetched
+
+    def stats(self):
+        with self._cond:
+            hits, misses = list(self._starts[True]), list(self._starts[False])
+        total = len(hits) + len(misses)
+        return {
+            "depth": self.depth,
+            "track_starts": total,
+            "prefetch_hits": len(hits),
+            "hit_rate": round(len(hits) / total, 3) if total else None,
+            "ttfs_ms_prefetched": _median_ms(hits),
+            "ttfs_ms_cold": _median_ms(misses),
+            "bytes_read": self.bytes_read,
+        }
+
+    # Worker thread
+
+    def _next_target(self, upcoming, warmed, failed):
+        # Called without the lock: stat() may block for seconds on a stalled network mount
+        now = time.monotonic()
+        for path in upcoming:
+            signature = _signature(path)
+            if signature is None or warmed.get(path) == signature:
+                continue
+            failed_signature, failed_at = failed.get(path, (None, 0.0))
+            if failed_signature == signature and now - failed_at < RETRY_FAILED_SEC:
+                continue
+            return path, signature
+        return None, None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    held = self._held_until - time.monotonic()
+                    if held <= 0 and self._queue_changed:
+                        break
+                    self._cond.wait(held if held > 0 else None)
+                self._queue_changed = False
+                upcoming, warmed, failed = list(self._upcoming), dict(self._warmed), dict(self._failed)
+            path, signature = self._next_target(upcoming, warmed, failed)
+            if path is None:
+                continue # Everything is warm (or failed recently); sleep until the queue changes
+            completed, failed_at = False, None
+            try:
+                completed = self._warm(path, signature[0])
+            except OSError as e:
+                print(f"Prefetch: cannot read {path}: {e}")
+                failed_at = time.monotonic()
+            with self._cond:
+                if completed:
+                    self._remember(self._warmed, path, signature)
+                    self._failed.pop(path, None)
+                elif failed_at is not None:
+                    self._remember(self._failed, path, (signature, failed_at))
+                self._queue_changed = True # Look for the next file
+
+    @staticmethod
+    def _remember(entries, path, value):
+        # Called with self._cond held
+        entries[path] = value
+        entries.move_to_end(path)
+        while len(entries) > MAX_REMEMBERED:
+            entries.popitem(last=False)
+
+    def _still_wanted(self, path):
+        """Waits out holds; False if the file dropped out of the upcoming list or we are stopping."""
+        with self._cond:
+            while not self._stopping and path in self._upcoming:
+                held = self._held_until - time.monotonic()
+                if held <= 0:
+                    return True
+                self._cond.wait(held)
+            return False
+
+    def _warm(self, path, size):
+        """Reads the head of a file. False if abandoned because it is no longer wanted; raises OSError."""
+        limit = min(size, self.max_bytes_per_file)
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            if hasattr(os, "posix_fadvise"): # Linux/BSD: kernel read-ahead starts right away
+                os.posix_fadvise(fd, 0, limit, os.POSIX_FADV_WILLNEED)
+            done = 0
+            while done < limit:
+                if not self._still_wanted(path):
+                    return False
+                amount = min(CHUNK_SIZE, limit - done)
+                if self._bucket:
+                    wait = self._bucket.take(amount)
+                    if wait:
+                        with self._cond:
+                            self._cond.wait(wait) # Woken early by stop() or a new queue
+                data = os.read(fd, amount)
+                if not data:
+                    break
+                done += len(data)
+                self.bytes_read += len(data)
+            return True
+        finally:
+            os.close(fd)
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def _median_ms(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[len(ordered) // 2] * 1000, 1)
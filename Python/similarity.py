@@ -0,0 +1,317 @@
+# Python/similarity.py
+# Acoustic similarity for "play similar" and smart radio.
+# extract_features() turns a track into a compact descriptor (MFCC summary, spectral shape,
+# tempo estimate, loudness) using vectorised NumPy; it is meant to run in a process pool.
+# SimilarityIndex keeps every descriptor in one float32 matrix, persisted to an .npz file so each
+# file is analysed only once, and answers nearest-neighbour queries with a single matrix-vector
+# product (a few milliseconds for 100k tracks).
+# Like library.py, this module must not import PyQt5 or pygame.
+import os
+import zipfile
+import numpy as np
+
+import decoders # Streaming decoder backends, fastest per format
+
+FEATURE_VERSION = 1 # Bump when the descriptor layout changes; stored vectors are then recomputed
+ANALYSIS_SAMPLE_RATE = 22050
+ANALYSIS_SECONDS = 60 # Only an excerpt from the middle of the track is analysed
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 40
+N_MFCC = 13
+TEMPO_RANGE_BPM = (60, 200)
+FEATURE_NAMES = ([f"mfcc{i}_mean" for i in range(N_MFCC)] + [f"mfcc{i}_std" for i in range(N_MFCC)] +
+                 ["centroid", "rolloff", "flatness", "tempo", "loudness"])
+FEATURE_DIM = len(FEATURE_NAMES)
+
+
+# --- Decoding ---
+
+def load_excerpt(file_path):
+    """Returns a mono float32 excerpt from the middle of the track, resampled to ANALYSIS_SAMPLE_RATE."""
+    with decoders.open_decoder(file_path) as decoder:
+        excerpt = int(ANALYSIS_SECONDS * decoder.sample_rate)
+        if decoder.frames and decoder.frames > excerpt:
+            decoder.seek((decoder.frames - excerpt) / 2 / decoder.sample_rate)
+        blocks, remaining = [], excerpt
+        while remaining > 0:
+            block = decoder.read(min(remaining, decoders.READ_BLOCK_FRAMES))
+            if not len(block):
+                break
+            blocks.append(block.mean(axis=1))
+            remaining -= len(block)
+        sample_rate = decoder.sample_rate
+    samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    # Linear interpolation is plenty for timbre/tempo summaries and keeps this dependency-free
+    return decoders.resample(samples, sample_rate, ANALYSIS_SAMPLE_RATE)
+
+
+# --- Feature extraction ---
+
+def _mel_filterbank():
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    fft_freqs = np.fft.rfftfreq(N_FFT, 1.0 / ANALYSIS_SAMPLE_RATE)
+    mel_points = mel_to_hz(np.linspace(hz_to_mel(20.0), hz_to_mel(ANALYSIS_SAMPLE_RATE / 2), N_MELS + 2))
+    lower, center, upper = mel_points[:-2, None], mel_points[1:-1, None], mel_points[2:, None]
+    rising = (fft_freqs - lower) / (center - lower)
+    falling = (upper - fft_freqs) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32) # (N_MELS, N_FFT // 2 + 1)
+
+
+def _dct_matrix():
+    n = np.arange(N_MELS)
+    k = np.arange(N_MFCC)[:, None]
+    return (np.cos(np.pi * k * (2 * n + 1) / (2 * N_MELS)) * np.sqrt(2.0 / N_MELS)).astype(np.float32)
+
+
+MEL_FILTERBANK = _mel_filterbank()
+DCT_MATRIX = _dct_matrix()
+WINDOW = np.hanning(N_FFT).astype(np.float32)
+
+
+def _estimate_tempo(log_mel):
+    # Onset strength = positive spectral flux summed over mel bands, then autocorrelation
+    flux = np.maximum(0.0, np.diff(log_mel, axis=1)).sum(axis=0)
+    flux -= flux.mean()
+    if len(flux) < 8 or not flux.any():
+        return 0.0
+    spectrum = np.fft.rfft(flux, n=2 * len(flux))
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum))[:len(flux)]
+    frames_per_sec = ANALYSIS_SAMPLE_RATE / HOP_LENGTH
+    min_lag = int(frames_per_sec * 60 / TEMPO_RANGE_BPM[1])
+    max_lag = min(len(autocorr) - 1, int(frames_per_sec * 60 / TEMPO_RANGE_BPM[0]))
+    if max_lag <= min_lag:
+        return 0.0
+    lags = np.arange(min_lag, max_lag + 1)
+    bpm = 60.0 * frames_per_sec / lags
+    prior = np.exp(-0.5 * np.log2(bpm / 120.0) ** 2) # Favour ~120 BPM over half/double-time peaks
+    return float(bpm[np.argmax(autocorr[min_lag:max_lag + 1] * prior)])
+
+
+def compute_descriptor(samples):
+    """Computes the FEATURE_DIM float32 descriptor for a mono excerpt at ANALYSIS_SAMPLE_RATE."""
+    if len(samples) < N_FFT:
+        samples = np.pad(samples, (0, N_FFT - len(samples)))
+    frames = np.lib.stride_tricks.sliding_window_view(samples, N_FFT)[::HOP_LENGTH] * WINDOW
+    power = np.abs(np.fft.rfft(frames, axis=1)).astype(np.float32) ** 2 # (n_frames, bins)
+
+    mel = power @ MEL_FILTERBANK.T # (n_frames, N_MELS)
+    log_mel = np.log10(mel + 1e-10).T # (N_MELS, n_frames)
+    mfcc = DCT_MATRIX @ log_mel # (N_MFCC, n_frames)
+
+    freqs = np.fft.rfftfreq(N_FFT, 1.0 / ANALYSIS_SAMPLE_RATE).astype(np.float32)
+    frame_energy = power.sum(axis=1) + 1e-10
+    centroid = (power @ freqs) / frame_energy
+    cumulative = np.cumsum(power, axis=1)
+    rolloff = freqs[np.argmax(cumulative >= 0.85 * cumulative[:, -1:], axis=1)]
+    flatness = np.exp(np.log(power + 1e-10).mean(axis=1)) / (power.mean(axis=1) + 1e-10)
+
+    rms = np.sqrt(np.mean(samples.astype(np.float64) ** 2))
+    loudness_db = 20 * np.log10(rms + 1e-10)
+
+    nyquist = ANALYSIS_SAMPLE_RATE / 2
+    return np.concatenate([
+        mfcc.mean(axis=1), mfcc.std(axis=1),
+        [centroid.mean() / nyquist, rolloff.mean() / nyquist, flatness.mean(),
+         _estimate_tempo(log_mel) / TEMPO_RANGE_BPM[1], max(loudness_db, -100.0) / 100.0],
+    ]).astype(np.float32)
+
+
+def extract_features(file_path):
+    """Worker entry point: returns (file_path, size, mtime, vector or None, error or None). Never raises."""
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        return file_path, 0, 0.0, None, str(e)
+    try:
+        vector = compute_descriptor(load_excerpt(file_path))
+        return file_path, stat.st_size, stat.st_mtime, vector, None
+    except Exception as e:
+        return file_path, stat.st_size, stat.st_mtime, None, str(e)
+
+
+# --- Index ---
+
+class SimilarityIndex:
+    """Descriptor matrix plus per-file bookkeeping, with cosine nearest-neighbour queries."""
+
+    def __init__(self):
+        self.paths = []
+        self._rows = {} # file_path -> row in the matrices below
+        self._stats = np.zeros((0, 2), dtype=np.float64) # size, mtime per row
+        self._vectors = np.zeros((0, FEATURE_DIM), dtype=np.float32)
+        self._count = 0
+        self._normalized = None # Cached z-scored, L2-normalised copy; None when stale
+        # Edits since the last load/save, replayed onto the file on disk when saving because the
+        # GUI and musicova_cli.py analyze may both be updating the same store
+        self._changed = set()
+        self._removed = set()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, file_path):
+        return file_path in self._rows
+
+    def is_current(self, file_path, size, mtime):
+        row = self._rows.get(file_path)
+        return row is not None and self._stats[row, 0] == size and self._stats[row, 1] == mtime
+
+    def is_file_current(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return self.is_current(file_path, stat.st_size, stat.st_mtime)
+
+    def add(self, file_path, size, mtime, vector):
+        row = self._rows.get(file_path)
+        if row is None:
+            if self._count == len(self._vectors): # Grow geometrically so bulk adds stay O(n)
+                capacity = max(64, 2 * len(self._vectors))
+                self._vectors = np.resize(self._vectors, (capacity, FEATURE_DIM))
+                self._stats = np.resize(self._stats, (capacity, 2))
+            row = self._count
+            self._count += 1
+            self._rows[file_path] = row
+            self.paths.append(file_path)
+        self._vectors[row] = vector
+        self._stats[row] = (size, mtime)
+        self._normalized = None
+        self._changed.add(file_path)
+        self._removed.discard(file_path)
+
+    def update_signature(self, file_path, size, mtime):
+        """Keeps a descriptor valid after a change that did not touch the audio (e.g. a tag edit)."""
+        row = self._rows.get(file_path)
+        if row is not None:
+            self._stats[row] = (size, mtime)
+            self._changed.add(file_path)
+
+    def remove(self, file_path):
+        row = self._rows.pop(file_path, None)
+        if row is None:
+            return
+        last = self._count - 1
+        if row != last: # Move the last row into the hole
+            moved = self.paths[last]
+            self._vectors[row] = self._vectors[last]
+            self._stats[row] = self._stats[last]
+            self.paths[row] = moved
+            self._rows[moved] = row
+        self.paths.pop()
+        self._count -= 1
+        self._normalized = None
+        self._removed.add(file_path)
+        self._changed.discard(file_path)
+
+    def _normalized_matrix(self):
+        if self._normalized is None:
+            vectors = self._vectors[:self._count]
+            std = vectors.std(axis=0)
+            std[std == 0] = 1.0
+            scaled = (vectors - vectors.mean(axis=0)) / std # Give every feature equal weight
+            norms = np.linalg.norm(scaled, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._normalized = np.ascontiguousarray(scaled / norms, dtype=np.float32)
+        return self._normalized
+
+    def _top_k(self, query, k, exclude):
+        matrix = self._normalized_matrix()
+        scores = matrix @ query
+        for path in exclude:
+            row = self._rows.get(path)
+            if row is not None:
+                scores[row] = -np.inf
+        k = min(k, self._count)
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.paths[i], float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+    def nearest(self, file_path, k=10, exclude=()):
+        """Tracks most similar to file_path as [(path, cosine score)], best first; [] if it isn't indexed."""
+        row = self._rows.get(file_path)
+        if row is None:
+            return []
+        return self._top_k(self._normalized_matrix()[row], k, set(exclude) | {file_path})
+
+    def radio_candidates(self, history, k=1, exclude=()):
+        """Next tracks for a radio queue, seeded by recently played tracks (most recent weighs most)."""
+        rows = [self._rows[p] for p in history if p in self._rows]
+        if not rows:
+            return []
+        weights = 0.6 ** np.arange(len(rows))[::-1] # history is oldest first
+        query = (self._normalized_matrix()[rows] * weights[:, None].astype(np.float32)).sum(axis=0)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        return self._top_k(query / norm, k, set(exclude) | set(history))
+
+    def save(self, store_path):
+        """Merges this session's edits into the file on disk and writes it atomically (temp file + rename).
+
+        Rows another process saved in the meantime are kept (and loaded into this index); where both
+        touched a track, this index wins.
+        """
+        try:
+            merged = self._read(store_path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile): # Missing or unreadable: this index is all there is
+            merged = None
+        if merged is None:
+            merged = self
+        else:
+            for path in self._removed:
+                merged.remove(path)
+            for path in self._changed:
+                row = self._rows[path]
+                merged.add(path, self._stats[row, 0], self._stats[row, 1], self._vectors[row])
+        tmp_path = f"{store_path}.{os.getpid()}.tmp.npz" # Per process: the GUI and the CLI may save at once
+        try:
+            np.savez(tmp_path, version=np.array(FEATURE_VERSION), paths=np.array(merged.paths, dtype=str),
+                     stats=merged._stats[:merged._count], vectors=merged._vectors[:merged._count])
+            os.replace(tmp_path, store_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if merged is not self:
+            self.paths, self._rows, self._count = merged.paths, merged._rows, merged._count
+            self._stats, self._vectors = merged._stats, merged._vectors
+            self._normalized = None
+        self._changed.clear()
+        self._removed.clear()
+
+    @classmethod
+    def _read(cls, store_path):
+        # Raises OSError/ValueError/KeyError/BadZipFile if the file is missing or damaged; None if from another version
+        with np.load(store_path, allow_pickle=False) as data:
+            if int(data["version"]) != FEATURE_VERSION or data["vectors"].shape[1:] != (FEATURE_DIM,):
+                return None
+            index = cls()
+            index.paths = [str(p) for p in data["paths"]]
+            index._stats = data["stats"].astype(np.float64)
+            index._vectors = data["vectors"].astype(np.float32)
+        index._count = len(index.paths)
+        index._rows = {p: i for i, p in enumerate(index.paths)}
+        return index
+
+    @classmethod
+    def load(cls, store_path):
+        """Loads a saved index, or returns an empty one if the file is missing or from another version."""
+        try:
+            index = cls._read(store_path)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            print(f"Could not read feature store {store_path}: {e}")
+            return cls()
+        if index is None:
+            print(f"Feature store {store_path} is from another version, rebuilding it.")
+            return cls()
+        return index
@@ -0,0 +1,108 @@
+# Python/single_instance.py
+# Keeps one desktop window per user. The first launch takes a lock file and listens on a local
+# socket (QLocalServer: a Unix domain socket, or a named pipe on Windows). A later launch, e.g.
+# opening a file from the file manager, connects, hands over its command line and exits, so it
+# never pays for the full startup or competes for the audio device.
+#
+# musicova.py calls claim_or_hand_off() before its heavy imports (widgets, numpy, decoders), so
+# only QtCore and QtNetwork are loaded when a launch is handed off. No QApplication is needed for
+# that: the client side uses blocking socket calls.
+import os
+import sys
+import json
+import time
+import getpass
+from PyQt5.QtCore import QObject, QDir, QLockFile, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+try:
+    SERVER_NAME = f"musicova-{getpass.getuser()}"
+except Exception: # No user name in the environment
+    SERVER_NAME = "musicova"
+LOCK_PATH = os.path.join(QDir.tempPath(), f"{SERVER_NAME}.lock")
+CONNECT_TIMEOUT_MS = 200
+REPLY_TIMEOUT_MS = 2000
+STARTUP_WAIT_SEC = 5.0 # How long to wait for an instance that holds the lock but is still starting up
+MAX_MESSAGE_BYTES = 1024 * 1024
+NO_HAND_OFF_ARGS = ("-h", "--help", "--new-instance")
+
+
+def hand_off(argv):
+    """Sends a command line to the running instance. Returns True once it has been accepted."""
+    socket = QLocalSocket()
+    socket.connectToServer(SERVER_NAME)
+    if not socket.waitForConnected(CONNECT_TIMEOUT_MS):
+        return False
+    socket.write(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode("utf-8") + b"\n")
+    accepted = socket.waitForBytesWritten(REPLY_TIMEOUT_MS) and socket.waitForReadyRead(REPLY_TIMEOUT_MS) \
+        and bytes(socket.readLine()).strip() == b"ok"
+    socket.disconnectFromServer()
+    return accepted
+
+
+def claim_or_hand_off(argv):
+    """Makes this process the single instance, or hands argv to the running one and exits.
+
+    Returns the held QLockFile (keep a reference for the lifetime of the app), or None when
+    single-instance mode is skipped (--new-instance, --help, or an instance that never answers).
+    """
+    if any(arg in NO_HAND_OFF_ARGS for arg in argv):
+        return None
+    lock = QLockFile(LOCK_PATH)
+    lock.setStaleLockTime(0) # Held for the whole session; a crashed owner is detected by its PID instead
+    deadline = time.monotonic() + STARTUP_WAIT_SEC
+    while True:
+        if hand_off(argv):
+            sys.exit(0)
+        if lock.tryLock(0):
+            return lock
+        if time.monotonic() > deadline:
+            print("Another Musicova instance holds the lock but does not answer; starting a separate one")
+            return None
+        time.sleep(0.05) # The lock holder is still starting up; its server will be listening shortly
+
+
+class InstanceServer(QObject):
+    """Receives command lines from later launches; emits (argv, cwd) on the GUI thread."""
+    command_line_received = pyqtSignal(list, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption) # Other users cannot connect
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def listen(self):
+        if not self.server.listen(SERVER_NAME):
+            # Left behind by a crashed instance; safe to remove because we hold the lock
+            QLocalServer.removeServer(SERVER_NAME)
+            if not self.server.listen(SERVER_NAME):
+                print(f"Could not listen for other launches: {self.server.errorString()}")
+                return False
+        return True
+
+    def close(self):
+        self.server.close()
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(lambda c=connection: self._read_message(c))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def _read_message(self, connection):
+        if not connection.canReadLine(): # Wait for the rest of the message
+            if connection.bytesAvailable() > MAX_MESSAGE_BYTES:
+                connection.abort()
+            return
+        try:
+            message = json.loads(bytes(connection.readLine()))
+            argv = [str(arg) for arg in message["argv"]]
+            cwd = str(message.get("cwd") or "")
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring malformed message from another launch: {e}")
+            connection.abort()
+            return
+        connection.write(b"ok\n")
+        connection.flush()
+        self.command_line_received.emit(argv, cwd)
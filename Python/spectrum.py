@@ -0,0 +1,93 @@
+# Python/spectrum.py
+# Per-frame math of the spectrum visualizer and VU meter (drawn by SpectrumVisualizerWidget in
+# musicova.py). Kept free of Qt so the band layout and level scaling can be tested headless.
+#
+# A frame is FFT_SIZE stereo samples. The spectrum is a Hann-windowed FFT of the mono mix,
+# averaged into BAND_COUNT log-spaced bands and scaled from dB to 0..1 display levels
+# (0 dBFS -> 1.0, FLOOR_DB -> 0.0). The VU meter is the RMS of each channel on the same scale.
+# Displayed levels jump up at once and fall by FALL_PER_FRAME per frame, so peaks stay readable.
+#
+# Every buffer is allocated in the constructor (and the band matrix once per sample rate):
+# analyze() and decay() write into existing arrays, so the only per-frame allocation at 60 fps
+# is the FFT's own output.
+import numpy as np
+
+FFT_SIZE = 2048
+BAND_COUNT = 48
+LOWEST_BAND_HZ = 40.0
+FLOOR_DB = -70.0
+FALL_PER_FRAME = 0.03 # Fraction of full height levels drop per frame when the signal falls
+
+
+def band_matrix(sample_rate, fft_size=FFT_SIZE, band_count=BAND_COUNT):
+    """(bins, bands) matrix whose columns average the FFT bins of each log-spaced band.
+
+    Bands run from LOWEST_BAND_HZ to Nyquist. Bands narrower than one bin (the lowest ones)
+    take the bin nearest to their lower edge, so no band is ever empty.
+    """
+    bins = fft_size // 2 + 1
+    frequencies = np.fft.rfftfreq(fft_size, 1.0 / sample_rate)
+    edges = np.geomspace(LOWEST_BAND_HZ, sample_rate / 2, band_count + 1)
+    matrix = np.zeros((bins, band_count), dtype=np.float32)
+    for band in range(band_count):
+        in_band = (frequencies >= edges[band]) & (frequencies < edges[band + 1])
+        if not in_band.any():
+            in_band[np.argmin(np.abs(frequencies - edges[band]))] = True
+        matrix[in_band, band] = 1.0 / in_band.sum()
+    return matrix
+
+
+class SpectrumAnalyzer:
+    def __init__(self, fft_size=FFT_SIZE, band_count=BAND_COUNT):
+        self.fft_size = fft_size
+        self.band_count = band_count
+        self.window = np.hanning(fft_size).astype(np.float32)
+        self.frame = np.zeros((fft_size, 2), dtype=np.float32) # Latest stereo PCM window, -1..1; filled by the caller
+        self.mono = np.zeros(fft_size, dtype=np.float32)
+        self.magnitude = np.zeros(fft_size // 2 + 1, dtype=np.float32)
+        self.band_power = np.zeros(band_count, dtype=np.float32)
+        self.levels = np.zeros(band_count, dtype=np.float32) # Displayed bar heights, 0..1
+        self.vu = np.zeros(2, dtype=np.float32) # Displayed left/right meter levels, 0..1
+        self.vu_rms = np.zeros(2, dtype=np.float32)
+        self.vu_target = np.zeros(2, dtype=np.float32)
+        self.band_matrix = None
+        self.band_rate = None
+
+    def analyze(self, sample_rate):
+        """Updates levels and vu from the samples in self.frame."""
+        if sample_rate != self.band_rate:
+            self.band_matrix = band_matrix(sample_rate, self.fft_size, self.band_count)
+            self.band_rate = sample_rate
+
+        # VU meter: RMS per channel in dB
+        np.sqrt(np.einsum("ij,ij->j", self.frame, self.frame) / self.fft_size, out=self.vu_rms)
+        self._to_level(self.vu_rms, self.vu_target)
+        self.vu -= FALL_PER_FRAME
+        np.maximum(self.vu, self.vu_target, out=self.vu)
+
+        # Spectrum: windowed FFT of the mono mix, averaged into log bands, in dB
+        np.add(self.frame[:, 0], self.frame[:, 1], out=self.mono)
+        self.mono *= self.window
+        self.mono *= 0.5
+        np.abs(np.fft.rfft(self.mono), out=self.magnitude)
+        self.magnitude *= 2.0 / self.window.sum() # A full-scale sine peaks at ~0 dB in its bin
+        np.dot(self.magnitude, self.band_matrix, out=self.band_power)
+        self._to_level(self.band_power, self.band_power)
+        self.levels -= FALL_PER_FRAME
+        np.maximum(self.levels, self.band_power, out=self.levels)
+
+    def decay(self):
+        """Lets the levels fall one frame with no input. Returns False once everything is at zero."""
+        self.levels -= FALL_PER_FRAME
+        self.vu -= FALL_PER_FRAME
+        np.clip(self.levels, 0.0, 1.0, out=self.levels)
+        np.clip(self.vu, 0.0, 1.0, out=self.vu)
+        return bool(self.levels.any() or self.vu.any())
+
+    @staticmethod
+    def _to_level(amplitude, out):
+        # Linear amplitude -> 0..1 display level: 0 dB -> 1.0, FLOOR_DB -> 0.0
+        np.log10(amplitude + 1e-9, out=out)
+        out *= 20.0 / -FLOOR_DB
+        out += 1.0
+        np.clip(out, 0.0, 1.0, out=out)
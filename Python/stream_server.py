@@ -0,0 +1,382 @@
+# Python/stream_server.py
+# Optional embedded HTTP streaming server for Musicova.
+# Serves library tracks and their cover art so the HTML player on other machines can play
+# what the desktop app (or musicova_cli.py) has indexed.
+#
+#   GET /tracks                  JSON list of tracks with their audio/art URLs
+#   GET /tracks/<id>/audio       the audio file; supports Range, If-Range, ETag/If-None-Match, HEAD
+#   GET /tracks/<id>/art         embedded or folder cover art
+#
+# Keeping local playback smooth while many listeners connect:
+#   * a fixed-size worker pool handles connections; when its backlog is full new clients get 503
+#   * open-ended ranges ("bytes=0-", which <audio> sends) are answered in MAX_RESPONSE_BYTES pieces,
+#     so a listener never holds a worker for a whole track; the browser asks for the next range itself
+#   * file bodies go out with socket.sendfile() (zero-copy os.sendfile where the OS supports it)
+#   * each client IP has a request-rate and a bandwidth token bucket
+#
+# There is no authentication: the server listens on 127.0.0.1 unless a host such as 0.0.0.0 is
+# passed explicitly to share tracks on the LAN, and allow_origin restricts which web player
+# origins may read responses (default "*", any page).
+import os
+import json
+import time
+import hashlib
+import threading
+import mimetypes
+import http.server
+from functools import lru_cache
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import library
+from throttle import TokenBucket
+
+DEFAULT_HOST = "127.0.0.1" # Pass "0.0.0.0" to let other machines connect
+DEFAULT_PORT = 8766
+DEFAULT_ALLOW_ORIGIN = "*" # Access-Control-Allow-Origin; the web player is usually on another origin
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 2)) # Bounded so streaming can't starve the player of CPU
+BACKLOG_PER_WORKER = 4 # Queued connections per worker before new clients are turned away with 503
+MAX_RESPONSE_BYTES = 4 * 1024 * 1024 # Largest body sent for an open-ended range request
+SEND_CHUNK_BYTES = 256 * 1024 # sendfile() slice size, so the bandwidth limit can be applied between slices
+CLIENT_REQUESTS_PER_SEC = 50 # Sustained request rate per client IP (burst is twice this)
+CLIENT_BYTES_PER_SEC = 8 * 1024 * 1024 # Sustained bandwidth per client IP; 0 disables the limit
+SOCKET_TIMEOUT_SEC = 30 # Stalled clients are disconnected so their worker is freed
+
+AUDIO_MIME_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav", ".ogg": "audio/ogg", ".flac": "audio/flac"}
+
+
+def track_id(file_path):
+    """Stable, opaque id for a file, so URLs don't expose local paths."""
+    return hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+
+
+def make_etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def etag_matches(header, etag):
+    """Whether an If-None-Match list ('"a", W/"b"' or '*') matches etag, using the weak comparison."""
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _parse_range(header, size):
+    """Returns (start, end) inclusive for a single satisfiable range, None for no/ignored Range, or 'invalid'.
+
+    Every range, explicit or not, is capped at MAX_RESPONSE_BYTES so one listener can't hold a
+    worker for a whole track; the browser asks for the rest itself.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None # Multipart ranges are not worth the complexity; send the whole file instead
+    spec = header[len("bytes="):].strip()
+    start_text, dash, end_text = spec.partition("-")
+    if not dash:
+        return None # Malformed; ignored like any other unusable Range
+    try:
+        if start_text == "": # Suffix range: last N bytes
+            length = int(end_text)
+            if length <= 0 or size == 0:
+                return "invalid"
+            start = max(0, size - length)
+            return start, min(size - 1, start + MAX_RESPONSE_BYTES - 1)
+        start = int(start_text)
+        end = int(end_text) if end_text != "" else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "invalid"
+    return start, min(size - 1, end, start + MAX_RESPONSE_BYTES - 1)
+
+
+@lru_cache(maxsize=256)
+def _cached_cover_art(file_path, etag):
+    # etag is part of the cache key so edited files are re-read
+    return library.read_cover_art(file_path)
+
+
+class ClientLimiter:
+    """Per-client-IP request and bandwidth buckets, shared by all worker threads."""
+
+    def __init__(self, requests_per_sec, bytes_per_sec):
+        self.requests_per_sec = requests_per_sec
+        self.bytes_per_sec = bytes_per_sec
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _buckets_for(self, client_ip):
+        buckets = self._buckets.get(client_ip)
+        if buckets is None:
+            if len(self._buckets) > 1024: # Forget idle clients now and then
+                self._buckets.clear()
+            buckets = self._buckets[client_ip] = (
+                TokenBucket(self.requests_per_sec, self.requests_per_sec * 2),
+                TokenBucket(self.bytes_per_sec, self.bytes_per_sec) if self.bytes_per_sec else None,
+            )
+        return buckets
+
+    def allow_request(self, client_ip):
+        with self._lock:
+            requests, _ = self._buckets_for(client_ip)
+            if requests.take(1) > 0:
+                requests.tokens += 1 # Rejected requests don't count
+                return False
+            return True
+
+    def bandwidth_delay(self, client_ip, nbytes):
+        with self._lock:
+            _, bandwidth = self._buckets_for(client_ip)
+            return bandwidth.take(nbytes) if bandwidth else 0.0
+
+
+class PooledHTTPServer(http.server.HTTPServer):
+    """HTTPServer that hands connections to a fixed ThreadPoolExecutor instead of a thread each."""
+
+    def __init__(self, address, handler_class, max_workers):
+        super().__init__(address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="musicova-stream")
+        self._max_pending = max_workers * (BACKLOG_PER_WORKER + 1)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._pending_lock:
+            if self._pending >= self._max_pending:
+                busy = True
+            else:
+                busy = False
+                self._pending += 1
+        if busy:
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 2\r\n"
+                                b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._process_in_worker, request, client_address)
+
+    def _process_in_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._pending_lock:
+                self._pending -= 1
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class StreamRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MusicovaStream"
+    timeout = SOCKET_TIMEOUT_SEC
+
+    def log_message(self, format, *args):
+        pass # Stay quiet; the GUI prints to the same console
+
+    # --- Helpers ---
+
+    def _send_common_headers(self):
+        self.send_header("Access-Control-Allow-Origin", self.server.allow_origin)
+        if self.server.allow_origin != "*":
+            self.send_header("Vary", "Origin")
+        self.send_header("Access-Control-Expose-Headers", "Content-Range, Accept-Ranges, ETag, Content-Length")
+        self.send_header("Connection", "close") # One request per connection keeps workers free
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self._send_common_headers()
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_status(self, status, extra_headers=()):
+        self.send_response(status)
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self._send_common_headers()
+        self.end_headers()
+
+    def _sendfile(self, f, offset, count):
+        client_ip = self.client_address[0]
+        self.wfile.flush()
+        while count > 0:
+            delay = self.server.limiter.bandwidth_delay(client_ip, min(count, SEND_CHUNK_BYTES))
+            if delay > 0:
+                time.sleep(delay)
+            sent = self.connection.sendfile(f, offset, min(count, SEND_CHUNK_BYTES))
+            if sent == 0:
+                break
+            offset += sent
+            count -= sent
+
+    # --- Request handling ---
+
+    def do_OPTIONS(self):
+        self._send_status(204, [("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS"),
+                                ("Access-Control-Allow-Headers", "Range, If-None-Match, If-Range")])
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        self.close_connection = True
+        if not self.server.limiter.allow_request(self.client_address[0]):
+            self._send_status(429, [("Retry-After", "1")])
+            return
+
+        parts = [p for p in urlsplit(self.path).path.split("/") if p]
+        if parts == ["tracks"]:
+            self._send_json({"tracks": self.server.catalog.listing()})
+            return
+        if len(parts) == 3 and parts[0] == "tracks":
+            entry = self.server.catalog.get(parts[1])
+            if entry is None:
+                self._send_json({"error": "Unknown track"}, 404)
+            elif parts[2] == "audio":
+                self._serve_audio(entry["file_path"])
+            elif parts[2] == "art":
+                self._serve_art(entry["file_path"])
+            else:
+                self._send_json({"error": "Not found"}, 404)
+            return
+        self._send_json({"error": "Not found"}, 404)
+
+    def _serve_audio(self, file_path):
+        try:
+            f = open(file_path, "rb")
+        except OSError:
+            self._send_json({"error": "File is no longer available"}, 404)
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            etag = make_etag(stat)
+
+            if etag_matches(self.headers.get("If-None-Match", ""), etag):
+                self._send_status(304, [("ETag", etag)])
+                return
+
+            byte_range = _parse_range(self.headers.get("Range"), size)
+            if_range = self.headers.get("If-Range")
+            if if_range and if_range.strip() != etag: # Strong comparison: a weak or date validator never matches
+                byte_range = None # File changed since the client's copy: send it whole
+            if byte_range == "invalid":
+                self._send_status(416, [("Content-Range", f"bytes */{size}")])
+                return
+
+            if byte_range is None:
+                start, end, status = 0, size - 1, 200
+            else:
+                (start, end), status = byte_range, 206
+            length = max(0, end - start + 1)
+
+            self.send_response(status)
+            self.send_header("Content-Type", AUDIO_MIME_TYPES.get(os.path.splitext(file_path)[1].lower(),
+                                                                  mimetypes.guess_type(file_path)[0] or "application/octet-stream"))
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache") # Revalidate with ETag; the file may be re-tagged
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self._send_common_headers()
+            self.end_headers()
+            if self.command != "HEAD" and length:
+                self._sendfile(f, start, length)
+
+    def _serve_art(self, file_path):
+        try:
+            etag = make_etag(os.stat(file_path))
+        except OSError:
+            self._send_json({"error": "File is no longer available"}, 404)
+            return
+        if etag_matches(self.headers.get("If-None-Match", ""), etag):
+            self._send_status(304, [("ETag", etag)])
+            return
+        art = _cached_cover_art(file_path, etag)
+        if art is None:
+            self._send_json({"error": "No cover art"}, 404)
+            return
+        data, mime = art
+        self.send_response(200)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "max-age=86400")
+        self._send_common_headers()
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+
+class TrackCatalog:
+    """The set of tracks the server may hand out. Replaced wholesale with set_tracks()."""
+
+    def __init__(self):
+        self._by_id = {}
+
+    def set_tracks(self, entries):
+        """entries: iterable of dicts with at least file_path (display_name and duration_sec optional)."""
+        by_id = {}
+        for entry in entries:
+            file_path = entry["file_path"]
+            by_id[track_id(file_path)] = {
+                "file_path": file_path,
+                "display_name": entry.get("display_name") or library.make_display_name(file_path),
+                "duration_sec": entry.get("duration_sec") or 0,
+            }
+        self._by_id = by_id # Single assignment, so readers on worker threads always see a complete dict
+
+    def get(self, tid):
+        return self._by_id.get(tid)
+
+    def listing(self):
+        return [{"id": tid, "name": e["display_name"], "duration_sec": e["duration_sec"],
+                 "audio_url": f"/tracks/{tid}/audio", "art_url": f"/tracks/{tid}/art"}
+                for tid, e in self._by_id.items()]
+
+
+class StreamServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS,
+                 requests_per_sec=CLIENT_REQUESTS_PER_SEC, bytes_per_sec=CLIENT_BYTES_PER_SEC,
+                 allow_origin=DEFAULT_ALLOW_ORIGIN):
+        self.catalog = TrackCatalog()
+        self._httpd = PooledHTTPServer((host, port), StreamRequestHandler, workers) # Binds now; raises OSError
+        self._httpd.catalog = self.catalog
+        self._httpd.limiter = ClientLimiter(requests_per_sec, bytes_per_sec)
+        self._httpd.allow_origin = allow_origin
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    def set_tracks(self, entries):
+        self.catalog.set_tracks(entries)
+
+    def start(self):
+        """Serves in a background thread and returns immediately."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="musicova-stream-accept", daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,6 @@
+# Python/tests/conftest.py
+# The modules live flat in Python/ and import each other by name, as when musicova.py runs.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,151 @@
+import json
+import socket
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import control_api
+from control_api import ControlServer
+
+
+class Player:
+    """Stands in for the GUI side of dispatch(): records commands and answers at once."""
+
+    def __init__(self):
+        self.commands = []
+
+    def dispatch(self, command, params):
+        self.commands.append((command, params))
+        future = Future()
+        if command == "seek" and not isinstance(params.get("position"), (int, float)):
+            future.set_exception(ValueError("position must be a number"))
+        else:
+            future.set_result({"state": "playing"} if command == "state" else None)
+        return future
+
+
+@pytest.fixture
+def server():
+    player = Player()
+    server = ControlServer(player.dispatch, port=0)
+    server.start()
+    server.player = player
+    yield server
+    server.stop()
+
+
+def _request(server, method, path, headers=None, body=b""):
+    headers = {"Host": f"127.0.0.1:{server.port}", **(headers or {})}
+    if body:
+        headers["Content-Length"] = str(len(body))
+    head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+        sock.sendall(head.encode("latin-1") + body)
+        response = b""
+        while chunk := sock.recv(65536):
+            response += chunk
+    status_line, _, rest = response.partition(b"\r\n")
+    return int(status_line.split()[1]), json.loads(rest.partition(b"\r\n\r\n")[2])
+
+
+def _json(payload):
+    return {"Content-Type": "application/json"}, json.dumps(payload).encode()
+
+
+def test_commands_are_routed_with_body_and_query_parameters(server):
+    headers, body = _json({"position": 12.5})
+    assert _request(server, "POST", "/seek", headers, body) == (200, {"ok": True})
+    assert _request(server, "GET", "/library?q=piano") == (200, {"ok": True})
+    assert _request(server, "POST", "/next/") == (200, {"ok": True})
+    assert server.player.commands == [("seek", {"position": 12.5}), ("library", {"q": "piano"}), ("next", {})]
+
+
+def test_unknown_routes_and_bad_parameters(server):
+    assert _request(server, "GET", "/nothing")[0] == 404
+    assert _request(server, "GET", "/play")[0] == 405
+    headers, body = _json({"position": "soon"})
+    assert _request(server, "POST", "/seek", headers, body)[0] == 400
+    headers, body = _json([1, 2])
+    assert _request(server, "POST", "/seek", headers, body)[0] == 400
+
+
+@pytest.mark.parametrize("headers", [
+    {"Origin": "http://127.0.0.1:8000"}, # Any page in a browser, even a local one
+    {"Origin": "null"},
+    {"Host": "attacker.example:8765"}, # DNS rebinding: the page's own name resolved to 127.0.0.1
+    {"Host": "127.0.0.1"}, # Port missing
+    {"Host": ""},
+])
+def test_browser_and_rebound_requests_are_refused(server, headers):
+    status, payload = _request(server, "POST", "/stop", headers)
+    assert status == 403 and "error" in payload
+    assert server.player.commands == []
+
+
+def test_other_loopback_names_are_accepted(server):
+    assert _request(server, "GET", "/state", {"Host": f"localhost:{server.port}"}) == (200, {"state": "playing"})
+
+
+@pytest.mark.parametrize("content_type", [None, "text/plain", "application/x-www-form-urlencoded",
+                                          "multipart/form-data; boundary=x"])
+def test_bodies_must_be_json(server, content_type):
+    headers = {"Content-Type": content_type} if content_type else {}
+    assert _request(server, "POST", "/queue/add", headers, b'{"paths": ["/x.mp3"]}')[0] == 415
+    assert server.player.commands == []
+
+
+def test_json_content_type_with_charset_is_accepted(server):
+    headers = {"Content-Type": "application/json; charset=utf-8"}
+    assert _request(server, "POST", "/queue/add", headers, b'{"paths": []}')[0] == 200
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_events_reach_subscribers(server):
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+        sock.sendall(f"GET /events HTTP/1.1\r\nHost: 127.0.0.1:{server.port}\r\n\r\n".encode())
+        assert _wait_for(lambda: server.has_subscribers)
+        server.publish("track", {"title": "Song"})
+        received = b""
+        while b"event: track" not in received or not received.endswith(b"\n\n"):
+            received += sock.recv(65536)
+    assert b"200 OK" in received and b'event: state\ndata: {"state": "playing"}' in received
+    assert b'event: track\ndata: {"title": "Song"}\n\n' in received
+
+
+def test_stalled_subscriber_is_dropped_and_disconnected(server, monkeypatch):
+    monkeypatch.setattr(control_api, "SUBSCRIBER_QUEUE_SIZE", 4)
+    dropped = []
+    close_subscriber = server._close_subscriber
+
+    def record_close(queue): # Runs on the loop thread
+        writer = server._subscribers.get(queue)
+        close_subscriber(queue)
+        dropped.append(writer.transport.is_closing())
+    monkeypatch.setattr(server, "_close_subscriber", record_close)
+
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(("127.0.0.1", server.port))
+    try:
+        sock.sendall(f"GET /events HTTP/1.1\r\nHost: 127.0.0.1:{server.port}\r\n\r\n".encode())
+        assert _wait_for(lambda: server.has_subscribers)
+        padding = "x" * 65536
+        for i in range(1000): # Never read: the socket and the transport fill up, then the queue
+            server.publish("state", {"n": i, "padding": padding})
+            if dropped:
+                break
+            time.sleep(0.001)
+        assert _wait_for(lambda: dropped)
+        assert dropped == [True] # Its connection is closed at once, not left stuck in drain()
+        assert not server.has_subscribers
+    finally:
+        sock.close()
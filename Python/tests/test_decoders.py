@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pytest
+
+import decoders
+
+
+class FakeDecoder(decoders.Decoder):
+    """Reads files whose content is the name of a backend that can decode them ("any" for all)."""
+    sample_rate, channels, frames = 8000, 1, 8000
+
+    def __init__(self, file_path):
+        with open(file_path) as f:
+            readable_by = f.read().split()
+        if self.name not in readable_by and "any" not in readable_by:
+            raise ValueError(f"{self.name} cannot read this")
+        self._left = self.frames
+
+    def read(self, frames):
+        n = min(frames, self._left)
+        self._left -= n
+        return np.zeros((n, 1), dtype=np.float32)
+
+    def seek(self, seconds):
+        pass
+
+
+def _backend(name):
+    return type(f"Fake_{name}", (FakeDecoder,), {"name": name})
+
+
+@pytest.fixture
+def backends(tmp_path, monkeypatch):
+    monkeypatch.setattr(decoders, "CACHE_PATH", str(tmp_path / "decoders.json"))
+    monkeypatch.setattr(decoders, "_timings", None)
+    monkeypatch.setattr(decoders, "BACKENDS", {name: _backend(name) for name in ("fast", "slow")})
+    return tmp_path
+
+
+def _audio_file(directory, name, readable_by):
+    path = directory / name
+    path.write_text(readable_by)
+    return str(path)
+
+
+def _cache(directory):
+    return json.loads((directory / "decoders.json").read_text())["timings"]
+
+
+def test_unreadable_file_is_not_cached_and_next_file_is_used(backends):
+    corrupt = _audio_file(backends, "corrupt.flac", "")
+    good = _audio_file(backends, "good.flac", "any")
+    assert decoders.measure(corrupt) is False
+    assert not (backends / "decoders.json").exists()
+    decoders.calibrate([corrupt, good])
+    assert set(_cache(backends)[".flac"]) == {"fast", "slow"}
+    assert all(seconds is not None for seconds in _cache(backends)[".flac"].values())
+
+
+def test_calibrate_gives_up_after_a_few_unreadable_files(backends, monkeypatch):
+    measured = []
+    monkeypatch.setattr(decoders, "measure", lambda path: measured.append(path) or False)
+    paths = [_audio_file(backends, f"{n}.ogg", "") for n in range(10)]
+    decoders.calibrate(paths)
+    assert len(measured) == decoders.CALIBRATION_ATTEMPTS
+
+
+def test_failed_backend_stays_usable_as_last_resort(backends):
+    decoders.measure(_audio_file(backends, "a.mp3", "slow"))
+    timings = _cache(backends)[".mp3"]
+    assert timings["fast"] is None and timings["slow"] > 0
+    assert [cls.name for cls in decoders.backends_for("x.mp3")] == ["slow", "fast"]
+    only_fast = _audio_file(backends, "b.mp3", "fast")
+    with decoders.open_decoder(only_fast) as decoder:
+        assert decoder.name == "fast"
+
+
+def test_backends_are_ranked_by_timing_without_measuring(backends, monkeypatch):
+    (backends / "decoders.json").write_text(json.dumps(
+        {"version": decoders.CACHE_VERSION, "timings": {".wav": {"fast": 0.1, "slow": 0.5}}}))
+    monkeypatch.setattr(decoders, "benchmark", lambda *args: pytest.fail("backends_for() must not measure"))
+    assert [cls.name for cls in decoders.backends_for("song.wav")] == ["fast", "slow"]
+    assert [cls.name for cls in decoders.backends_for("song.flac")] == ["fast", "slow"] # Untimed: default order
+    assert decoders.calibration_candidates(["a.wav", "b.flac"]) == ["b.flac"]
+
+
+def test_open_errors_name_each_backend_and_hint_only_without_backends(backends, monkeypatch):
+    unreadable = _audio_file(backends, "c.flac", "")
+    with pytest.raises(RuntimeError, match="fast: .*slow: ") as error:
+        decoders.open_decoder(unreadable)
+    assert "install" not in str(error.value)
+    monkeypatch.setattr(decoders, "BACKENDS", {})
+    with pytest.raises(RuntimeError, match="install"):
+        decoders.open_decoder(unreadable)
+
+
+def _tone(frequency, rate, seconds=1.0):
+    samples = np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+    return np.repeat(samples[:, None], 2, axis=1)
+
+
+@pytest.mark.parametrize("from_rate", [48000, 22050, 96000, 44056])
+def test_resampler_is_continuous_across_blocks(from_rate):
+    signal = _tone(1000, from_rate)
+    whole = decoders.Resampler(from_rate, 44100, 2)
+    expected = np.concatenate([whole.process(signal), whole.flush()])
+    streaming = decoders.Resampler(from_rate, 44100, 2)
+    blocks = [streaming.process(signal[i:i + 4459]) for i in range(0, len(signal), 4459)]
+    result = np.concatenate(blocks + [streaming.flush(), streaming.flush()])
+    assert len(result) == 44100 # No frames lost at block edges
+    np.testing.assert_allclose(result, expected, atol=1e-6)
+    np.testing.assert_allclose(result[500:-500], _tone(1000, 44100)[500:-500], atol=1e-3)
+
+
+def test_resampler_filters_what_the_new_rate_cannot_hold():
+    resampler = decoders.Resampler(48000, 22050, 2)
+    output = np.concatenate([resampler.process(_tone(15000, 48000)), resampler.flush()]) # Above 11025 Hz
+    assert np.sqrt(np.mean(output[500:-500] ** 2)) < 1e-3
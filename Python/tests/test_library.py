@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile
+from mutagen import File as MutagenFile
+from mutagen.flac import FLAC
+
+import library
+
+
+@pytest.fixture
+def flac_file(tmp_path):
+    path = tmp_path / "Band - Song.flac"
+    soundfile.write(str(path), np.zeros((4410, 2), dtype=np.float32), 44100)
+    audio = MutagenFile(str(path), easy=True)
+    audio["title"], audio["album"] = ["Song"], ["Old Album"]
+    audio.save()
+    os.chmod(path, 0o640)
+    return str(path)
+
+
+def _leftovers(path):
+    return [name for name in os.listdir(os.path.dirname(path)) if "musicova-tmp" in name]
+
+
+def test_write_tags_replaces_file_with_edited_copy(flac_file):
+    inode = os.stat(flac_file).st_ino
+    path, info, changed, error = library.write_tags((flac_file, {"set": {"album": "New Album", "title": ""}}))
+    assert (path, changed, error) == (flac_file, True, None)
+    assert info["album"] == "New Album"
+    tags = MutagenFile(flac_file, easy=True)
+    assert tags["album"] == ["New Album"] and "title" not in tags
+    assert os.stat(flac_file).st_ino != inode # Renamed into place, not rewritten in place
+    assert os.stat(flac_file).st_mode & 0o777 == 0o640
+    assert not _leftovers(flac_file)
+
+
+def test_write_tags_failure_leaves_original_untouched(flac_file, monkeypatch):
+    with open(flac_file, "rb") as f:
+        original = f.read()
+
+    def failing_save(self, *args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(FLAC, "save", failing_save)
+    path, info, changed, error = library.write_tags((flac_file, {"set": {"album": "New Album"}}))
+    assert (info, changed) == (None, False)
+    assert "No space left" in error
+    with open(flac_file, "rb") as f:
+        assert f.read() == original
+    assert not _leftovers(flac_file)
+
+
+def test_write_tags_without_changes_does_not_touch_file(flac_file):
+    before = os.stat(flac_file)
+    path, info, changed, error = library.write_tags((flac_file, {"set": {"album": "Old Album"}}))
+    assert (changed, error) == (False, None)
+    after = os.stat(flac_file)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_plan_tag_changes_from_file_name_pattern():
+    changes = library.plan_tag_changes("/music/Band - Song.flac", {"artist": None, "title": "Song"},
+                                       {"pattern": "%artist% - %title%"})
+    assert changes == {"artist": "Band"}
+
+
+@pytest.mark.parametrize("content", [b'{"version": 1, "tra', b"\xff\xfe not utf-8", b"[]"])
+def test_unreadable_index_loads_as_empty(tmp_path, content):
+    index_path = tmp_path / "index.json"
+    index_path.write_bytes(content)
+    assert library.load_index(str(index_path)) == library.new_index()
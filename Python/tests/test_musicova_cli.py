@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+import decoders
+import musicova_cli
+
+
+@pytest.fixture
+def decoder_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(decoders, "CACHE_PATH", str(tmp_path / "decoders.json"))
+    monkeypatch.setattr(decoders, "_timings", None)
+    monkeypatch.setattr(decoders, "BACKENDS", {name: type(name, (decoders.Decoder,), {"name": name})
+                                               for name in ("fast", "slow")})
+    monkeypatch.setattr(decoders, "benchmark", lambda backend, path: {"fast": 0.1, "slow": 0.2}[backend.name])
+    return tmp_path / "decoders.json"
+
+
+def test_decoders_force_measures_again_and_saves(decoder_cache, tmp_path, capsys):
+    song = tmp_path / "song.wav"
+    song.write_bytes(b"")
+    old = {".wav": {"fast": 9.0, "slow": 1.0}, ".flac": {"fast": 1.0, "slow": 2.0}}
+    decoder_cache.write_text(json.dumps({"version": decoders.CACHE_VERSION, "timings": old}))
+    decoders.load_timings() # Cached in memory, as in a session that has already picked backends
+
+    assert musicova_cli.main(["decoders", str(song), "--force", "--index", str(tmp_path / "index.json")]) == 0
+    saved = json.loads(decoder_cache.read_text())["timings"]
+    assert saved == {".wav": {"fast": 0.1, "slow": 0.2}, ".flac": old[".flac"]}
+    assert json.loads(capsys.readouterr().out)["timings"] == saved
+
+
+def test_decoders_force_clears_saved_timings_even_if_nothing_can_be_measured(decoder_cache, tmp_path, monkeypatch):
+    song = tmp_path / "song.wav"
+    song.write_bytes(b"")
+    decoder_cache.write_text(json.dumps({"version": decoders.CACHE_VERSION, "timings": {".wav": {"fast": 9.0}}}))
+    monkeypatch.setattr(decoders, "benchmark", lambda backend, path: None)
+
+    musicova_cli.main(["decoders", str(song), "--force", "--index", str(tmp_path / "index.json")])
+    assert json.loads(decoder_cache.read_text())["timings"] == {}
+
+
+def test_damaged_index_is_rebuilt(tmp_path, capsys):
+    index_path = tmp_path / "index.json"
+    index_path.write_text('{"version": 1, "tracks": {"/music/a.flac": {"si') # Cut short by a killed scan
+    folder = tmp_path / "empty"
+    folder.mkdir()
+    assert musicova_cli.main(["scan", str(folder), "--index", str(index_path), "--jobs", "1"]) == 0
+    assert json.loads(index_path.read_text())["tracks"] == {}
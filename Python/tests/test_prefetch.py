@@ -0,0 +1,76 @@
+import time
+
+import prefetch
+from prefetch import Prefetcher
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_warms_upcoming_files(tmp_path):
+    files = [tmp_path / f"{n}.flac" for n in range(3)]
+    for f in files:
+        f.write_bytes(b"x" * 1000)
+    prefetcher = Prefetcher(depth=2, bytes_per_sec=0)
+    prefetcher.start()
+    try:
+        prefetcher.set_upcoming(str(f) for f in files)
+        assert _wait_until(lambda: prefetcher.is_warm(str(files[0])) and prefetcher.is_warm(str(files[1])))
+        assert not prefetcher.is_warm(str(files[2])) # Beyond depth
+        assert prefetcher.bytes_read == 2000
+        files[0].write_bytes(b"y" * 10) # Changed since it was warmed: read again when the queue moves on
+        prefetcher.set_upcoming(str(f) for f in files[1:])
+        prefetcher.set_upcoming(str(f) for f in files)
+        assert _wait_until(lambda: prefetcher.bytes_read == 2010)
+    finally:
+        prefetcher.stop()
+
+
+def test_is_warm_does_not_touch_the_file_system(tmp_path, monkeypatch):
+    song = tmp_path / "song.flac"
+    song.write_bytes(b"x" * 100)
+    prefetcher = Prefetcher(depth=1, bytes_per_sec=0)
+    prefetcher.start()
+    try:
+        prefetcher.set_upcoming([str(song)])
+        assert _wait_until(lambda: prefetcher.is_warm(str(song)))
+        monkeypatch.setattr(prefetch.os, "stat", lambda *args, **kwargs: time.sleep(10)) # A stalled mount
+        started = time.monotonic()
+        assert prefetcher.record_start(str(song), 0.05) is True
+        assert prefetcher.record_start(str(tmp_path / "other.flac"), 0.5) is False
+        assert time.monotonic() - started < 1
+    finally:
+        monkeypatch.undo()
+        prefetcher.stop()
+
+
+def test_unreadable_file_is_not_retried_in_a_loop(tmp_path, monkeypatch):
+    broken, good = tmp_path / "broken.flac", tmp_path / "good.flac"
+    broken.write_bytes(b"x" * 100)
+    good.write_bytes(b"x" * 100)
+    attempts = []
+    warm = Prefetcher._warm
+
+    def failing_warm(self, path, size):
+        attempts.append(path)
+        if path == str(broken):
+            raise OSError("I/O error")
+        return warm(self, path, size)
+
+    monkeypatch.setattr(Prefetcher, "_warm", failing_warm)
+    prefetcher = Prefetcher(depth=2, bytes_per_sec=0)
+    prefetcher.start()
+    try:
+        prefetcher.set_upcoming([str(broken), str(good)])
+        assert _wait_until(lambda: prefetcher.is_warm(str(good))) # A failure doesn't block the next file
+        time.sleep(0.2)
+        assert attempts.count(str(broken)) == 1
+        monkeypatch.setattr(prefetch, "RETRY_FAILED_SEC", 0)
+        prefetcher.set_upcoming([str(good), str(broken)]) # Tried again once the back-off has passed
+        assert _wait_until(lambda: attempts.count(str(broken)) >= 2)
+    finally:
+        prefetcher.stop()
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import soundfile
+
+from similarity import ANALYSIS_SAMPLE_RATE, FEATURE_DIM, SimilarityIndex, extract_features
+
+
+def _random_index(count, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, FEATURE_DIM)).astype(np.float32)
+    index = SimilarityIndex()
+    for i, vector in enumerate(vectors):
+        index.add(f"/music/{i}.flac", 1000 + i, 1.5 * i, vector)
+    return index, vectors
+
+
+def _brute_force(index, vectors_by_path, query_path, k):
+    paths = list(vectors_by_path)
+    vectors = np.array([vectors_by_path[p] for p in paths], dtype=np.float64)
+    std = vectors.std(axis=0)
+    scaled = (vectors - vectors.mean(axis=0)) / np.where(std == 0, 1.0, std)
+    unit = scaled / np.linalg.norm(scaled, axis=1, keepdims=True)
+    scores = unit @ unit[paths.index(query_path)]
+    ranked = sorted((p for p in paths if p != query_path), key=lambda p: -scores[paths.index(p)])
+    return [(p, scores[paths.index(p)]) for p in ranked[:k]]
+
+
+def _assert_same_ranking(found, expected):
+    assert [path for path, _ in found] == [path for path, _ in expected]
+    np.testing.assert_allclose([score for _, score in found], [score for _, score in expected], atol=1e-5)
+
+
+def test_nearest_matches_brute_force_cosine():
+    index, vectors = _random_index(300)
+    by_path = {f"/music/{i}.flac": v for i, v in enumerate(vectors)}
+    for query in ("/music/0.flac", "/music/123.flac", "/music/299.flac"):
+        _assert_same_ranking(index.nearest(query, k=10), _brute_force(index, by_path, query, 10))
+    assert index.nearest("/music/not-indexed.flac") == []
+    assert len(index.nearest("/music/0.flac", k=1000)) == 299
+
+
+def test_nearest_after_remove():
+    index, vectors = _random_index(50)
+    by_path = {f"/music/{i}.flac": v for i, v in enumerate(vectors)}
+    best = index.nearest("/music/7.flac", k=1)[0][0]
+    for path in (best, "/music/0.flac", "/music/49.flac"): # Includes the last row, and rows moved into holes
+        index.remove(path)
+        del by_path[path]
+    assert len(index) == 47 and best not in index
+    for query in ("/music/7.flac", "/music/48.flac"):
+        _assert_same_ranking(index.nearest(query, k=46), _brute_force(index, by_path, query, 46))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index, _ = _random_index(80)
+    index.remove("/music/3.flac")
+    store = str(tmp_path / "features.npz")
+    index.save(store)
+    loaded = SimilarityIndex.load(store)
+    assert loaded.paths == index.paths
+    assert loaded.is_current("/music/10.flac", 1010, 15.0) and not loaded.is_current("/music/10.flac", 1010, 16.0)
+    assert loaded.nearest("/music/5.flac", k=5) == index.nearest("/music/5.flac", k=5)
+    assert list(tmp_path.iterdir()) == [tmp_path / "features.npz"] # No temp file left behind
+
+
+def test_load_missing_or_damaged_store_is_empty(tmp_path):
+    assert len(SimilarityIndex.load(str(tmp_path / "missing.npz"))) == 0
+    damaged = tmp_path / "features.npz"
+    damaged.write_bytes(b"PK\x03\x04 cut short")
+    assert len(SimilarityIndex.load(str(damaged))) == 0
+
+
+def test_radio_candidates_skip_recent_and_excluded_tracks():
+    index, _ = _random_index(40)
+    history = [f"/music/{i}.flac" for i in range(5)]
+    excluded = {"/music/10.flac", "/music/11.flac"}
+    candidates = index.radio_candidates(history, k=40, exclude=excluded)
+    paths = [path for path, _ in candidates]
+    assert len(paths) == 40 - len(history) - len(excluded)
+    assert not set(paths) & (set(history) | excluded)
+    assert [score for _, score in candidates] == sorted((score for _, score in candidates), reverse=True)
+    assert index.radio_candidates(["/music/unknown.flac"]) == []
+
+
+def test_concurrent_saves_merge_instead_of_overwriting(tmp_path):
+    store = str(tmp_path / "features.npz")
+    base, vectors = _random_index(10)
+    base.save(store)
+    gui, cli = SimilarityIndex.load(store), SimilarityIndex.load(store)
+
+    cli.add("/music/cli.flac", 1, 1.0, vectors[0])
+    cli.remove("/music/9.flac") # Dropped from the library
+    cli.save(store)
+    gui.add("/music/gui.flac", 2, 2.0, vectors[1])
+    gui.add("/music/0.flac", 3, 3.0, vectors[2]) # Re-analysed: this session's copy wins
+    gui.save(store)
+
+    saved = SimilarityIndex.load(store)
+    assert {"/music/cli.flac", "/music/gui.flac"} <= set(saved.paths) and "/music/9.flac" not in saved
+    assert saved.is_current("/music/0.flac", 3, 3.0)
+    assert set(gui.paths) == set(saved.paths) # The saving session now sees the other's rows too
+
+
+def test_extract_features(tmp_path):
+    path = tmp_path / "tone.wav"
+    t = np.arange(3 * ANALYSIS_SAMPLE_RATE) / ANALYSIS_SAMPLE_RATE
+    soundfile.write(str(path), (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32), ANALYSIS_SAMPLE_RATE)
+    file_path, size, mtime, vector, error = extract_features(str(path))
+    assert (file_path, size, error) == (str(path), path.stat().st_size, None)
+    assert vector.shape == (FEATURE_DIM,) and vector.dtype == np.float32 and np.isfinite(vector).all()
+
+    path.write_bytes(b"not audio")
+    vector, error = extract_features(str(path))[3:]
+    assert vector is None and error
+    vector, error = extract_features(str(tmp_path / "missing.wav"))[3:]
+    assert vector is None and error
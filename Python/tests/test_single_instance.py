@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import socket
+import uuid
+import threading
+
+import pytest
+from PyQt5.QtCore import QCoreApplication, QDir, QLockFile
+from PyQt5.QtNetwork import QLocalSocket
+
+import single_instance
+from single_instance import InstanceServer, claim_or_hand_off, hand_off
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def instance_name(tmp_path, monkeypatch):
+    name = f"musicova-test-{uuid.uuid4().hex[:12]}" # Never the real instance of whoever runs the tests
+    monkeypatch.setattr(single_instance, "SERVER_NAME", name)
+    monkeypatch.setattr(single_instance, "LOCK_PATH", str(tmp_path / f"{name}.lock"))
+    return name
+
+
+@pytest.fixture
+def server(app, instance_name):
+    server = InstanceServer()
+    received = []
+    server.command_line_received.connect(lambda argv, cwd: received.append((argv, cwd)))
+    assert server.listen()
+    server.received = received
+    yield server
+    server.close()
+
+
+def _in_thread(app, function):
+    """Runs a blocking client call on a thread while this thread serves Qt events."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = function()
+        except BaseException as e: # SystemExit from claim_or_hand_off()
+            outcome["error"] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while thread.is_alive() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    thread.join()
+    app.processEvents()
+    return outcome
+
+
+def test_first_launch_takes_the_lock(app, instance_name):
+    lock = claim_or_hand_off(["song.mp3"])
+    try:
+        assert isinstance(lock, QLockFile) and lock.isLocked()
+    finally:
+        lock.unlock()
+
+
+@pytest.mark.parametrize("argv", [["--new-instance"], ["-h"], ["song.mp3", "--help"]])
+def test_some_arguments_skip_single_instance_mode(app, instance_name, argv):
+    assert claim_or_hand_off(argv) is None
+    assert not os.path.exists(single_instance.LOCK_PATH)
+
+
+def test_later_launch_hands_off_its_command_line_and_exits(app, server):
+    outcome = _in_thread(app, lambda: claim_or_hand_off(["a.flac", "--enqueue"]))
+    assert isinstance(outcome.get("error"), SystemExit) and outcome["error"].code == 0
+    assert server.received == [(["a.flac", "--enqueue"], os.getcwd())]
+
+
+def test_hand_off_without_a_running_instance_fails_fast(app, instance_name):
+    started = time.monotonic()
+    assert hand_off(["a.flac"]) is False
+    assert time.monotonic() - started < 1
+
+
+def test_lock_holder_that_never_answers_gives_a_separate_instance(app, instance_name, monkeypatch):
+    monkeypatch.setattr(single_instance, "STARTUP_WAIT_SEC", 0.3)
+    holder = QLockFile(single_instance.LOCK_PATH)
+    holder.setStaleLockTime(0)
+    assert holder.tryLock(0) # An instance that is still starting up, or hung
+    try:
+        started = time.monotonic()
+        assert claim_or_hand_off(["a.flac"]) is None
+        assert 0.3 <= time.monotonic() - started < 3
+    finally:
+        holder.unlock()
+
+
+def test_malformed_messages_are_dropped(app, server):
+    def send(payload):
+        connection = QLocalSocket()
+        connection.connectToServer(single_instance.SERVER_NAME)
+        assert connection.waitForConnected(1000)
+        connection.write(payload)
+        connection.waitForBytesWritten(1000)
+        answered = connection.waitForReadyRead(500) and bytes(connection.readLine()).strip() == b"ok"
+        connection.abort()
+        return answered
+
+    for payload in (b"not json\n", json.dumps({"cwd": "/"}).encode() + b"\n", b'{"argv": 5}\n'):
+        assert _in_thread(app, lambda: send(payload))["result"] is False
+    assert server.received == []
+    assert _in_thread(app, lambda: send(b'{"argv": ["x.mp3"]}\n'))["result"] is True # Still serving
+    assert server.received == [(["x.mp3"], "")]
+
+
+def test_closed_server_stops_taking_launches(app, server):
+    server.close()
+    assert _in_thread(app, lambda: hand_off(["a.flac"]))["result"] is False
+    assert server.received == []
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Named pipes on Windows are not left behind")
+def test_socket_left_by_a_crashed_instance_is_replaced(app, instance_name):
+    path = os.path.join(QDir.tempPath(), instance_name)
+    crashed = socket.socket(socket.AF_UNIX)
+    crashed.bind(path) # Bound, never listening, never unlinked: what a killed instance leaves behind
+    crashed.close()
+    server = InstanceServer()
+    try:
+        assert server.listen()
+        assert server.server.fullServerName() == path
+    finally:
+        server.close()
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+import spectrum
+from spectrum import BAND_COUNT, FALL_PER_FRAME, FFT_SIZE, FLOOR_DB, SpectrumAnalyzer, band_matrix
+
+RATE = 44100
+
+
+def _sine(frequency, db=0.0, channels=(1.0, 1.0)):
+    t = np.arange(FFT_SIZE) / RATE
+    tone = 10 ** (db / 20) * np.sin(2 * np.pi * frequency * t)
+    return np.stack([tone * gain for gain in channels], axis=1).astype(np.float32)
+
+
+def _band_of(frequency):
+    edges = np.geomspace(spectrum.LOWEST_BAND_HZ, RATE / 2, BAND_COUNT + 1)
+    return int(np.searchsorted(edges, frequency, side="right") - 1)
+
+
+def test_band_matrix_averages_every_bin_of_each_band():
+    matrix = band_matrix(RATE)
+    assert matrix.shape == (FFT_SIZE // 2 + 1, BAND_COUNT)
+    np.testing.assert_allclose(matrix.sum(axis=0), 1.0, rtol=1e-5) # Every band is an average, none empty
+    frequencies = np.fft.rfftfreq(FFT_SIZE, 1.0 / RATE)
+    for frequency in (1000.0, 5000.0, 15000.0): # Bands several bins wide
+        bin_index = int(np.argmin(np.abs(frequencies - frequency)))
+        assert np.flatnonzero(matrix[bin_index]).tolist() == [_band_of(frequencies[bin_index])]
+    assert not matrix[frequencies < spectrum.LOWEST_BAND_HZ - RATE / FFT_SIZE].any() # Below the first band
+
+
+def test_band_matrix_depends_on_sample_rate():
+    assert not np.array_equal(band_matrix(44100), band_matrix(48000))
+
+
+def test_band_levels_match_a_direct_computation():
+    analyzer = SpectrumAnalyzer()
+    analyzer.frame[:] = _sine(1000.0, db=-12.0) + _sine(6000.0, db=-30.0, channels=(0.0, 1.0))
+    analyzer.analyze(RATE)
+
+    window = np.hanning(FFT_SIZE)
+    magnitude = np.abs(np.fft.rfft(analyzer.frame.mean(axis=1) * window)) * 2 / window.sum()
+    frequencies = np.fft.rfftfreq(FFT_SIZE, 1.0 / RATE)
+    band = _band_of(1000.0)
+    edges = np.geomspace(spectrum.LOWEST_BAND_HZ, RATE / 2, BAND_COUNT + 1)
+    in_band = (frequencies >= edges[band]) & (frequencies < edges[band + 1])
+    expected = 1.0 + 20 * np.log10(magnitude[in_band].mean()) / -FLOOR_DB
+    assert analyzer.levels[band] == pytest.approx(expected, abs=1e-4)
+    assert np.argsort(analyzer.levels)[-2:].tolist() == [_band_of(6000.0), band] # The two tones stand out
+    assert analyzer.levels[_band_of(100.0)] == 0.0
+
+
+def test_levels_and_meter_are_linear_in_db():
+    loud, quiet = SpectrumAnalyzer(), SpectrumAnalyzer()
+    loud.frame[:] = _sine(1000.0)
+    quiet.frame[:] = _sine(1000.0, db=FLOOR_DB / 2)
+    loud.analyze(RATE)
+    quiet.analyze(RATE)
+    band = _band_of(1000.0)
+    assert loud.levels[band] - quiet.levels[band] == pytest.approx(0.5, abs=1e-3)
+    # RMS of a full-scale sine is -3 dB
+    np.testing.assert_allclose(loud.vu, 1.0 + 20 * np.log10(np.sqrt(0.5)) / -FLOOR_DB, atol=1e-3)
+    np.testing.assert_allclose(loud.vu - quiet.vu, 0.5, atol=1e-3)
+
+    one_sided = SpectrumAnalyzer()
+    one_sided.frame[:] = _sine(1000.0, channels=(1.0, 0.0))
+    one_sided.analyze(RATE)
+    assert one_sided.vu[0] == pytest.approx(loud.vu[0], abs=1e-6)
+    assert one_sided.vu[1] == 0.0 # Silent channel sits at the floor
+    # The spectrum shows the mono mix: one channel alone is 6 dB down
+    assert loud.levels[band] - one_sided.levels[band] == pytest.approx(20 * np.log10(2) / -FLOOR_DB, abs=1e-3)
+
+
+def test_silence_shows_nothing():
+    analyzer = SpectrumAnalyzer()
+    analyzer.analyze(RATE)
+    assert not analyzer.levels.any() and not analyzer.vu.any()
+
+
+def test_peaks_are_held_and_fall_at_a_fixed_rate():
+    analyzer = SpectrumAnalyzer()
+    analyzer.frame[:] = _sine(1000.0)
+    analyzer.analyze(RATE)
+    peak_vu, peak_band = analyzer.vu.copy(), analyzer.levels[_band_of(1000.0)]
+    analyzer.frame[:] = 0.0
+    for frame in range(1, 4): # Quieter input: the displayed level only falls FALL_PER_FRAME per frame
+        analyzer.analyze(RATE)
+        np.testing.assert_allclose(analyzer.vu, peak_vu - frame * FALL_PER_FRAME, atol=1e-6)
+        assert analyzer.levels[_band_of(1000.0)] == pytest.approx(peak_band - frame * FALL_PER_FRAME, abs=1e-6)
+    analyzer.frame[:] = _sine(1000.0)
+    analyzer.analyze(RATE) # Louder input is shown at once
+    np.testing.assert_allclose(analyzer.vu, peak_vu, atol=1e-6)
+
+
+def test_decay_runs_down_to_zero_and_reports_it():
+    analyzer = SpectrumAnalyzer()
+    analyzer.frame[:] = _sine(1000.0)
+    analyzer.analyze(RATE)
+    frames = 1
+    while analyzer.decay():
+        frames += 1
+        assert frames <= int(1 / FALL_PER_FRAME) + 1
+    assert frames >= int(0.9 / FALL_PER_FRAME)
+    assert not analyzer.levels.any() and not analyzer.vu.any()
+
+
+def test_frames_reuse_the_same_buffers():
+    analyzer = SpectrumAnalyzer()
+    buffers = [analyzer.frame, analyzer.levels, analyzer.vu, analyzer.band_power, analyzer.magnitude]
+    analyzer.frame[:] = _sine(440.0)
+    analyzer.analyze(RATE)
+    matrix = analyzer.band_matrix
+    analyzer.analyze(RATE)
+    analyzer.decay()
+    assert all(a is b for a, b in zip(buffers, [analyzer.frame, analyzer.levels, analyzer.vu,
+                                                 analyzer.band_power, analyzer.magnitude]))
+    assert analyzer.band_matrix is matrix # Rebuilt only when the sample rate changes
+    analyzer.analyze(48000)
+    assert analyzer.band_matrix is not matrix
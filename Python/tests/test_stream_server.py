@@ -0,0 +1,45 @@
+import pytest
+
+from stream_server import MAX_RESPONSE_BYTES, _parse_range, etag_matches
+
+SIZE = 10 * MAX_RESPONSE_BYTES
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 100 + MAX_RESPONSE_BYTES - 1)),
+    ("bytes=0-", (0, MAX_RESPONSE_BYTES - 1)),
+    ("bytes=-100", (SIZE - 100, SIZE - 1)),
+    ("bytes=5-5", (5, 5)),
+    ("bytes=0-999999999999", (0, MAX_RESPONSE_BYTES - 1)), # Explicit ends are capped too
+    ("bytes=-999999999999", (0, MAX_RESPONSE_BYTES - 1)),
+    (f"bytes={SIZE - 10}-{SIZE + 10}", (SIZE - 10, SIZE - 1)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-50", f"bytes={SIZE}-", f"bytes={SIZE + 1}-{SIZE + 5}", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    assert _parse_range(header, SIZE) == "invalid"
+
+
+@pytest.mark.parametrize("header", [None, "", "items=0-5", "bytes=0-5,10-20", "bytes=a-b", "bytes=5"])
+def test_ignored_ranges_send_whole_file(header):
+    assert _parse_range(header, SIZE) is None
+
+
+def test_empty_file_has_no_satisfiable_range():
+    assert _parse_range("bytes=0-", 0) == "invalid"
+    assert _parse_range("bytes=-10", 0) == "invalid"
+
+
+def test_etag_list_matching():
+    etag = '"1f-abc"'
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches("", etag)
+    assert not etag_matches('"1f-abcd"', etag) # No substring matches
+    assert not etag_matches('"1f-ab"', etag)
@@ -0,0 +1,17 @@
+import pytest
+
+import throttle
+from throttle import TokenBucket
+
+
+def test_token_bucket_allows_burst_then_asks_to_wait(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(throttle.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=10, burst=20)
+    assert bucket.take(20) == 0.0
+    assert bucket.take(5) == pytest.approx(0.5) # 5 tokens short at 10 per second
+    now[0] += 1.5 # Refilled to 10 tokens
+    assert bucket.take(10) == 0.0
+    now[0] += 60 # Never refills beyond the burst
+    assert bucket.take(20) == 0.0
+    assert bucket.take(1) == pytest.approx(0.1)
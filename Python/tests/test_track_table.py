@@ -0,0 +1,59 @@
+import pytest
+
+from track_table import Query, QueryError, SmartPlaylist, TrackTable
+
+
+def _entry(name, artist, duration, album="Album"):
+    return {"file_path": f"/music/{name}.mp3", "artist": artist, "album": album, "duration_sec": duration}
+
+
+@pytest.fixture
+def table():
+    table = TrackTable()
+    table.upsert_many([
+        _entry("one", "Queen", 354.0, album="A Night at the Opera"),
+        _entry("two", "Daft Punk", 250.0, album="Discovery"),
+        _entry("three", "queen", 120.0, album="Jazz"),
+        _entry("four", "Air", 400.0),
+    ])
+    return table
+
+
+def _names(table, text):
+    return [table.path_at(row).rsplit("/", 1)[1][:-4] for row in Query(text).run(table)]
+
+
+def test_comparisons_ignore_case_and_combine(table):
+    assert _names(table, "artist = QUEEN") == ["one", "three"]
+    assert _names(table, "artist = queen and duration > 5m") == ["one"]
+    assert _names(table, "artist = Daft Punk or (album contains jazz and not duration > 3m)") == ["two", "three"]
+    assert _names(table, 'album ~ "opera"') == ["one"]
+
+
+@pytest.mark.parametrize("text, seconds", [("5m", 300), ("3m30s", 210), ("4:20", 260), ("1:02:03", 3723), ("90", 90)])
+def test_duration_values(text, seconds):
+    assert Query(f"duration = {text}").predicate == ("num", "duration", "=", seconds)
+
+
+def test_order_and_limit(table):
+    assert _names(table, "order by duration desc") == ["four", "one", "two", "three"]
+    assert _names(table, "order by artist, duration limit 2") == ["four", "two"]
+    assert _names(table, "limit 0") == []
+
+
+@pytest.mark.parametrize("text", [
+    "limit abc", "limit -3", "limit 2.5", "duration > 1:xx", "duration > :30", "duration > 5 parsecs",
+    "size > 10 furlongs", "bogus = 1", "artist =", "artist contains", "duration ~ 5m", "(artist = Air",
+    "artist = Air order", "artist = Air limit 5 extra", "artist = Air !",
+])
+def test_invalid_queries_raise_query_error(text):
+    with pytest.raises(QueryError):
+        Query(text)
+
+
+def test_smart_playlist_follows_table_edits(table):
+    smart = SmartPlaylist(table, "artist = queen order by duration")
+    assert smart.paths() == ["/music/three.mp3", "/music/one.mp3"]
+    table.upsert(_entry("five", "Queen", 60.0))
+    table.remove("/music/one.mp3")
+    assert smart.paths() == ["/music/five.mp3", "/music/three.mp3"]
@@ -0,0 +1,104 @@
+import os
+import time
+
+import numpy as np
+import pytest
+import soundfile
+
+import transcode
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    monkeypatch.setattr(transcode, "CACHE_DIR", str(directory))
+    return directory
+
+
+def _wav(path, frequency, seconds=1.0, rate=44100):
+    samples = 0.3 * np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate)
+    soundfile.write(str(path), np.repeat(samples[:, None], 2, axis=1).astype(np.float32), rate)
+    return str(path)
+
+
+def test_plan_export_makes_unique_stick_safe_names(tmp_path):
+    plan = transcode.plan_export(["/a/Song.flac", "/b/song.mp3", "/c/What? A: Song.wav", "/d/ ..wav"],
+                                 str(tmp_path), "mp3")
+    assert [os.path.basename(destination) for _, destination in plan] == \
+        ["Song.mp3", "song (2).mp3", "What_ A_ Song.mp3", "track.mp3"]
+    assert [file_path for file_path, _ in plan] == ["/a/Song.flac", "/b/song.mp3", "/c/What? A: Song.wav", "/d/ ..wav"]
+
+
+def test_plan_export_numbered_keeps_playlist_order(tmp_path):
+    plan = transcode.plan_export(["/x/B.flac", "/y/A.flac", "/z/B.flac"], str(tmp_path), "ogg", numbered=True)
+    assert [os.path.basename(destination) for _, destination in plan] == \
+        ["001 - B.ogg", "002 - A.ogg", "003 - B.ogg"]
+
+
+def test_write_playlist_uses_relative_paths(tmp_path):
+    plan = [("/music/a.flac", str(tmp_path / "a.ogg")), ("/music/b.flac", str(tmp_path / "sub" / "b.ogg"))]
+    playlist = transcode.write_playlist(plan, str(tmp_path), {"/music/a.flac": 61.4})
+    with open(playlist, encoding="utf-8") as f:
+        assert f.read().splitlines() == ["#EXTM3U", "#EXTINF:61,a", "a.ogg", "#EXTINF:0,b", os.path.join("sub", "b.ogg")]
+
+
+def _export(source, destination, manifest):
+    previous = manifest.get(os.path.basename(destination))
+    file_path, _, status, error, entry = transcode.transcode_track((source, destination, "ogg", 128, previous))
+    assert error is None
+    manifest[os.path.basename(destination)] = entry
+    return status
+
+
+def test_reexport_reuses_cache_and_skips_unchanged_files(tmp_path, cache_dir):
+    source = _wav(tmp_path / "song.wav", 440)
+    destination = str(tmp_path / "stick" / "song.ogg")
+    manifest = {}
+    assert _export(source, destination, manifest) == "converted"
+    assert _export(source, destination, manifest) == "unchanged"
+    assert _export(source, destination, {}) == "cached" # No manifest (e.g. another stick): copied again
+    assert not [name for name in os.listdir(cache_dir) if ".tmp" in name]
+
+
+def test_same_name_from_another_source_is_replaced_even_at_equal_size(tmp_path, cache_dir):
+    # Same length, format and bitrate: the old size-only check kept the wrong audio here
+    first, second = _wav(tmp_path / "one.wav", 440), _wav(tmp_path / "two.wav", 440)
+    destination = str(tmp_path / "stick" / "song.ogg")
+    manifest = {}
+    _export(first, destination, manifest)
+    with open(destination, "rb") as f:
+        first_copy = f.read()
+    assert _export(second, destination, manifest) == "converted"
+    with open(transcode.cache_path(second, "ogg", 128), "rb") as f, open(destination, "rb") as g:
+        assert g.read() == f.read()
+    assert manifest["song.ogg"][0] == os.path.basename(transcode.cache_path(second, "ogg", 128))
+    assert _export(first, destination, manifest) == "cached"
+    with open(destination, "rb") as f:
+        assert f.read() == first_copy
+
+
+def test_edited_destination_is_copied_again(tmp_path, cache_dir):
+    source = _wav(tmp_path / "song.wav", 440)
+    destination = str(tmp_path / "stick" / "song.ogg")
+    manifest = {}
+    _export(source, destination, manifest)
+    with open(destination, "ab") as f:
+        f.write(b"junk")
+    assert _export(source, destination, manifest) == "cached"
+
+
+def test_manifest_round_trip(tmp_path):
+    assert transcode.load_manifest(str(tmp_path)) == {}
+    transcode.save_manifest(str(tmp_path), {"Tëst.ogg": ["abc.ogg", 10, 1.5]})
+    assert transcode.load_manifest(str(tmp_path)) == {"Tëst.ogg": ["abc.ogg", 10, 1.5]}
+
+
+def test_prune_cache_removes_abandoned_temp_files(cache_dir):
+    cache_dir.mkdir()
+    stale, fresh, kept = cache_dir / "a.ogg.123.tmp.ogg", cache_dir / "b.ogg.456.tmp.ogg", cache_dir / "c.ogg"
+    for path in (stale, fresh, kept):
+        path.write_bytes(b"x" * 10)
+    old = time.time() - transcode.TEMP_MAX_AGE_SEC - 60
+    os.utime(stale, (old, old))
+    assert transcode.prune_cache() == 10
+    assert sorted(os.listdir(cache_dir)) == ["b.ogg.456.tmp.ogg", "c.ogg"]
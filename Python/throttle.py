@@ -0,0 +1,23 @@
+# Python/throttle.py
+# Token bucket rate limiting shared by the streaming server (per-client request and bandwidth
+# limits, see stream_server.py) and the read-ahead of upcoming tracks (I/O budget, see prefetch.py).
+# Headless: no PyQt5/pygame imports.
+import time
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `burst`. Not thread-safe; callers hold their own lock."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, amount):
+        """Takes `amount` tokens, returning how many seconds the caller should wait first (0 if none)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
@@ -0,0 +1,438 @@
+# Python/track_table.py
+# Columnar in-memory track table and the smart-playlist query language.
+#
+# Track metadata is stored column by column in NumPy arrays (one row per track). Text columns
+# hold integer codes into a per-column StringPool, so each distinct artist/album/... string is
+# stored once and filters/sorts on it work on small integer arrays. Filters and sorts are vectorised and
+# take a few milliseconds on 500k tracks.
+#
+# Query language (case-insensitive keywords):
+#   artist = "Daft Punk" and duration > 5m order by album, title
+#   genre ~ rock or (album contains live and not artist = Queen) order by duration desc limit 50
+# Comparisons: =  !=  <  <=  >  >=  ~ / contains  (text comparisons ignore case)
+# Values: quoted strings, bare words, numbers; durations take h/m/s or m:ss (5m, 3m30s, 4:20),
+# sizes take KB/MB/GB, bitrates take k (320k).
+#
+# SmartPlaylist keeps the result of one query and re-evaluates only the rows that changed since
+# its last refresh, so it stays current cheaply while the library is edited.
+import os
+import re
+import numpy as np
+
+
+class StringPool:
+    """Interns strings to integer codes. Code 0 is always the empty string (missing value)."""
+
+    def __init__(self):
+        self.strings = [""]
+        self._codes = {"": 0}
+        self._lower = None # Cached per-code lowercase strings
+        self._ranks = None # Cached per-code sort rank (case-insensitive)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def intern(self, value):
+        value = "" if value is None else str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+            self._lower = self._ranks = None
+        return code
+
+    def lower(self):
+        if self._lower is None:
+            self._lower = [s.casefold() for s in self.strings]
+        return self._lower
+
+    def codes_matching(self, predicate):
+        """Boolean array over codes: predicate(lowercase string) evaluated once per distinct string."""
+        return np.fromiter((predicate(s) for s in self.lower()), dtype=bool, count=len(self.strings))
+
+    def ranks(self):
+        """Array mapping each code to its case-insensitive alphabetical rank (empty sorts first)."""
+        if self._ranks is None:
+            order = sorted(range(len(self.strings)), key=self.lower().__getitem__)
+            ranks = np.empty(len(order), dtype=np.int32)
+            ranks[order] = np.arange(len(order), dtype=np.int32)
+            self._ranks = ranks
+        return self._ranks
+
+
+# Column name -> (kind, dtype). "text" columns store StringPool codes.
+COLUMNS = {
+    "path": ("text", np.int32),
+    "name": ("text", np.int32),
+    "title": ("text", np.int32),
+    "artist": ("text", np.int32),
+    "album": ("text", np.int32),
+    "ext": ("text", np.int32),
+    "codec": ("text", np.int32),
+    "duration": ("duration", np.float32),
+    "size": ("size", np.int64),
+    "modified": ("number", np.float64),
+    "bitrate": ("bitrate", np.int32),
+    "samplerate": ("number", np.int32),
+    "channels": ("number", np.int32),
+}
+
+
+def _entry_values(entry):
+    """Maps a library index entry (see library.read_track_info) to column values."""
+    analysis = entry.get("analysis") or {}
+    file_path = entry["file_path"]
+    return {
+        "path": file_path,
+        "name": entry.get("display_name") or os.path.splitext(os.path.basename(file_path))[0],
+        "title": entry.get("title"),
+        "artist": entry.get("artist"),
+        "album": entry.get("album"),
+        "ext": os.path.splitext(file_path)[1].lstrip(".").lower(),
+        "codec": analysis.get("codec"),
+        "duration": entry.get("duration_sec") or 0.0,
+        "size": entry.get("size") or 0,
+        "modified": entry.get("mtime") or 0.0,
+        "bitrate": analysis.get("bitrate") or 0,
+        "samplerate": analysis.get("sample_rate") or 0,
+        "channels": analysis.get("channels") or 0,
+    }
+
+
+class TrackTable:
+    def __init__(self, capacity=1024):
+        # One pool per text column keeps per-column work (filters, sort ranks) proportional to
+        # the distinct values of that column, e.g. a few thousand artists rather than every string
+        self.pools = {name: StringPool() for name, (kind, _) in COLUMNS.items() if kind == "text"}
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, (_, dtype) in COLUMNS.items()}
+        self.alive = np.zeros(capacity, dtype=bool) # False for removed rows (their slots are reused)
+        self.row_versions = np.zeros(capacity, dtype=np.int64) # Table version of each row's last change
+        self.version = 0
+        self.count = 0 # Rows in use, including removed ones
+        self._rows = {} # file_path -> row
+        self._free_rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, file_path):
+        return file_path in self._rows
+
+    def row_of(self, file_path):
+        return self._rows.get(file_path)
+
+    def path_at(self, row):
+        return self.pools["path"].strings[self.columns["path"][row]]
+
+    def _grow(self):
+        capacity = 2 * len(self.alive)
+        for name in self.columns:
+            self.columns[name] = np.resize(self.columns[name], capacity)
+        self.alive = np.resize(self.alive, capacity)
+        self.alive[self.count:] = False
+        self.row_versions = np.resize(self.row_versions, capacity)
+
+    def _row_for(self, file_path):
+        row = self._rows.get(file_path)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                if self.count == len(self.alive):
+                    self._grow()
+                row = self.count
+                self.count += 1
+            self._rows[file_path] = row
+        return row
+
+    def upsert_many(self, entries):
+        """Adds or updates tracks from library index entries (dicts with file_path, tags, ...).
+
+        Values are gathered per column and written with one array assignment per column,
+        which is what makes loading a 500k-track index take seconds rather than minutes.
+        """
+        rows = []
+        gathered = {name: [] for name in COLUMNS}
+        for entry in entries:
+            values = _entry_values(entry)
+            rows.append(self._row_for(values["path"]))
+            for name, (kind, _) in COLUMNS.items():
+                value = values[name]
+                gathered[name].append(self.pools[name].intern(value) if kind == "text" else value)
+        if not rows:
+            return []
+        rows = np.asarray(rows, dtype=np.int64)
+        self.version += 1
+        for name, (_, dtype) in COLUMNS.items():
+            self.columns[name][rows] = np.asarray(gathered[name], dtype=dtype)
+        self.alive[rows] = True
+        self.row_versions[rows] = self.version
+        return rows
+
+    def upsert(self, entry):
+        return int(self.upsert_many([entry])[0])
+
+    def remove(self, file_path):
+        row = self._rows.pop(file_path, None)
+        if row is None:
+            return
+        self.version += 1
+        self.alive[row] = False
+        self.row_versions[row] = self.version
+        self._free_rows.append(row)
+
+    def query(self, text):
+        """Runs a query string and returns matching file paths in result order."""
+        return [self.path_at(row) for row in Query(text).run(self)]
+
+
+# --- Query language ---
+
+class QueryError(ValueError):
+    pass
+
+
+TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op><=|>=|!=|=|<|>|~)
+  | (?P<paren>[(),])
+  | (?P<word>[^\s()<>=!~,"']+)
+)''', re.VERBOSE)
+
+KEYWORDS = {"and", "or", "not", "order", "by", "asc", "desc", "limit", "contains"}
+UNIT_SCALES = {
+    "duration": {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600},
+    "size": {"b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2, "g": 1024 ** 3, "gb": 1024 ** 3},
+    "bitrate": {"k": 1000, "kbps": 1000, "bps": 1},
+    "number": {},
+}
+FIELD_ALIASES = {"length": "duration", "time": "duration", "file": "path", "format": "ext", "mtime": "modified"}
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise QueryError(f"Unexpected character at position {pos}: {text[pos:pos + 10]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "word" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+def _parse_number(text, kind):
+    text = text.strip().lower()
+    if kind == "duration" and ":" in text: # m:ss or h:mm:ss
+        total = 0.0
+        for part in text.split(":"):
+            if not re.fullmatch(r"\d+(?:\.\d+)?", part.strip()):
+                raise QueryError(f"Not a duration: {text!r}")
+            total = total * 60 + float(part)
+        return total
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*([a-z]*)", text)
+    if not parts or "".join(n + u for n, u in parts) != text.replace(" ", ""):
+        raise QueryError(f"Not a number: {text!r}")
+    scales = UNIT_SCALES[kind]
+    total = 0.0
+    for number, unit in parts: # Compound values like 3m30s add up
+        if unit and unit not in scales:
+            raise QueryError(f"Unknown unit {unit!r} in {text!r}")
+        total += float(number) * scales.get(unit, 1)
+    return total
+
+
+class Query:
+    """Parsed query: a predicate tree plus ordering and limit."""
+
+    def __init__(self, text):
+        self.text = text
+        self._tokens = _tokenize(text)
+        self._pos = 0
+        self.predicate = None
+        self.order = [] # [(column, descending)]
+        self.limit = None
+        if self._peek() != ("keyword", "order") and self._peek() != ("keyword", "limit") and self._peek():
+            self.predicate = self._parse_or()
+        if self._accept("keyword", "order"):
+            self._expect("keyword", "by")
+            while True:
+                column = self._field(self._next("word")[1])
+                descending = False
+                if self._accept("keyword", "desc"):
+                    descending = True
+                else:
+                    self._accept("keyword", "asc")
+                self.order.append((column, descending))
+                if not self._accept("paren", ","):
+                    break
+        if self._accept("keyword", "limit"):
+            word = self._next("word")[1]
+            if not word.isdecimal():
+                raise QueryError(f"'limit' needs a whole number, not {word!r}")
+            self.limit = int(word)
+        if self._peek():
+            raise QueryError(f"Unexpected {self._peek()[1]!r} in query")
+
+    # Parser helpers
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _next(self, kind=None):
+        token = self._peek()
+        if token is None or (kind and token[0] != kind):
+            raise QueryError(f"Expected {kind or 'more input'} but found {token[1] if token else 'end of query'!r}")
+        self._pos += 1
+        return token
+
+    def _accept(self, kind, value):
+        if self._peek() == (kind, value):
+            self._pos += 1
+            return True
+        return False
+
+    def _expect(self, kind, value):
+        if not self._accept(kind, value):
+            raise QueryError(f"Expected {value!r}")
+
+    @staticmethod
+    def _field(name):
+        name = FIELD_ALIASES.get(name.lower(), name.lower())
+        if name not in COLUMNS:
+            raise QueryError(f"Unknown field {name!r}; known fields: {', '.join(COLUMNS)}")
+        return name
+
+    def _parse_or(self):
+        node = self._parse_and()
+        while self._accept("keyword", "or"):
+            node = ("or", node, self._parse_and())
+        return node
+
+    def _parse_and(self):
+        node = self._parse_not()
+        while self._accept("keyword", "and"):
+            node = ("and", node, self._parse_not())
+        return node
+
+    def _parse_not(self):
+        if self._accept("keyword", "not"):
+            return ("not", self._parse_not())
+        if self._accept("paren", "("):
+            node = self._parse_or()
+            self._expect("paren", ")")
+            return node
+        return self._parse_comparison()
+
+    def _parse_comparison(self):
+        column = self._field(self._next("word")[1])
+        token = self._next()
+        if token == ("keyword", "contains"):
+            op = "~"
+        elif token[0] == "op":
+            op = token[1]
+        else:
+            raise QueryError(f"Expected a comparison after {column!r}")
+        # Bare words run until the next keyword/operator, so `artist = Daft Punk and ...` works unquoted
+        words = []
+        while self._peek() and self._peek()[0] in ("word", "string"):
+            kind, word = self._next()
+            words.append(word)
+            if kind == "string": # A quoted value is complete on its own
+                break
+        if not words:
+            raise QueryError(f"Missing value after {column} {op}")
+        value = " ".join(words)
+        kind = COLUMNS[column][0]
+        if kind == "text": # < and > compare alphabetically
+            return ("text", column, op, value.casefold())
+        if op == "~":
+            raise QueryError(f"'contains' only works on text fields, not {column!r}")
+        return ("num", column, op, _parse_number(value, kind))
+
+    # Evaluation
+    def mask(self, table, rows=None):
+        """Boolean match array for `rows` (default: all rows in use); removed rows never match."""
+        if rows is None:
+            rows = slice(0, table.count)
+        alive = table.alive[rows]
+        if self.predicate is None:
+            return alive.copy()
+        return self._eval(self.predicate, table, rows) & alive
+
+    def _eval(self, node, table, rows):
+        kind = node[0]
+        if kind == "and":
+            return self._eval(node[1], table, rows) & self._eval(node[2], table, rows)
+        if kind == "or":
+            return self._eval(node[1], table, rows) | self._eval(node[2], table, rows)
+        if kind == "not":
+            return ~self._eval(node[1], table, rows)
+        _, column, op, value = node
+        data = table.columns[column][rows]
+        if kind == "num":
+            return {"=": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+                    ">": np.greater, ">=": np.greater_equal}[op](data, value)
+        # Text: decide once per distinct string, then look the answer up by code (vectorised)
+        pool = table.pools[column]
+        if op == "~":
+            by_code = pool.codes_matching(lambda s: value in s)
+        elif op in ("=", "!="):
+            by_code = pool.codes_matching(lambda s: s == value)
+            if op == "!=":
+                by_code = ~by_code
+        else:
+            compare = {"<": str.__lt__, "<=": str.__le__, ">": str.__gt__, ">=": str.__ge__}[op]
+            by_code = pool.codes_matching(lambda s: compare(s, value))
+        return by_code[data]
+
+    def order_rows(self, table, rows):
+        """Sorts an array of row numbers by the query's ORDER BY (stable; no order keeps row order)."""
+        if not self.order or len(rows) == 0:
+            return rows
+        keys = []
+        for column, descending in reversed(self.order): # np.lexsort: last key is the primary one
+            data = table.columns[column][rows]
+            if COLUMNS[column][0] == "text":
+                data = table.pools[column].ranks()[data]
+            keys.append(-data.astype(np.float64) if descending else data)
+        return rows[np.lexsort(keys)]
+
+    def run(self, table):
+        rows = np.flatnonzero(self.mask(table))
+        rows = self.order_rows(table, rows)
+        return rows[:self.limit] if self.limit is not None else rows
+
+
+class SmartPlaylist:
+    """A saved query whose result is kept up to date incrementally as the table changes."""
+
+    def __init__(self, table, text):
+        self.table = table
+        self.query = Query(text)
+        self._matches = np.zeros(0, dtype=bool)
+        self._seen_version = -1
+
+    def refresh(self):
+        """Re-evaluates only rows changed since the last call and returns matching rows in order."""
+        table = self.table
+        if len(self._matches) < table.count:
+            known = len(self._matches)
+            self._matches = np.resize(self._matches, table.count)
+            self._matches[known:] = False
+        if self._seen_version < 0:
+            self._matches[:table.count] = self.query.mask(table)
+        elif table.version != self._seen_version:
+            changed = np.flatnonzero(table.row_versions[:table.count] > self._seen_version)
+            self._matches[changed] = self.query.mask(table, changed)
+        self._seen_version = table.version
+        rows = self.query.order_rows(table, np.flatnonzero(self._matches[:table.count]))
+        return rows[:self.query.limit] if self.query.limit is not None else rows
+
+    def paths(self):
+        return [self.table.path_at(row) for row in self.refresh()]
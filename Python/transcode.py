@@ -0,0 +1,305 @@
+# Python/transcode.py
+# Exports a playlist to a folder in a portable format (OGG Vorbis or MP3 at a set bitrate),
+# e.g. for a car USB stick or a portable player.
+#
+# Each track is encoded by a local ffmpeg if there is one, otherwise by libsndfile (the soundfile
+# package, fed through decoders.py). Tags and cover art are then copied over with mutagen, so the
+# result is the same whichever encoder ran. Converted files are kept in ~/.musicova/transcoded,
+# keyed by source file (path, size, mtime), format and bitrate: exporting the same playlist again,
+# or to another stick, only encodes what changed. A manifest in the export folder records which
+# conversion each file there holds, so files that are already up to date are not copied again.
+# Every file is written to a temporary name and renamed into place, so a cancelled or interrupted
+# export never leaves half-written tracks.
+#
+# Headless like library.py: transcode_track() runs in worker processes of the desktop app and
+# of musicova_cli.py export.
+import os
+import re
+import json
+import time
+import base64
+import shutil
+import hashlib
+import subprocess
+import numpy as np
+from mutagen import File as MutagenFile
+from mutagen.flac import Picture
+from mutagen.id3 import ID3, APIC
+
+import library
+import decoders
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+FORMATS = {
+    # name: (extension, ffmpeg encoder, libsndfile format and subtype)
+    "ogg": (".ogg", "libvorbis", "OGG", "VORBIS"),
+    "mp3": (".mp3", "libmp3lame", "MP3", "MPEG_LAYER_III"),
+}
+BITRATES_KBPS = (96, 128, 160, 192, 256, 320)
+DEFAULT_FORMAT = "ogg"
+DEFAULT_BITRATE_KBPS = 192
+MP3_SAMPLE_RATES = (32000, 44100, 48000) # MPEG-1 Layer III; other rates are resampled to 44.1 kHz
+CACHE_DIR = os.path.join(library.DATA_DIR, "transcoded")
+CACHE_VERSION = 1 # Bump when the encoding settings change, so old conversions are not reused
+CACHE_MAX_BYTES = 8 * 1024 ** 3 # Least recently used conversions are removed beyond this
+TEMP_MAX_AGE_SEC = 24 * 3600 # Cache temp files this old were left behind by killed workers
+PLAYLIST_NAME = "playlist.m3u8"
+MANIFEST_NAME = ".musicova-export.json" # {file name: [cache file name, size, mtime]} of what the folder holds
+MTIME_TOLERANCE_SEC = 2 # FAT32 stores modification times in 2-second steps
+INVALID_NAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]') # Not allowed on FAT32/exFAT sticks
+ID3_FRAMES = {"title": "TIT2", "artist": "TPE1", "album": "TALB", "albumartist": "TPE2", "genre": "TCON",
+              "date": "TDRC", "tracknumber": "TRCK"} # For sources with raw ID3 tags (WAV)
+
+
+def plan_export(file_paths, output_dir, fmt, numbered=False):
+    """Returns [(file_path, destination_path)] with unique, stick-safe file names.
+
+    With numbered=True names start with the playlist position ("001 - ..."), so players that
+    sort by file name keep the playlist order.
+    """
+    extension = FORMATS[fmt][0]
+    used = set()
+    plan = []
+    for position, file_path in enumerate(file_paths, 1):
+        base_name = INVALID_NAME_CHARS.sub("_", os.path.splitext(os.path.basename(file_path))[0]).strip(" .") or "track"
+        if numbered:
+            base_name = f"{position:03d} - {base_name}"
+        name, suffix = base_name, 2
+        while name.lower() in used: # Same file name from different folders
+            name = f"{base_name} ({suffix})"
+            suffix += 1
+        used.add(name.lower())
+        plan.append((file_path, os.path.join(output_dir, name + extension)))
+    return plan
+
+
+def write_playlist(plan, output_dir, durations=None):
+    """Writes an extended M3U with paths relative to output_dir, in playlist order."""
+    durations = durations or {}
+    lines = ["#EXTM3U"]
+    for file_path, destination in plan:
+        name = os.path.splitext(os.path.basename(destination))[0]
+        lines.append(f"#EXTINF:{int(round(durations.get(file_path) or 0))},{name}")
+        lines.append(os.path.relpath(destination, output_dir))
+    playlist_path = os.path.join(output_dir, PLAYLIST_NAME)
+    with open(playlist_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return playlist_path
+
+
+def load_manifest(output_dir):
+    """What earlier exports wrote to output_dir, for the `previous` part of transcode_track() jobs."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(output_dir, manifest):
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.musicova-tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def cache_path(file_path, fmt, bitrate_kbps):
+    stat = os.stat(file_path)
+    key = f"{CACHE_VERSION}|{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{fmt}|{bitrate_kbps}"
+    return os.path.join(CACHE_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + FORMATS[fmt][0])
+
+
+def worker_init():
+    """Process pool initializer: exports use every core, but below playback and the GUI."""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+
+
+def transcode_track(job):
+    """Converts one file. Job is (file_path, destination_path, fmt, bitrate_kbps, previous), where
+    previous is the destination's manifest entry (see load_manifest()) or None.
+
+    Safe to run in worker processes; never raises. Returns (file_path, destination_path, status,
+    error, entry) where status is "converted", "cached" (reused an earlier conversion), "unchanged"
+    (destination already up to date) or None on error, and entry is the new manifest entry.
+    """
+    file_path, destination, fmt, bitrate_kbps, previous = job
+    tmp_path = None
+    try:
+        cached = cache_path(file_path, fmt, bitrate_kbps)
+        if os.path.exists(cached):
+            status = "cached"
+        else:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cached}.{os.getpid()}.tmp{FORMATS[fmt][0]}" # Encoders pick the container from the extension
+            _encode(file_path, tmp_path, fmt, bitrate_kbps)
+            _copy_tags(file_path, tmp_path, fmt)
+            with open(tmp_path, "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, cached)
+            tmp_path = None
+            status = "converted"
+        os.utime(cached) # Marks it recently used for prune_cache()
+
+        if _holds(destination, previous, os.path.basename(cached)):
+            return file_path, destination, "unchanged", None, previous
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(destination), f".{os.path.basename(destination)}.musicova-tmp")
+        shutil.copyfile(cached, tmp_path) # copyfile, not copy2: FAT32 sticks reject permission bits
+        os.replace(tmp_path, destination)
+        stat = os.stat(destination)
+        return file_path, destination, status, None, [os.path.basename(cached), stat.st_size, stat.st_mtime]
+    except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return file_path, destination, None, str(e), None
+
+
+def _holds(destination, entry, cached_name):
+    """Whether destination is still the copy of cached_name that its manifest entry describes."""
+    if not entry or entry[0] != cached_name:
+        return False
+    try:
+        stat = os.stat(destination)
+    except OSError:
+        return False
+    return stat.st_size == entry[1] and abs(stat.st_mtime - entry[2]) <= MTIME_TOLERANCE_SEC
+
+
+def _encode(file_path, target_path, fmt, bitrate_kbps):
+    _, ffmpeg_codec, sf_format, sf_subtype = FORMATS[fmt]
+    if shutil.which("ffmpeg"):
+        command = ["ffmpeg", "-v", "error", "-nostdin", "-y", "-i", file_path, "-map", "0:a:0",
+                   "-map_metadata", "-1", "-c:a", ffmpeg_codec, "-b:a", f"{bitrate_kbps}k"]
+        if fmt == "mp3":
+            if _sample_rate(file_path) not in MP3_SAMPLE_RATES:
+                command += ["-ar", "44100"]
+            command += ["-ac", "2", "-id3v2_version", "3"] # ID3v2.3 is what car stereos read best
+        result = subprocess.run(command + [target_path], capture_output=True, timeout=1800,
+                                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace').strip()[-300:]}")
+        return
+    if soundfile is None or sf_format not in soundfile.available_formats():
+        raise RuntimeError(f"No {fmt.upper()} encoder available (install ffmpeg, or the 'soundfile' package)")
+
+    with decoders.open_decoder(file_path) as decoder: # Streamed block by block: memory stays flat for long mixes
+        sample_rate, channels, resampler = decoder.sample_rate, decoder.channels, None
+        if fmt == "mp3":
+            if sample_rate not in MP3_SAMPLE_RATES:
+                resampler, sample_rate = decoders.Resampler(sample_rate, 44100, channels), 44100
+            channels = min(channels, 2) # MP3 is at most stereo
+            # libsndfile's constant bitrate is set through the compression level: 0 = 320k ... 1 = 32k
+            options = {"bitrate_mode": "CONSTANT", "compression_level": (320 - bitrate_kbps) / (320 - 32)}
+        else:
+            options = {"compression_level": 1.0 - _vorbis_quality(bitrate_kbps)} # Vorbis is VBR, set by quality
+        with soundfile.SoundFile(target_path, "w", samplerate=sample_rate, channels=channels,
+                                 format=sf_format, subtype=sf_subtype, **options) as encoder:
+            while True:
+                block = decoder.read(decoders.READ_BLOCK_FRAMES)
+                finished = not len(block)
+                if resampler is not None:
+                    block = resampler.flush() if finished else resampler.process(block)
+                if len(block):
+                    if block.shape[1] != channels:
+                        block = np.repeat(block.mean(axis=1, keepdims=True), channels, axis=1)
+                    encoder.write(np.clip(block, -1.0, 1.0))
+                if finished:
+                    break
+
+
+def _vorbis_quality(bitrate_kbps):
+    # Nominal stereo 44.1 kHz bitrates of Vorbis quality levels q0..q10, as 0..1
+    nominal = (64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 500)
+    return float(np.interp(bitrate_kbps, nominal, np.arange(11))) / 10
+
+
+def _sample_rate(file_path):
+    try:
+        audio_file = MutagenFile(file_path)
+        return int(getattr(audio_file.info, "sample_rate", 0) or 0)
+    except Exception:
+        return 0
+
+
+def _read_tags(file_path):
+    """The EDITABLE_TAGS of a file as {key: [values]}."""
+    audio_file = MutagenFile(file_path)
+    if audio_file is None or audio_file.tags is None:
+        return {}
+    if hasattr(audio_file.tags, "getall"): # ID3, including the raw ID3 chunk of WAV files
+        tags = {}
+        for key, frame_id in ID3_FRAMES.items():
+            frame = audio_file.tags.get(frame_id)
+            if frame is not None and frame.text:
+                tags[key] = [str(text) for text in frame.text]
+        return tags
+    audio_file = MutagenFile(file_path, easy=True)
+    return {key: list(audio_file[key]) for key in library.EDITABLE_TAGS if audio_file.get(key)}
+
+
+def _copy_tags(source_path, target_path, fmt):
+    tags = _read_tags(source_path)
+    art = library.read_cover_art(source_path) # Embedded, or cover.jpg and friends next to the file
+    target = MutagenFile(target_path, easy=True)
+    if target.tags is None:
+        target.add_tags()
+    for key, values in tags.items():
+        target[key] = values
+    target.save(**({"v2_version": 3} if fmt == "mp3" else {}))
+    if not art:
+        return
+    data, mime = art
+    if fmt == "mp3":
+        id3 = ID3(target_path)
+        id3.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=data)) # type 3: front cover
+        id3.save(target_path, v2_version=3)
+    else:
+        picture = Picture()
+        picture.type, picture.mime, picture.data = 3, mime, data
+        target = MutagenFile(target_path)
+        target["metadata_block_picture"] = [base64.b64encode(picture.write()).decode("ascii")]
+        target.save()
+
+
+def prune_cache(max_bytes=CACHE_MAX_BYTES):
+    """Deletes the least recently used conversions until the cache fits in max_bytes, and temporary
+    files abandoned by killed workers. Returns bytes freed."""
+    try:
+        files = [entry for entry in os.scandir(CACHE_DIR) if entry.is_file()]
+    except OSError:
+        return 0
+    entries, freed = [], 0
+    for entry in files:
+        if ".tmp" not in entry.name:
+            entries.append(entry)
+            continue
+        try: # Recent ones may still be written by a running export
+            stat = entry.stat()
+            if time.time() - stat.st_mtime > TEMP_MAX_AGE_SEC:
+                os.remove(entry.path)
+                freed += stat.st_size
+        except OSError:
+            pass
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    total = 0
+    for entry in entries:
+        size = entry.stat().st_size
+        total += size
+        if total > max_bytes:
+            try:
+                os.remove(entry.path)
+                freed += size
+            except OSError:
+                pass
+    return freed